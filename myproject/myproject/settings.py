@@ -35,6 +35,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Количество и время SQL-запросов каждого запроса, журнал медленных запросов
+    'orders.middleware.QueryStatsMiddleware',
 ]
 
 # Главный файл URL-адресов
@@ -63,13 +65,55 @@ TEMPLATES = [
 # WSGI приложение
 WSGI_APPLICATION = 'myproject.wsgi.application'
 
-# Настройки базы данных
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',  # Используем SQLite
-        'NAME': BASE_DIR / 'db.sqlite3',  # Файл базы данных
+# Настройки базы данных. Профиль выбирается переменной окружения DB_PROFILE: sqlite (по умолчанию) или postgres
+DB_PROFILE = os.environ.get('DB_PROFILE', 'sqlite')
+
+if DB_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'canteen'),
+            'USER': os.environ.get('POSTGRES_USER', 'canteen'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Соединение переживает запрос; перед повторным использованием проверяется, что оно живое
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
     }
-}
+    if os.environ.get('DB_POOL'):
+        # Пул соединений psycopg (нужен пакет psycopg[pool]); с пулом соединения не держатся после запроса
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX', 10)),
+            'timeout': 10,
+        }
+elif DB_PROFILE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',  # Используем SQLite
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),  # Файл базы данных
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+            'OPTIONS': {
+                # Сколько секунд ждать освобождения блокировки записи вместо ошибки "database is locked"
+                'timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20)),
+                # Транзакция сразу берет блокировку записи: без взаимных блокировок при повышении уровня
+                'transaction_mode': 'IMMEDIATE',
+                # WAL: читатели не ждут писателя; synchronous=NORMAL в WAL безопасен и не делает fsync на каждый коммит
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    f"PRAGMA mmap_size={int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024))};"
+                    'PRAGMA temp_store=MEMORY;'
+                ),
+            },
+        }
+    }
+else:
+    raise ValueError(f'Неизвестный профиль базы данных DB_PROFILE={DB_PROFILE!r}: ожидается sqlite или postgres')
 
 # Валидаторы паролей
 AUTH_PASSWORD_VALIDATORS = [
@@ -116,3 +160,109 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 LOGIN_REDIRECT_URL = '/users/'  # Куда идти после входа
 LOGOUT_REDIRECT_URL = '/users/login/'  # Куда идти после выхода
 LOGIN_URL = '/users/login/'  # Куда отправлять для входа
+
+# Вход по логину или по email (без учета регистра)
+AUTHENTICATION_BACKENDS = [
+    'django.contrib.auth.backends.ModelBackend',
+    'users.backends.EmailBackend',
+]
+
+# Кэш (переменная окружения CACHE_BACKEND): locmem (по умолчанию, для разработки) | file | redis | memcached.
+# LocMem и файловый кэш у каждого сервера свои; в продакшене с несколькими процессами нужен общий
+# redis или memcached (адрес в CACHE_LOCATION), иначе корзина и сброс кэша каталога не видны другим процессам
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')
+
+if CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'canteen',
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_LOCATION or BASE_DIR / 'cache',
+        }
+    }
+elif CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',  # Нужен пакет redis
+            'LOCATION': CACHE_LOCATION or 'redis://127.0.0.1:6379/1',
+            'KEY_PREFIX': 'canteen',
+        }
+    }
+elif CACHE_BACKEND == 'memcached':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',  # Нужен пакет pymemcache
+            'LOCATION': CACHE_LOCATION or '127.0.0.1:11211',
+            'KEY_PREFIX': 'canteen',
+        }
+    }
+else:
+    raise ValueError(f'Неизвестный кэш CACHE_BACKEND={CACHE_BACKEND!r}: ожидается locmem, file, redis или memcached')
+
+# Общий для всех процессов кэш: в нем можно держать корзины и сессии
+SHARED_CACHE = CACHE_BACKEND in ('redis', 'memcached')
+
+# Хранение сессий (переменная окружения SESSION_MODE): db | cached_db | cache | signed_cookies.
+# cached_db читает сессию из кэша и пишет в БД только при ее изменении (вход, выход, корзина в сессии).
+# По умолчанию cached_db только при общем кэше (корзина тогда в кэше); без него - подписанная cookie,
+# чтобы клики по корзине не писали в django_session
+SESSION_MODE = os.environ.get('SESSION_MODE', 'cached_db' if SHARED_CACHE else 'signed_cookies')
+SESSION_ENGINE = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}[SESSION_MODE]
+# Сообщения - в cookie, чтобы не изменять сессию на каждом действии
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+# Просроченные сессии в БД (db, cached_db) удаляются по расписанию, например раз в сутки ночью:
+# python manage.py clearsessions
+
+# Корзина (CART_STORAGE): cache - в кэше по пользователю, клики по корзине не пишут в БД;
+# session - в сессии, например в подписанной cookie. В кэше корзина хранится по умолчанию только при общем
+# для процессов кэше (redis, memcached): у locmem и файлового кэша корзина терялась бы между процессами
+# и после перезапуска. Корзина в сессии db/cached_db снова пишет в БД на каждом клике -
+# это показывает database_profile
+CART_STORAGE = os.environ.get('CART_STORAGE',
+                              'cache' if SHARED_CACHE and SESSION_MODE != 'signed_cookies' else 'session')
+CART_TTL = 2 * 24 * 60 * 60
+
+# Сколько дней хранить подробные записи журнала запасов
+# (старые записи сворачиваются в сводки по дням командой rollup_stock_history)
+STOCK_HISTORY_RETENTION_DAYS = 365
+
+# Журнал медленных запросов (orders.middleware.QueryStatsMiddleware): запрос считается медленным,
+# если выполнялся дольше SLOW_REQUEST_MS миллисекунд или сделал не меньше SLOW_REQUEST_QUERIES SQL-запросов
+SLOW_REQUEST_MS = int(os.environ.get('SLOW_REQUEST_MS', 500))
+SLOW_REQUEST_QUERIES = int(os.environ.get('SLOW_REQUEST_QUERIES', 50))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'orders.requests': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}
+# Медленные запросы дополнительно пишутся в файл, если задан SLOW_REQUEST_LOG
+if os.environ.get('SLOW_REQUEST_LOG'):
+    LOGGING['handlers']['slow_file'] = {
+        'class': 'logging.FileHandler',
+        'filename': os.environ['SLOW_REQUEST_LOG'],
+        'level': 'WARNING',
+    }
+    LOGGING['loggers']['orders.requests']['handlers'].append('slow_file')
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.db.models import F
-from .models import Category, Dish, Order, OrderItem, Ingredient, DishIngredient, ComboSet, ComboItem, ComboOrder, Payment, IngredientStock, StockHistory, PreparedDish
+from .models import Category, Dish, Order, OrderItem, Ingredient, DishIngredient, ComboSet, ComboItem, ComboOrder, Payment, IngredientStock, StockHistory, StockSnapshot, IngredientLot, DailySalesSummary, PreparedDish
+from .inventory import create_stock, refresh_stock_level, set_stock_quantity
 
 #  КАТЕГОРИИ 
 @admin.register(Category)
@@ -51,7 +52,7 @@ class OrderAdmin(admin.ModelAdmin):
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
     # Управление ингредиентами
-    list_display = ['name', 'unit']  # Название и единица измерения
+    list_display = ['name', 'unit', 'shelf_life_days']  # Название, единица измерения и срок хранения
     search_fields = ['name']  # Поиск по названию
 
 # Кастомный фильтр для IngredientStock
@@ -96,6 +97,9 @@ class IngredientStockAdmin(admin.ModelAdmin):
     list_filter = [IsLowFilter, IsOutOfStockFilter, 'last_restocked']
     search_fields = ['ingredient__name']
     list_editable = ['current_quantity', 'min_quantity']
+    list_select_related = ['ingredient']
+    # Уровень вычисляется из количества и минимума
+    readonly_fields = ['level']
     
     def is_low_display(self, obj):
         return obj.is_low
@@ -106,6 +110,30 @@ class IngredientStockAdmin(admin.ModelAdmin):
         return obj.is_out_of_stock
     is_out_of_stock_display.short_description = 'Закончился'
     is_out_of_stock_display.boolean = True
+    
+    def save_model(self, request, obj, form, change):
+        # Количество меняется только через журнал, иначе запас и история расходятся
+        if change and 'current_quantity' in form.changed_data:
+            new_quantity = obj.current_quantity
+            obj.current_quantity = form.initial['current_quantity']
+            super().save_model(request, obj, form, change)
+            set_stock_quantity(obj.ingredient, new_quantity, user=request.user,
+                               notes='Изменено в админке')
+            obj.refresh_from_db(fields=['current_quantity', 'quantity_base', 'level'])
+        elif not change:
+            # Новый запас - через create_stock (уровень и счетчики уровней), начальное количество - записью журнала
+            opening = obj.current_quantity
+            stock = create_stock(obj.ingredient, obj.min_quantity)
+            if opening:
+                set_stock_quantity(obj.ingredient, opening, user=request.user, notes='Начальный запас (админка)')
+            obj.pk = stock.pk
+            obj.refresh_from_db()
+        else:
+            super().save_model(request, obj, form, change)
+        
+        # Новый минимальный запас может перевести ингредиент в "мало"
+        if change and 'min_quantity' in form.changed_data:
+            refresh_stock_level(obj)
 
 #  ИСТОРИЯ ЗАПАСОВ 
 @admin.register(StockHistory)
@@ -115,6 +143,62 @@ class StockHistoryAdmin(admin.ModelAdmin):
     list_filter = ['operation_type', 'created_at']
     search_fields = ['ingredient__name', 'notes']
     readonly_fields = ['created_at']
+    
+    # Журнал только дополняется через orders.inventory - вручную записи не меняются
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+#  СНИМКИ ЗАПАСОВ 
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    # Снимки запасов (создаются командой snapshot_stock)
+    list_display = ['ingredient', 'quantity', 'last_history_id', 'taken_at']
+    list_filter = ['taken_at']
+    search_fields = ['ingredient__name']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+#  ПАРТИИ ИНГРЕДИЕНТОВ 
+@admin.register(IngredientLot)
+class IngredientLotAdmin(admin.ModelAdmin):
+    # Партии создаются при пополнении и расходуются через журнал запасов
+    list_display = ['ingredient', 'quantity', 'remaining_display', 'cost_per_unit', 'expires_at', 'received_at']
+    list_filter = ['expires_at', 'received_at']
+    search_fields = ['ingredient__name']
+    list_select_related = ['ingredient']
+    
+    def remaining_display(self, obj):
+        return obj.remaining
+    remaining_display.short_description = 'Остаток'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+#  ПРОДАЖИ ПО ДНЯМ 
+@admin.register(DailySalesSummary)
+class DailySalesSummaryAdmin(admin.ModelAdmin):
+    # Сводки создаются командой rollup_daily_sales
+    list_display = ['day', 'revenue', 'payments_count', 'orders_count', 'portions_sold', 'ingredient_spend', 'cogs', 'waste_cost', 'active_customers']
+    date_hierarchy = 'day'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
 
 # Кастомный фильтр для доступности готовых блюд
 class PreparedDishAvailableFilter(admin.SimpleListFilter):
@@ -0,0 +1,169 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DateField, DateTimeField, Max, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import DailyDishSales, DailySalesSummary, Dish, Order, OrderItem, Payment, StockHistory
+from .sales import start_of_day
+
+
+# Размеры интервалов для временных рядов
+BUCKETS = ('hour', 'day', 'week', 'month')
+# Больше интервалов в ряду не строится (и не заполняется нулями) при любом размере интервала:
+# 31 день по часам, около двух лет по дням
+MAX_BUCKETS = 31 * 24
+DEFAULT_RANGE_DAYS = 30
+DEFAULT_WINDOW = 7
+
+
+def _bucket_start(value, bucket):
+    # Начало интервала для даты/времени в часовом поясе проекта
+    if isinstance(value, datetime):
+        value = timezone.localtime(value) if timezone.is_aware(value) else value
+        if bucket == 'hour':
+            return value.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+        value = value.date()
+    if bucket == 'week':
+        return value - timedelta(days=value.weekday())
+    if bucket == 'month':
+        return value.replace(day=1)
+    return value
+
+
+def _bucket_count(start, end, bucket):
+    # Сколько интервалов в диапазоне - без построения их списка
+    if bucket == 'hour':
+        return ((end - start).days + 1) * 24
+    if bucket == 'month':
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    days = (end - _bucket_start(start, bucket)).days
+    return days // 7 + 1 if bucket == 'week' else days + 1
+
+
+def _bucket_keys(start, end, bucket):
+    # Все интервалы диапазона по порядку, включая пустые
+    keys = []
+    if bucket == 'hour':
+        current, last = datetime.combine(start, datetime.min.time()), datetime.combine(end, datetime.max.time())
+        step = timedelta(hours=1)
+    else:
+        current, last = _bucket_start(start, bucket), end
+        step = timedelta(days=7 if bucket == 'week' else 1)
+    while current <= last:
+        keys.append(current)
+        if bucket == 'month':
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+        else:
+            current += step
+    return keys
+
+
+def _truncated(queryset, field, bucket, **aggregates):
+    # Группировка по интервалу средствами БД: {начало интервала: {агрегаты}}
+    output_field = DateTimeField() if bucket == 'hour' else DateField()
+    rows = (queryset.order_by().annotate(bucket=Trunc(field, bucket, output_field=output_field))
+            .values('bucket').annotate(**aggregates))
+    return {_bucket_start(row['bucket'], bucket): row for row in rows}
+
+
+def moving_average(values, window):
+    # Скользящее среднее за один проход по накопленной сумме (без пересчета каждого окна)
+    result = []
+    running = Decimal('0')
+    values = [Decimal(value) for value in values]
+    for index, value in enumerate(values):
+        running += value
+        if index >= window:
+            running -= values[index - window]
+        size = min(index + 1, window)
+        result.append((running / size).quantize(Decimal('0.01')))
+    return result
+
+
+def _add(target, rows, mapping):
+    # Складывает агрегаты из rows в target: {интервал: {метрика: значение}}
+    for key, row in rows.items():
+        for metric, field in mapping.items():
+            target[key][metric] += row[field] or 0
+
+
+def time_series(start, end, bucket='day', window=DEFAULT_WINDOW):
+    # Временные ряды дохода, заказов, затрат на закупки и порций по блюдам за [start, end].
+    # Завершенные дни берутся из сводок продаж, остальное - из подробных записей по индексам дат
+    metrics = defaultdict(lambda: defaultdict(Decimal))
+    dish_portions = defaultdict(lambda: defaultdict(int))
+
+    last_summary_day = DailySalesSummary.objects.aggregate(last=Max('day'))['last']
+    if bucket == 'hour' or last_summary_day is None or last_summary_day < start:
+        live_from = start
+    else:
+        summary_end = min(end, last_summary_day)
+        summaries = DailySalesSummary.objects.filter(day__gte=start, day__lte=summary_end)
+        _add(metrics, _truncated(summaries, 'day', bucket, revenue=Sum('revenue'), orders=Sum('orders_count'),
+                                 spend=Sum('ingredient_spend')),
+             {'revenue': 'revenue', 'orders': 'orders', 'ingredient_spend': 'spend'})
+        dish_rows = (DailyDishSales.objects.filter(day__gte=start, day__lte=summary_end)
+                     .order_by().annotate(bucket=Trunc('day', bucket, output_field=DateField()))
+                     .values('bucket', 'dish_id').annotate(portions=Sum('portions')))
+        for row in dish_rows:
+            dish_portions[row['dish_id']][_bucket_start(row['bucket'], bucket)] += row['portions']
+        live_from = summary_end + timedelta(days=1)
+
+    if live_from <= end:
+        since, until = start_of_day(live_from), start_of_day(end + timedelta(days=1))
+        payments = Payment.objects.filter(status='paid', created_at__gte=since, created_at__lt=until)
+        _add(metrics, _truncated(payments, 'created_at', bucket, revenue=Sum('amount')), {'revenue': 'revenue'})
+        orders = Order.objects.filter(created_at__gte=since, created_at__lt=until).exclude(status='cancelled')
+        _add(metrics, _truncated(orders, 'created_at', bucket, orders=Count('id')), {'orders': 'orders'})
+        restocks = StockHistory.objects.filter(operation_type='restock', created_at__gte=since, created_at__lt=until)
+        _add(metrics, _truncated(restocks, 'created_at', bucket, spend=Sum('total_cost')),
+             {'ingredient_spend': 'spend'})
+
+        output_field = DateTimeField() if bucket == 'hour' else DateField()
+        dish_rows = (OrderItem.objects
+                     .filter(order__created_at__gte=since, order__created_at__lt=until)
+                     .exclude(order__status='cancelled').order_by()
+                     .annotate(bucket=Trunc('order__created_at', bucket, output_field=output_field))
+                     .values('bucket', 'dish_id').annotate(portions=Sum('quantity')))
+        for row in dish_rows:
+            dish_portions[row['dish_id']][_bucket_start(row['bucket'], bucket)] += row['portions']
+
+    keys = _bucket_keys(start, end, bucket)
+    series = {'buckets': [key.isoformat() for key in keys], 'window': window}
+    for metric in ('revenue', 'orders', 'ingredient_spend'):
+        values = [metrics[key][metric] for key in keys]
+        series[metric] = [float(value) if metric != 'orders' else int(value) for value in values]
+        series[f'{metric}_moving_average'] = [float(value) for value in moving_average(values, window)]
+
+    names = dict(Dish.objects.filter(id__in=dish_portions).values_list('id', 'name'))
+    series['portions_by_dish'] = sorted(
+        (
+            {'dish_id': dish_id, 'name': names.get(dish_id, ''),
+             'portions': [portions.get(key, 0) for key in keys]}
+            for dish_id, portions in dish_portions.items()
+        ),
+        key=lambda dish: -sum(dish['portions'])
+    )
+    return series
+
+
+def parse_series_params(params):
+    # Разбор параметров запроса. Возвращает (start, end, bucket, window) или бросает ValueError
+    today = timezone.localdate()
+    end = date.fromisoformat(params['end']) if params.get('end') else today
+    start = date.fromisoformat(params['start']) if params.get('start') else end - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    bucket = params.get('bucket', 'day')
+    window = int(params.get('window', DEFAULT_WINDOW))
+
+    if bucket not in BUCKETS:
+        raise ValueError(f"Интервал должен быть одним из: {', '.join(BUCKETS)}")
+    if start > end:
+        raise ValueError('Начало диапазона позже конца')
+    if _bucket_count(start, end, bucket) > MAX_BUCKETS:
+        raise ValueError(f'Слишком большой диапазон: не более {MAX_BUCKETS} интервалов')
+    if window < 1:
+        raise ValueError('Окно скользящего среднего должно быть положительным')
+    return start, end, bucket, window
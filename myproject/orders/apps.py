@@ -5,3 +5,7 @@ class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'  # Стандартный ID поля
     name = 'orders'  # Название приложения
     verbose_name = 'Заказы'  # Имя в админке
+
+    def ready(self):
+        # Подключаем обработчики сигналов
+        from . import signals  # noqa: F401
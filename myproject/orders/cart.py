@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.cache import cache
+
+
+# Корзина хранится компактной строкой "id_блюда:количество,...": в подписанной cookie и в кэше она занимает
+# в несколько раз меньше места, чем словарь в JSON
+CART_SESSION_KEY = 'cart'
+CART_CACHE_KEY = 'orders:cart:{user_id}'
+
+
+def encode_cart(cart):
+    return ','.join(f'{dish_id}:{quantity}' for dish_id, quantity in cart.items() if quantity > 0)
+
+
+def decode_cart(value):
+    # {str(id блюда): количество}; понимает и старый формат корзины - словарь в сессии
+    if isinstance(value, dict):
+        return {str(dish_id): int(quantity) for dish_id, quantity in value.items()}
+    cart = {}
+    for item in filter(None, (value or '').split(',')):
+        dish_id, _, quantity = item.partition(':')
+        if dish_id.isdigit() and quantity.isdigit():
+            cart[dish_id] = int(quantity)
+    return cart
+
+
+def _use_cache(request):
+    return settings.CART_STORAGE == 'cache' and request.user.is_authenticated
+
+
+def load_cart(request):
+    # Корзина текущего пользователя: из кэша (без обращения к БД) или из сессии
+    if _use_cache(request):
+        value = cache.get(CART_CACHE_KEY.format(user_id=request.user.id))
+        if value is None and CART_SESSION_KEY in request.session:
+            # Корзина, собранная в сессии до перехода на кэш, переносится в кэш один раз
+            cart = decode_cart(request.session.pop(CART_SESSION_KEY))
+            save_cart(request, cart)
+            return cart
+        return decode_cart(value)
+    return decode_cart(request.session.get(CART_SESSION_KEY))
+
+
+def save_cart(request, cart):
+    # Сохраняет корзину; пустая корзина удаляется из хранилища
+    value = encode_cart(cart)
+    if _use_cache(request):
+        key = CART_CACHE_KEY.format(user_id=request.user.id)
+        if value:
+            cache.set(key, value, settings.CART_TTL)
+        else:
+            cache.delete(key)
+    elif value:
+        request.session[CART_SESSION_KEY] = value
+    else:
+        request.session.pop(CART_SESSION_KEY, None)
@@ -0,0 +1,64 @@
+import time
+
+from django.core.cache import cache
+
+from .models import Category, DishIngredient, Ingredient
+
+
+# Справочники каталога (категории, ингредиенты, рецепты) меняются редко, а читаются почти каждой страницей.
+# Ключи содержат номер версии: сброс - это новая версия, старые записи просто истекают
+CATALOG_VERSION_KEY = 'orders:catalog:version'
+CATALOG_KEY = 'orders:catalog:{version}:{name}'
+CATALOG_TIMEOUT = 24 * 60 * 60
+
+
+def catalog_version():
+    # Текущая версия каталога; при пустом кэше (перезапуск, вытеснение) заводится новая
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def invalidate_catalog():
+    # Все закэшированные справочники устаревают разом
+    cache.set(CATALOG_VERSION_KEY, time.time_ns(), None)
+
+
+def cached_catalog(name, build, timeout=CATALOG_TIMEOUT):
+    # Значение справочника name текущей версии; при промахе строится функцией build
+    key = CATALOG_KEY.format(version=catalog_version(), name=name)
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, timeout)
+    return value
+
+
+def catalog_categories():
+    return cached_catalog('categories', lambda: list(Category.objects.all()))
+
+
+def catalog_ingredients():
+    return cached_catalog('ingredients', lambda: list(Ingredient.objects.order_by('name')))
+
+
+def _build_recipes():
+    recipes = {}
+    for item in DishIngredient.objects.select_related('ingredient').order_by('id'):
+        recipes.setdefault(item.dish_id, []).append(item)
+    return recipes
+
+
+def catalog_recipes():
+    # {dish_id: [DishIngredient с ингредиентом], ...} - состав блюд для меню
+    return cached_catalog('recipes', _build_recipes)
+
+
+def attach_recipes(dishes):
+    # Проставляет блюдам dish.recipe из кэша вместо prefetch ингредиентов на каждый запрос
+    recipes = catalog_recipes()
+    for dish in dishes:
+        dish.recipe = recipes.get(dish.id, [])
+    return dishes
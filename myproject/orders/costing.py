@@ -0,0 +1,67 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import F, Sum
+
+from .models import Dish, DishIngredient, OrderItem
+
+
+# Себестоимость блюд хранится в кэше, пока не изменятся рецепты или стоимость ингредиентов
+DISH_COSTS_CACHE_KEY = 'orders:dish_costs'
+DISH_COSTS_CACHE_TIMEOUT = 60 * 60
+
+COST_STEP = Decimal('0.01')
+
+
+def _compute_dish_costs():
+    # Рецепты всех блюд (разреженная матрица блюдо x ингредиент) умножаются на вектор
+    # средних стоимостей ингредиентов - один запрос, без обхода блюд по одному
+    rows = DishIngredient.objects.values_list('dish_id', 'quantity', 'ingredient__cost__average_cost')
+    costs = defaultdict(Decimal)
+    for dish_id, quantity, average_cost in rows:
+        costs[dish_id] += quantity * (average_cost or 0)
+    return {dish_id: cost.quantize(COST_STEP) for dish_id, cost in costs.items()}
+
+
+def dish_costs():
+    # {dish_id: себестоимость порции}. Блюда без рецепта в словаре отсутствуют
+    costs = cache.get(DISH_COSTS_CACHE_KEY)
+    if costs is None:
+        costs = _compute_dish_costs()
+        cache.set(DISH_COSTS_CACHE_KEY, costs, DISH_COSTS_CACHE_TIMEOUT)
+    return costs
+
+
+def invalidate_dish_costs():
+    cache.delete(DISH_COSTS_CACHE_KEY)
+
+
+def attach_dish_margins(dishes):
+    # Добавляет к блюдам себестоимость и маржу: dish.recipe_cost, dish.margin, dish.margin_percent
+    costs = dish_costs()
+    for dish in dishes:
+        dish.recipe_cost = costs.get(dish.id, Decimal('0'))
+        dish.margin = dish.price - dish.recipe_cost
+        dish.margin_percent = round(dish.margin / dish.price * 100, 1) if dish.price else None
+    return dishes
+
+
+def profitability_report():
+    # Прибыльность блюд по продажам: маржа порции x проданные порции, по убыванию
+    sales = {
+        row['dish_id']: row
+        for row in OrderItem.objects.exclude(order__status='cancelled')
+        .values('dish_id').order_by()
+        .annotate(portions=Sum('quantity'), revenue=Sum(F('price_at_time') * F('quantity')))
+    }
+    dishes = attach_dish_margins(list(Dish.objects.select_related('category')))
+    report = []
+    for dish in dishes:
+        sold = sales.get(dish.id, {})
+        dish.portions_sold = sold.get('portions') or 0
+        dish.revenue = sold.get('revenue') or Decimal('0')
+        dish.total_margin = dish.revenue - dish.recipe_cost * dish.portions_sold
+        report.append(dish)
+    report.sort(key=lambda dish: dish.total_margin, reverse=True)
+    return report
@@ -0,0 +1,106 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay, Greatest
+from django.utils import timezone
+
+from .models import DemandCell, OrderItem
+
+
+WEEKDAY_NAMES = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+
+
+def _empty_matrix():
+    # 7 дней недели x 24 часа
+    return [[0] * 24 for _ in range(7)]
+
+
+def _add_portions(order, dish_id, portions):
+    # Изменяет ячейку (день недели, час, блюдо) заказа на portions порций (меньше нуля - уменьшает).
+    # Новую ячейку одновременно могут создавать два заказа: проигравший вставку добавляет порции
+    # обновлением уже созданной строки
+    moment = timezone.localtime(order.created_at)
+    cells = DemandCell.objects.filter(weekday=moment.weekday(), hour=moment.hour, dish_id=dish_id)
+    if portions < 0:
+        cells.update(portions=Greatest(F('portions') + portions, 0))
+        return
+    if cells.update(portions=F('portions') + portions):
+        return
+    try:
+        with transaction.atomic():
+            DemandCell.objects.create(weekday=moment.weekday(), hour=moment.hour, dish_id=dish_id, portions=portions)
+    except IntegrityError:
+        cells.update(portions=F('portions') + portions)
+
+
+def record_order_item(item):
+    # Добавляет порции нового элемента заказа; отмененные заказы в спрос не входят
+    if item.order.status != 'cancelled':
+        _add_portions(item.order, item.dish_id, item.quantity)
+
+
+def forget_order_item(item):
+    # Убирает порции удаляемого элемента заказа
+    if item.order.status != 'cancelled':
+        _add_portions(item.order, item.dish_id, -item.quantity)
+
+
+def forget_order(order):
+    # Убирает из спроса все порции заказа (при отмене)
+    for dish_id, quantity in order.items.values_list('dish_id', 'quantity'):
+        _add_portions(order, dish_id, -quantity)
+
+
+def rebuild_demand_cube():
+    # Полный пересчет по элементам неотмененных заказов. Возвращает количество ячеек
+    rows = (OrderItem.objects.exclude(order__status='cancelled').order_by()
+            .annotate(weekday=ExtractIsoWeekDay('order__created_at'), hour=ExtractHour('order__created_at'))
+            .values('weekday', 'hour', 'dish_id')
+            .annotate(portions=Sum('quantity')))
+    cells = [
+        DemandCell(weekday=row['weekday'] - 1, hour=row['hour'], dish_id=row['dish_id'], portions=row['portions'])
+        for row in rows
+    ]
+    with transaction.atomic():
+        DemandCell.objects.all().delete()
+        DemandCell.objects.bulk_create(cells)
+    return len(cells)
+
+
+def demand_arrays(dish_ids=None):
+    # Матрицы спроса 7x24: {'total': матрица по всем блюдам, 'by_dish': {dish_id: матрица}}.
+    # Используются тепловой картой статистики и планированием приготовления
+    cells = DemandCell.objects.all()
+    if dish_ids is not None:
+        cells = cells.filter(dish_id__in=dish_ids)
+
+    total = _empty_matrix()
+    by_dish = {}
+    for weekday, hour, dish_id, portions in cells.values_list('weekday', 'hour', 'dish_id', 'portions'):
+        total[weekday][hour] += portions
+        by_dish.setdefault(dish_id, _empty_matrix())[weekday][hour] += portions
+    return {'total': total, 'by_dish': by_dish}
+
+
+def hourly_profile(matrix, weekday):
+    # Доля спроса дня недели, приходящаяся на каждый час (для планирования по часам)
+    day = matrix[weekday]
+    total = sum(day)
+    return [portions / total if total else 0.0 for portions in day]
+
+
+def heatmap(matrix):
+    # Данные для тепловой карты: только часы, в которые был спрос, и яркость ячеек от 0 до 1
+    active_hours = [hour for hour in range(24) if any(matrix[weekday][hour] for weekday in range(7))]
+    if not active_hours:
+        return {'hours': [], 'rows': []}
+    hours = list(range(active_hours[0], active_hours[-1] + 1))
+    peak = max(max(row) for row in matrix)
+    rows = [
+        {
+            'weekday': WEEKDAY_NAMES[weekday],
+            'cells': [{'portions': matrix[weekday][hour], 'intensity': round(matrix[weekday][hour] / peak, 2)}
+                      for hour in hours],
+        }
+        for weekday in range(7)
+    ]
+    return {'hours': hours, 'rows': rows}
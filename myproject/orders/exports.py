@@ -0,0 +1,126 @@
+import csv
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import OrderItem, Payment, StockHistory, Transaction
+from .sales import start_of_day
+
+
+# Выгрузки: набор данных -> (модель, поле даты для фильтра, [(заголовок, поле), ...]).
+# Строки читаются через values_list(...).iterator(), поэтому память не растет с размером выгрузки
+EXPORTS = {
+    'orders': (
+        OrderItem,
+        'order__created_at',
+        [
+            ('order_id', 'order_id'),
+            ('created_at', 'order__created_at'),
+            ('status', 'order__status'),
+            ('customer', 'order__customer__username'),
+            ('order_total', 'order__total_price'),
+            ('item_id', 'id'),
+            ('dish', 'dish__name'),
+            ('quantity', 'quantity'),
+            ('price', 'price_at_time'),
+            ('item_status', 'status'),
+        ],
+    ),
+    'payments': (
+        Payment,
+        'created_at',
+        [
+            ('id', 'id'),
+            ('created_at', 'created_at'),
+            ('user', 'user__username'),
+            ('order_id', 'order_id'),
+            ('amount', 'amount'),
+            ('status', 'status'),
+            ('method', 'payment_method'),
+            ('completed_at', 'completed_at'),
+            ('description', 'description'),
+        ],
+    ),
+    'transactions': (
+        Transaction,
+        'created_at',
+        [
+            ('id', 'id'),
+            ('created_at', 'created_at'),
+            ('user', 'user__username'),
+            ('type', 'transaction_type'),
+            ('amount', 'amount'),
+            ('balance_after', 'balance_after'),
+            ('order_id', 'order_id'),
+            ('description', 'description'),
+        ],
+    ),
+    'stock_history': (
+        StockHistory,
+        'created_at',
+        [
+            ('id', 'id'),
+            ('created_at', 'created_at'),
+            ('ingredient', 'ingredient__name'),
+            ('unit', 'ingredient__unit'),
+            ('operation', 'operation_type'),
+            ('quantity_change', 'quantity_change'),
+            ('quantity_before', 'quantity_before'),
+            ('quantity_after', 'quantity_after'),
+            ('total_cost', 'total_cost'),
+            ('performed_by', 'performed_by__username'),
+            ('notes', 'notes'),
+        ],
+    ),
+}
+
+FORMATS = ('csv', 'jsonl')
+CHUNK_SIZE = 2000
+
+
+def _plain(value):
+    # Значение для выгрузки: даты - в местном времени ISO, суммы - строкой без потери точности
+    if isinstance(value, datetime):
+        return timezone.localtime(value).isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if value is None:
+        return ''
+    return value
+
+
+def export_rows(dataset, start=None, end=None):
+    # Заголовки и генератор строк выгрузки за период [start, end] (даты включительно)
+    model, date_field, columns = EXPORTS[dataset]
+    queryset = model.objects.all()
+    if start:
+        queryset = queryset.filter(**{f'{date_field}__gte': start_of_day(start)})
+    if end:
+        queryset = queryset.filter(**{f'{date_field}__lt': start_of_day(end + timedelta(days=1))})
+    rows = (queryset.order_by('id')
+            .values_list(*[field for _, field in columns])
+            .iterator(chunk_size=CHUNK_SIZE))
+    return [header for header, _ in columns], rows
+
+
+class _Echo:
+    # csv.writer пишет строку сюда и сразу получает ее обратно
+    def write(self, value):
+        return value
+
+
+def stream_export(dataset, file_format='csv', start=None, end=None):
+    # Генератор текстовых строк выгрузки: первая строка уходит клиенту до чтения всей таблицы
+    headers, rows = export_rows(dataset, start, end)
+    if file_format == 'csv':
+        writer = csv.writer(_Echo())
+        # BOM - чтобы Excel открыл кириллицу без выбора кодировки
+        yield '\ufeff' + writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow([_plain(value) for value in row])
+    else:
+        for row in rows:
+            record = {header: None if value is None else _plain(value) for header, value in zip(headers, row)}
+            yield json.dumps(record, ensure_ascii=False) + '\n'
@@ -0,0 +1,130 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal, ROUND_CEILING
+
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .inventory import start_of_today
+from .models import StockHistory
+
+
+# Сколько последних дней расхода учитывать
+HISTORY_DAYS = 56
+# Коэффициент экспоненциального сглаживания (чем больше, тем сильнее влияют последние дни)
+SMOOTHING_ALPHA = 0.3
+# Сколько дней идет поставка после запроса
+LEAD_TIME_DAYS = 2
+# На сколько дней вперед закупать
+REVIEW_PERIOD_DAYS = 7
+# Страховой запас в стандартных отклонениях дневного расхода (~95%)
+SAFETY_FACTOR = 1.65
+
+QUANTITY_STEP = Decimal('0.01')
+# До скольких запасов история читается только по их ингредиентам (например, автозапрос по одному запасу
+# внутри транзакции журнала); для больших списков один запрос по всем ингредиентам дешевле длинного IN
+FILTER_LIMIT = 100
+
+
+def _daily_usage(days, ingredient_ids=None):
+    # Расход по дням одним запросом: {ingredient_id: [расход за день, ...]}.
+    # ingredient_ids - только эти ингредиенты (None - все)
+    today_start = start_of_today()
+    first_day = timezone.localdate() - timedelta(days=days)
+
+    rows = StockHistory.objects.filter(operation_type='usage',
+                                       created_at__gte=today_start - timedelta(days=days),
+                                       created_at__lt=today_start)
+    if ingredient_ids is not None:
+        rows = rows.filter(ingredient_id__in=ingredient_ids)
+    rows = (rows
+            .order_by()
+            .annotate(day=TruncDate('created_at'))
+            .values('ingredient_id', 'day')
+            .annotate(used=Sum('quantity_change')))
+
+    series = defaultdict(lambda: [0.0] * days)
+    for row in rows:
+        index = (row['day'] - first_day).days
+        if 0 <= index < days:
+            series[row['ingredient_id']][index] -= float(row['used'])
+    return first_day, series
+
+
+def _weekday_factors(values, weekdays):
+    # Сезонность по дням недели: средний расход в этот день недели / средний расход
+    mean = sum(values) / len(values)
+    sums, counts = [0.0] * 7, [0] * 7
+    for value, weekday in zip(values, weekdays):
+        sums[weekday] += value
+        counts[weekday] += 1
+    return [sums[d] / counts[d] / mean if counts[d] else 1.0 for d in range(7)]
+
+
+def _smoothed_level(values, weekdays, factors):
+    # Экспоненциальное сглаживание расхода без учета сезонности.
+    # Дни недели без расхода (фактор 0, например выходные) уровень не меняют
+    level = None
+    for value, weekday in zip(values, weekdays):
+        if factors[weekday] <= 0:
+            continue
+        value = value / factors[weekday]
+        level = value if level is None else SMOOTHING_ALPHA * value + (1 - SMOOTHING_ALPHA) * level
+    return level or 0.0
+
+
+def _to_quantity(value):
+    return Decimal(str(value)).quantize(QUANTITY_STEP)
+
+
+def forecast_ingredients(stocks, days=HISTORY_DAYS):
+    # Прогноз для всех переданных запасов сразу.
+    # Возвращает {ingredient_id: {'daily_rate', 'days_of_cover', 'reorder_point', 'suggested_quantity'}}
+    stocks = list(stocks)
+    ingredient_ids = [stock.ingredient_id for stock in stocks] if len(stocks) <= FILTER_LIMIT else None
+    first_day, series = _daily_usage(days, ingredient_ids)
+    weekdays = [(first_day + timedelta(days=i)).weekday() for i in range(days)]
+    today = timezone.localdate()
+    next_weekdays = [(today + timedelta(days=i)).weekday()
+                     for i in range(LEAD_TIME_DAYS + REVIEW_PERIOD_DAYS)]
+
+    forecasts = {}
+    for stock in stocks:
+        values = series.get(stock.ingredient_id)
+        current = float(stock.current_quantity)
+
+        if not values or sum(values) <= 0:
+            forecasts[stock.ingredient_id] = {
+                'daily_rate': Decimal('0'),
+                'days_of_cover': None,
+                'reorder_point': stock.min_quantity,
+                'suggested_quantity': _to_quantity(max(0.0, float(stock.min_quantity) * 2 - current)),
+            }
+            continue
+
+        # Дни до первого расхода не учитываем - ингредиент могли добавить недавно
+        first_used = next(i for i, value in enumerate(values) if value > 0)
+        values, value_weekdays = values[first_used:], weekdays[first_used:]
+
+        factors = _weekday_factors(values, value_weekdays)
+        level = _smoothed_level(values, value_weekdays, factors)
+        demand = [level * factors[weekday] for weekday in next_weekdays]
+
+        mean = sum(values) / len(values)
+        deviation = math.sqrt(sum((value - mean) ** 2 for value in values) / len(values))
+        safety_stock = SAFETY_FACTOR * deviation * math.sqrt(LEAD_TIME_DAYS)
+
+        reorder_point = sum(demand[:LEAD_TIME_DAYS]) + safety_stock
+        target = sum(demand) + safety_stock
+        suggested = Decimal(str(max(0.0, target - current))).quantize(Decimal('1'), rounding=ROUND_CEILING)
+
+        forecasts[stock.ingredient_id] = {
+            'daily_rate': _to_quantity(level),
+            'days_of_cover': round(current / level, 1) if level > 0 else None,
+            'reorder_point': _to_quantity(reorder_point),
+            'suggested_quantity': suggested,
+        }
+
+    return forecasts
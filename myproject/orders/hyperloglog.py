@@ -0,0 +1,51 @@
+import math
+from hashlib import blake2b
+
+
+# 2^11 = 2048 однобайтовых регистров: 2 КБ на скетч, стандартная погрешность около 2.3%
+PRECISION = 11
+REGISTERS = 1 << PRECISION
+HASH_BITS = 64
+
+
+def _hash(value):
+    return int.from_bytes(blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    # Приближенное число различных значений. Скетчи с одинаковой точностью объединяются без потерь
+    def __init__(self, registers=None):
+        self.registers = bytearray(registers) if registers is not None else bytearray(REGISTERS)
+        if len(self.registers) != REGISTERS:
+            raise ValueError(f'Скетч должен содержать {REGISTERS} регистров')
+
+    def add(self, value):
+        hashed = _hash(value)
+        index = hashed >> (HASH_BITS - PRECISION)
+        rest = hashed & ((1 << (HASH_BITS - PRECISION)) - 1)
+        # Позиция первой единицы в оставшихся битах
+        rank = HASH_BITS - PRECISION - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        # Объединение множеств: поэлементный максимум регистров
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / REGISTERS)
+        estimate = alpha * REGISTERS * REGISTERS / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * REGISTERS and zeros:
+            # Малые множества: линейный подсчет по пустым регистрам
+            estimate = REGISTERS * math.log(REGISTERS / zeros)
+        return round(estimate)
+
+    def to_bytes(self):
+        return bytes(self.registers)
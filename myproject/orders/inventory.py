@@ -0,0 +1,555 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (IngredientCost, IngredientLot, IngredientStock, StockDailyRollup, StockHistory,
+                     StockLevelCounter, StockSnapshot)
+from .costing import invalidate_dish_costs
+from .units import from_base, to_base
+
+
+# Операции, которые меняют количество на складе.
+# Запрос на пополнение ('request') только записывается в журнал
+STOCK_MOVEMENT_TYPES = ('restock', 'usage', 'adjustment', 'waste')
+
+COST_STEP = Decimal('0.01')
+# Средняя стоимость хранится точнее, чтобы не копить ошибку округления
+AVERAGE_COST_STEP = Decimal('0.0001')
+
+
+class InsufficientStockError(ValueError):
+    # Списание больше, чем есть на складе
+    def __init__(self, ingredient, required, available):
+        self.ingredient = ingredient
+        self.required = required
+        self.available = available
+        super().__init__(f"Не хватает {ingredient.name}: нужно {required}, есть {available}")
+
+
+#  УРОВНИ ЗАПАСОВ
+
+def stock_level(quantity, min_quantity):
+    # Уровень запаса: закончился / мало / достаточно
+    if quantity <= 0:
+        return 'out'
+    if quantity <= min_quantity:
+        return 'low'
+    return 'ok'
+
+
+# Насколько плохой уровень - для определения, что запас "упал"
+_LEVEL_SEVERITY = {'ok': 0, 'low': 1, 'out': 2}
+
+
+def _bump_level_counter(level, delta):
+    if not StockLevelCounter.objects.filter(level=level).update(count=F('count') + delta):
+        StockLevelCounter.objects.create(level=level, count=max(delta, 0))
+
+
+def _apply_stock_levels(stocks):
+    # Пересчитывает уровни запасов и счетчики одним проходом. Если запас упал ниже
+    # минимума или до нуля - создает запрос на пополнение (если открытого запроса еще нет).
+    # Возвращает запасы, у которых изменился уровень (поле level нужно сохранить)
+    deltas = defaultdict(int)
+    changed = []
+    crossed = []
+    for stock in stocks:
+        new_level = stock_level(stock.current_quantity, stock.min_quantity)
+        old_level = stock.level
+        if new_level == old_level:
+            continue
+
+        deltas[old_level] -= 1
+        deltas[new_level] += 1
+        stock.level = new_level
+        changed.append(stock)
+        if _LEVEL_SEVERITY[new_level] > _LEVEL_SEVERITY[old_level]:
+            crossed.append(stock)
+
+    for level, delta in deltas.items():
+        if delta:
+            _bump_level_counter(level, delta)
+    _request_restocks_automatically(crossed)
+    return changed
+
+
+def _request_restocks_automatically(stocks):
+    # Автоматические запросы на пополнение для запасов, упавших ниже минимума, без дублей:
+    # открытые запросы и прогноз читаются одним запросом на всю пачку
+    if not stocks:
+        return
+    open_requests = set(StockHistory.objects.filter(
+        ingredient_id__in=[stock.ingredient_id for stock in stocks],
+        operation_type='request', fulfilled_at__isnull=True
+    ).values_list('ingredient_id', flat=True))
+    stocks = [stock for stock in stocks if stock.ingredient_id not in open_requests]
+    if not stocks:
+        return
+
+    # Импорт внутри функции, чтобы избежать круговой зависимости
+    from .forecasting import forecast_ingredients
+    forecasts = forecast_ingredients(stocks)
+    requests = []
+    for stock in stocks:
+        quantity = forecasts[stock.ingredient_id]['suggested_quantity']
+        if quantity <= 0:
+            quantity = stock.min_quantity
+        requests.append(StockHistory(
+            ingredient_id=stock.ingredient_id,
+            operation_type='request',
+            quantity_change=quantity,
+            quantity_before=stock.current_quantity,
+            quantity_after=stock.current_quantity,
+            notes=f"Автоматический запрос: {stock.get_level_display().lower()}"
+        ))
+    StockHistory.objects.bulk_create(requests)
+
+
+def create_stock(ingredient, min_quantity=None):
+    # Создает пустой запас для нового ингредиента и учитывает его в счетчиках
+    with transaction.atomic():
+        stock = IngredientStock(ingredient=ingredient, current_quantity=0)
+        if min_quantity is not None:
+            stock.min_quantity = min_quantity
+        stock.level = stock_level(stock.current_quantity, stock.min_quantity)
+        stock.save()
+        _bump_level_counter(stock.level, 1)
+    return stock
+
+
+def refresh_stock_level(stock):
+    # Пересчет уровня после изменения минимального запаса
+    with transaction.atomic():
+        stock = IngredientStock.objects.select_for_update().get(id=stock.id)
+        if _apply_stock_levels([stock]):
+            stock.save(update_fields=['level'])
+    return stock
+
+
+def recount_stock_levels():
+    # Полный пересчет уровней и счетчиков (после массовых изменений, например минимальных запасов).
+    # Для запасов, чей уровень стал хуже, создаются автоматические запросы на пополнение
+    with transaction.atomic():
+        stocks = IngredientStock.objects.all()
+        crossed = []
+        for stock in stocks.select_for_update().filter(current_quantity__lte=F('min_quantity')).exclude(level='out'):
+            new_level = stock_level(stock.current_quantity, stock.min_quantity)
+            if _LEVEL_SEVERITY[new_level] > _LEVEL_SEVERITY[stock.level]:
+                stock.level = new_level
+                crossed.append(stock)
+
+        stocks.filter(current_quantity__lte=0).update(level='out')
+        stocks.filter(current_quantity__gt=0, current_quantity__lte=F('min_quantity')).update(level='low')
+        stocks.filter(current_quantity__gt=F('min_quantity')).update(level='ok')
+
+        counts = dict(stocks.order_by().values('level').annotate(total=Count('id')).values_list('level', 'total'))
+        for level, _ in IngredientStock.LEVEL_CHOICES:
+            StockLevelCounter.objects.update_or_create(level=level, defaults={'count': counts.get(level, 0)})
+        _request_restocks_automatically(crossed)
+
+
+def stock_level_counts():
+    # Сколько ингредиентов мало и сколько закончилось (из счетчиков, без пересчета запасов)
+    counts = dict(StockLevelCounter.objects.values_list('level', 'count'))
+    return counts.get('low', 0), counts.get('out', 0)
+
+
+#  ЖУРНАЛ ОПЕРАЦИЙ
+
+def _locked_stock(ingredient):
+    # Запас ингредиента, заблокированный до конца транзакции
+    stock = IngredientStock.objects.select_for_update().filter(ingredient=ingredient).first()
+    if stock is None:
+        stock = create_stock(ingredient)
+    return stock
+
+
+def record_stock_changes(changes, user=None, allow_negative=True):
+    # Несколько операций одной транзакцией: журнал - одним bulk_create, запасы - одним bulk_update.
+    # changes - список словарей: ingredient, operation_type, quantity_change, [total_cost], [notes],
+    # [expires_at] - срок годности партии при пополнении.
+    # Пополнение обновляет цену закупки и средневзвешенную стоимость ингредиента,
+    # расход без указанной стоимости оценивается по средневзвешенной стоимости.
+    # Возвращает созданные записи StockHistory в том же порядке
+    with transaction.atomic():
+        ingredients = {change['ingredient'].id: change['ingredient'] for change in changes}
+        stocks = {
+            stock.ingredient_id: stock
+            for stock in IngredientStock.objects.select_for_update().filter(ingredient_id__in=ingredients)
+        }
+        for ingredient_id, ingredient in ingredients.items():
+            if ingredient_id not in stocks:
+                stocks[ingredient_id] = create_stock(ingredient)
+        costs = {
+            cost.ingredient_id: cost
+            for cost in IngredientCost.objects.select_for_update().filter(ingredient_id__in=ingredients)
+        }
+        existing_costs = set(costs)
+
+        now = timezone.now()
+        entries = []
+        moved = {}
+        new_lots = []
+        consumed = defaultdict(int)
+        repriced = set()
+        for change in changes:
+            ingredient = change['ingredient']
+            operation_type = change['operation_type']
+            quantity_change = Decimal(change['quantity_change'])
+            stock = stocks[ingredient.id]
+
+            quantity_before = stock.current_quantity
+            if operation_type in STOCK_MOVEMENT_TYPES:
+                quantity_after = quantity_before + quantity_change
+                base_change = to_base(quantity_change, ingredient.unit)
+            else:
+                quantity_after = quantity_before
+                base_change = 0
+
+            # Проверка остатка - целочисленная, в базовых единицах
+            if not allow_negative and stock.quantity_base + base_change < 0:
+                raise InsufficientStockError(ingredient, -quantity_change, quantity_before)
+
+            total_cost = Decimal(change.get('total_cost') or 0)
+            if operation_type == 'restock' and quantity_change > 0:
+                unit_cost = total_cost / quantity_change
+                _update_average_cost(costs, ingredient.id, quantity_before, quantity_change, total_cost, unit_cost, now)
+                repriced.add(ingredient.id)
+            else:
+                unit_cost = costs[ingredient.id].average_cost if ingredient.id in costs else Decimal('0')
+                # Себестоимость расхода на момент списания
+                if base_change < 0 and not total_cost:
+                    total_cost = (-quantity_change * unit_cost).quantize(COST_STEP)
+
+            entry = StockHistory(
+                ingredient=ingredient,
+                operation_type=operation_type,
+                quantity_change=quantity_change,
+                quantity_before=quantity_before,
+                quantity_after=quantity_after,
+                total_cost=total_cost,
+                performed_by=user,
+                notes=change.get('notes', '')
+            )
+            entries.append(entry)
+
+            if base_change > 0:
+                # Приход - новая партия. Если запас был отрицательным, недостача покрывается первой
+                lot_base = min(base_change, stock.quantity_base + base_change)
+                if lot_base > 0:
+                    new_lots.append(_new_lot(entry, lot_base, unit_cost, change.get('expires_at'), now))
+            elif base_change < 0:
+                consumed[ingredient.id] -= base_change
+
+            if quantity_after != quantity_before:
+                stock.current_quantity = quantity_after
+                stock.quantity_base += base_change
+                if operation_type == 'restock':
+                    stock.last_restocked = now
+                moved[ingredient.id] = stock
+
+        StockHistory.objects.bulk_create(entries)
+        IngredientLot.objects.bulk_create(new_lots)
+        _save_costs(costs, repriced, existing_costs)
+        for ingredient_id, amount in consumed.items():
+            _consume_lots(ingredient_id, amount)
+        if moved:
+            _apply_stock_levels(moved.values())
+            IngredientStock.objects.bulk_update(moved.values(), ['current_quantity', 'quantity_base', 'last_restocked', 'level'])
+
+    return entries
+
+
+def _update_average_cost(costs, ingredient_id, quantity_before, quantity_change, total_cost, unit_cost, now):
+    # Средневзвешенная стоимость после поступления - O(1), без пересчета истории:
+    # (остаток * средняя + стоимость поступления) / (остаток + поступление)
+    cost = costs.get(ingredient_id)
+    if cost is None:
+        cost = costs[ingredient_id] = IngredientCost(ingredient_id=ingredient_id, average_cost=unit_cost)
+    else:
+        held = max(quantity_before, Decimal('0'))
+        cost.average_cost = (held * cost.average_cost + total_cost) / (held + quantity_change)
+    cost.average_cost = cost.average_cost.quantize(AVERAGE_COST_STEP)
+    # Цена последней закупки - по ней заполняются формы пополнения
+    cost.cost_per_unit = unit_cost.quantize(COST_STEP)
+    cost.last_updated = now
+
+
+def _save_costs(costs, repriced, existing_ids):
+    # Сохраняет стоимости, измененные поступлениями
+    if not repriced:
+        return
+    IngredientCost.objects.bulk_update(
+        [costs[ingredient_id] for ingredient_id in repriced if ingredient_id in existing_ids],
+        ['cost_per_unit', 'average_cost', 'last_updated'])
+    IngredientCost.objects.bulk_create(
+        [costs[ingredient_id] for ingredient_id in repriced if ingredient_id not in existing_ids])
+    invalidate_dish_costs()
+
+
+def _new_lot(entry, lot_base, unit_cost, expires_at, now):
+    # Партия для прихода: срок годности из формы или по сроку хранения ингредиента
+    ingredient = entry.ingredient
+    if expires_at is None and ingredient.shelf_life_days is not None:
+        expires_at = timezone.localdate(now) + timedelta(days=ingredient.shelf_life_days)
+    return IngredientLot(
+        ingredient=ingredient,
+        restock_entry=entry,
+        quantity=entry.quantity_change,
+        remaining_base=lot_base,
+        cost_per_unit=unit_cost.quantize(COST_STEP),
+        expires_at=expires_at,
+    )
+
+
+def _consume_lots(ingredient_id, amount):
+    # Расход по FIFO: сначала партии, которые раньше испортятся, затем более старые.
+    # Читаются только головные партии, пока не наберется нужное количество
+    lots = (IngredientLot.objects.select_for_update()
+            .filter(ingredient_id=ingredient_id, remaining_base__gt=0)
+            .order_by(F('expires_at').asc(nulls_last=True), 'received_at', 'id'))
+    touched = []
+    for lot in lots.iterator(chunk_size=8):
+        if amount <= 0:
+            break
+        taken = min(amount, lot.remaining_base)
+        lot.remaining_base -= taken
+        amount -= taken
+        touched.append(lot)
+    IngredientLot.objects.bulk_update(touched, ['remaining_base'])
+
+
+def record_stock_change(ingredient, operation_type, quantity_change, user=None,
+                        notes='', total_cost=0, allow_negative=True, expires_at=None):
+    # Одна операция: запись в журнал и обновление IngredientStock в одной транзакции
+    return record_stock_changes([{
+        'ingredient': ingredient,
+        'operation_type': operation_type,
+        'quantity_change': quantity_change,
+        'total_cost': total_cost,
+        'notes': notes,
+        'expires_at': expires_at,
+    }], user=user, allow_negative=allow_negative)[0]
+
+
+def set_stock_quantity(ingredient, new_quantity, user=None, notes=''):
+    # Корректировка до нужного количества (инвентаризация, правка в админке)
+    with transaction.atomic():
+        stock = _locked_stock(ingredient)
+        change = Decimal(new_quantity) - stock.current_quantity
+        return record_stock_change(ingredient, 'adjustment', change, user=user, notes=notes)
+
+
+#  ПАРТИИ И СПИСАНИЕ
+
+def write_off_expired_lots(today=None, user=None):
+    # Списывает все просроченные партии: одна операция 'waste' на ингредиент.
+    # Расход идет по FIFO, поэтому списываются именно просроченные партии. Возвращает записи журнала
+    today = today or timezone.localdate()
+    with transaction.atomic():
+        expired = (IngredientLot.objects.select_for_update().select_related('ingredient')
+                   .filter(remaining_base__gt=0, expires_at__lt=today))
+        totals = {}
+        for lot in expired:
+            ingredient, amount, cost, lots_count = totals.get(lot.ingredient_id, (lot.ingredient, 0, Decimal('0'), 0))
+            lot_quantity = from_base(lot.remaining_base, ingredient.unit)
+            totals[lot.ingredient_id] = (ingredient, amount + lot.remaining_base,
+                                         cost + lot_quantity * lot.cost_per_unit, lots_count + 1)
+
+        changes = [
+            {
+                'ingredient': ingredient,
+                'operation_type': 'waste',
+                'quantity_change': -from_base(amount, ingredient.unit),
+                'total_cost': cost,
+                'notes': f"Списание просроченных партий: {lots_count}",
+            }
+            for ingredient, amount, cost, lots_count in totals.values()
+        ]
+        return record_stock_changes(changes, user=user) if changes else []
+
+
+def next_expiry_dates(ingredient_ids):
+    # Ближайший срок годности непустых партий: {ingredient_id: дата}
+    return dict(
+        IngredientLot.objects.filter(ingredient_id__in=ingredient_ids, remaining_base__gt=0,
+                                     expires_at__isnull=False)
+        .order_by().values('ingredient_id').annotate(first_expiry=Min('expires_at'))
+        .values_list('ingredient_id', 'first_expiry')
+    )
+
+
+#  ЗАПРОСЫ НА ПОПОЛНЕНИЕ
+
+def fulfill_restock_requests(costs, user=None, notes=''):
+    # Выполняет запросы на пополнение одной транзакцией.
+    # costs - {id запроса: стоимость за единицу}. Цены ингредиентов обновляются вместе с запасами.
+    # Возвращает выполненные запросы
+    with transaction.atomic():
+        restock_requests = list(
+            StockHistory.objects.select_for_update().select_related('ingredient')
+            .filter(id__in=costs, operation_type='request', fulfilled_at__isnull=True)
+            .order_by('id')
+        )
+        if not restock_requests:
+            return []
+
+        now = timezone.now()
+        changes = []
+        for restock_request in restock_requests:
+            cost_per_unit = costs[restock_request.id]
+            total_cost = restock_request.quantity_change * cost_per_unit
+
+            restock_request.total_cost = total_cost
+            restock_request.notes += f" | Выполнено: {notes}"
+            restock_request.fulfilled_at = now
+
+            changes.append({
+                'ingredient': restock_request.ingredient,
+                'operation_type': 'restock',
+                'quantity_change': restock_request.quantity_change,
+                'total_cost': total_cost,
+                'notes': f"Выполнение запроса #{restock_request.id}: {notes}",
+            })
+
+        record_stock_changes(changes, user=user)
+        StockHistory.objects.bulk_update(restock_requests, ['total_cost', 'notes', 'fulfilled_at'])
+
+    return restock_requests
+
+
+#  СНИМКИ И ЗАПАС НА МОМЕНТ ВРЕМЕНИ
+
+def take_stock_snapshots():
+    # Сохраняет снимок запаса всех ингредиентов. Возвращает количество снимков
+    with transaction.atomic():
+        last_ids = dict(
+            StockHistory.objects.filter(operation_type__in=STOCK_MOVEMENT_TYPES)
+            .values('ingredient_id').annotate(last_id=Max('id'))
+            .values_list('ingredient_id', 'last_id')
+        )
+        now = timezone.now()
+        snapshots = [
+            StockSnapshot(
+                ingredient_id=stock.ingredient_id,
+                quantity=stock.current_quantity,
+                last_history_id=last_ids.get(stock.ingredient_id, 0),
+                taken_at=now
+            )
+            for stock in IngredientStock.objects.select_for_update()
+        ]
+        StockSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+
+def stock_at(ingredient, moment):
+    # Запас ингредиента на момент времени: ближайший снимок + операции после него
+    snapshot = (StockSnapshot.objects
+                .filter(ingredient=ingredient, taken_at__lte=moment)
+                .order_by('-taken_at').first())
+
+    entries = StockHistory.objects.filter(
+        ingredient=ingredient,
+        operation_type__in=STOCK_MOVEMENT_TYPES,
+        created_at__lte=moment
+    )
+    quantity = Decimal('0')
+    if snapshot:
+        quantity = snapshot.quantity
+        entries = entries.filter(id__gt=snapshot.last_history_id)
+
+    return quantity + (entries.aggregate(Sum('quantity_change'))['quantity_change__sum'] or Decimal('0'))
+
+
+#  СВОДКИ ЖУРНАЛА ПО ДНЯМ
+
+def start_of_today():
+    # Начало текущих суток в часовом поясе проекта
+    return timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+
+def rollup_watermark():
+    # Последняя запись журнала, уже попавшая в сводки
+    return StockDailyRollup.objects.aggregate(last=Max('last_history_id'))['last'] or 0
+
+
+def roll_up_stock_history():
+    # Досчитывает сводки по завершенным дням. Возвращает число обработанных записей.
+    # Отметка last_history_id предполагает, что id записей журнала растут вместе с днем created_at:
+    # запись прошедшего дня с id меньше записи сегодняшнего дня в сводки уже не попадет.
+    # Журнал пишет записи с текущим временем; генератор данных (seeding) выдает id по порядку дней
+    with transaction.atomic():
+        entries = StockHistory.objects.filter(
+            id__gt=rollup_watermark(),
+            created_at__lt=start_of_today(),
+            operation_type__in=STOCK_MOVEMENT_TYPES
+        ).order_by()
+        last_id = entries.aggregate(last=Max('id'))['last']
+        if last_id is None:
+            return 0
+
+        grouped = (entries.filter(id__lte=last_id)
+                   .annotate(day=TruncDate('created_at'))
+                   .values('day', 'ingredient_id', 'operation_type')
+                   .annotate(quantity=Sum('quantity_change'), cost=Sum('total_cost'), count=Count('id')))
+
+        totals = {(row['day'], row['ingredient_id'], row['operation_type']): row for row in grouped}
+        existing = {
+            (rollup.day, rollup.ingredient_id, rollup.operation_type): rollup
+            for rollup in StockDailyRollup.objects.filter(day__in={key[0] for key in totals})
+        }
+
+        to_create, to_update = [], []
+        for key, row in totals.items():
+            rollup = existing.get(key)
+            if rollup is None:
+                rollup = StockDailyRollup(day=key[0], ingredient_id=key[1], operation_type=key[2])
+                to_create.append(rollup)
+            else:
+                to_update.append(rollup)
+            rollup.quantity_change += row['quantity']
+            rollup.total_cost += row['cost']
+            rollup.entries_count += row['count']
+            rollup.last_history_id = last_id
+
+        StockDailyRollup.objects.bulk_create(to_create)
+        StockDailyRollup.objects.bulk_update(
+            to_update, ['quantity_change', 'total_cost', 'entries_count', 'last_history_id'])
+
+    return sum(row['count'] for row in totals.values())
+
+
+def compact_stock_history(retention_days):
+    # Удаляет старые записи журнала, которые уже учтены и в сводках, и в снимке запаса,
+    # чтобы stock_at() после снимка по-прежнему считался точно
+    cutoff = start_of_today() - timedelta(days=retention_days)
+    covered_by_snapshot = (StockSnapshot.objects
+                           .filter(ingredient=OuterRef('ingredient'), taken_at__lte=cutoff)
+                           .order_by('-taken_at')
+                           .values('last_history_id')[:1])
+
+    deleted, _ = StockHistory.objects.filter(
+        created_at__lt=cutoff,
+        operation_type__in=STOCK_MOVEMENT_TYPES,
+        id__lte=rollup_watermark()
+    ).filter(id__lte=Subquery(covered_by_snapshot)).delete()
+    return deleted
+
+
+def operation_cost_totals(operation_type='restock'):
+    # Общая сумма и сумма за сегодня по типу операции: сводки + еще не свернутые записи
+    watermark = rollup_watermark()
+    rolled_up = (StockDailyRollup.objects.filter(operation_type=operation_type)
+                 .aggregate(total=Sum('total_cost'))['total'] or Decimal('0'))
+
+    live = StockHistory.objects.filter(operation_type=operation_type, id__gt=watermark)
+    live_total = live.aggregate(total=Sum('total_cost'))['total'] or Decimal('0')
+    today_total = (live.filter(created_at__gte=start_of_today())
+                   .aggregate(total=Sum('total_cost'))['total'] or Decimal('0'))
+
+    return rolled_up + live_total, today_total
@@ -0,0 +1,493 @@
+import http.cookiejar
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from decimal import Decimal
+from queue import Empty, Queue
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Sum
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from users.models import CustomUser
+
+from .inventory import STOCK_MOVEMENT_TYPES, record_stock_changes, recount_stock_levels
+from .models import (Category, Dish, DishIngredient, Ingredient, IngredientStock, Order, OrderItem,
+                     PreparedDish, StockHistory, Transaction)
+from .units import to_base
+
+
+# Данные нагрузочного теста помечены префиксом и удаляются перед новым заполнением
+PREFIX = 'rush'
+STUDENT_PREFIX = f'{PREFIX}-student-'
+CHEF_PREFIX = f'{PREFIX}-chef-'
+INGREDIENT_PREFIX = f'{PREFIX} '
+CATEGORY_NAME = 'Нагрузочный тест: обед'
+PASSWORD = 'rush-lunch-break'
+
+# Сценарий ученика: меню -> CART_SIZE раз "в корзину" -> корзина -> оформление заказа
+CART_SIZE = 3
+# Повар за один подход готовит CHEF_BATCH порций и отмечает готовыми до CHEF_ORDERS заказов
+CHEF_BATCH = 10
+CHEF_ORDERS = 20
+CHEF_PAUSE = 0.2
+# Запись в SQLite дольше порога считается ожиданием блокировки
+LOCK_WAIT_SECONDS = 0.01
+PERCENTILES = (50, 95, 99)
+
+
+class LoadTestError(Exception):
+    pass
+
+
+#  ЗАПОЛНЕНИЕ
+
+def clear_school():
+    # Удаляет учеников, поваров, блюда и ингредиенты прошлого прогона
+    CustomUser.objects.filter(username__startswith=f'{PREFIX}-').delete()
+    Category.objects.filter(name=CATEGORY_NAME).delete()
+    Ingredient.objects.filter(name__startswith=INGREDIENT_PREFIX).delete()
+    recount_stock_levels()
+
+
+def seed_school(students=500, chefs=2, dishes=20, ingredients=30, seed=1):
+    # Школа для большой перемены: готовых порций примерно на половину спроса, остальное - из запасов
+    # и того, что успеют приготовить повара; часть учеников не сможет оплатить полный заказ
+    rng = random.Random(seed)
+    clear_school()
+
+    with transaction.atomic():
+        password = make_password(PASSWORD)
+        users = [
+            CustomUser(username=f'{STUDENT_PREFIX}{number:04d}', email=f'{STUDENT_PREFIX}{number:04d}@example.com',
+                       role='student', balance=Decimal(rng.randrange(150, 900, 10)), password=password)
+            for number in range(students)
+        ]
+        users += [
+            CustomUser(username=f'{CHEF_PREFIX}{number}', email=f'{CHEF_PREFIX}{number}@example.com',
+                       role='chef', password=password)
+            for number in range(chefs)
+        ]
+        CustomUser.objects.bulk_create(users)
+        Transaction.objects.bulk_create([
+            Transaction(user=user, amount=user.balance, balance_after=user.balance,
+                        transaction_type='deposit', description='Начальный баланс нагрузочного теста')
+            for user in users if user.balance
+        ])
+
+        products = Ingredient.objects.bulk_create([
+            Ingredient(name=f'{INGREDIENT_PREFIX}ингредиент {number:02d}', unit='г') for number in range(ingredients)
+        ])
+        record_stock_changes([
+            {'ingredient': product, 'operation_type': 'restock', 'quantity_change': Decimal(rng.randrange(5000, 20000)),
+             'total_cost': Decimal(rng.randrange(1000, 5000)), 'notes': 'Начальный запас нагрузочного теста'}
+            for product in products
+        ])
+
+        category = Category.objects.create(name=CATEGORY_NAME)
+        menu = [
+            Dish.objects.create(name=f'Обед {number:02d}', description='', price=Decimal(rng.randrange(60, 160, 5)),
+                                category=category)
+            for number in range(dishes)
+        ]
+        recipes = []
+        for dish in menu:
+            for product in rng.sample(products, k=min(rng.randint(2, 5), len(products))):
+                quantity = Decimal(rng.randrange(30, 200, 10))
+                recipes.append(DishIngredient(dish=dish, ingredient=product, quantity=quantity,
+                                              quantity_base=to_base(quantity, product.unit)))
+        DishIngredient.objects.bulk_create(recipes)
+
+        portions = max(students * CART_SIZE // (2 * max(dishes, 1)), 1)
+        PreparedDish.objects.bulk_create([
+            PreparedDish(dish=dish, quantity=portions, max_quantity=portions * 2) for dish in menu
+        ])
+    return {'students': students, 'chefs': chefs, 'dishes': dishes, 'ingredients': ingredients}
+
+
+@contextmanager
+def benchmark_database():
+    # Отдельная база на время прогона, как у тестов: рабочие данные не затрагиваются.
+    # SQLite - во временном файле, а не в памяти, чтобы блокировки были как у настоящего сервера
+    directory = None
+    if connection.vendor == 'sqlite':
+        directory = tempfile.mkdtemp(prefix='lunch_rush_')
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directory, 'lunch_rush.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if directory:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def cart_writes_database():
+    # True, если корзина лежит в сессии, которая хранится в БД: каждый клик по корзине - запись в django_session
+    return settings.CART_STORAGE == 'session' and settings.SESSION_MODE in ('db', 'cached_db')
+
+
+def database_profile():
+    # Параметры базы, кэша и сессий, с которыми сделан замер
+    database = settings.DATABASES['default']
+    profile = {
+        'profile': settings.DB_PROFILE,
+        'vendor': connection.vendor,
+        'conn_max_age': database.get('CONN_MAX_AGE', 0),
+        'transaction_mode': database.get('OPTIONS', {}).get('transaction_mode'),
+        'pool': bool(database.get('OPTIONS', {}).get('pool')),
+        'cache_backend': settings.CACHE_BACKEND,
+        'session_mode': settings.SESSION_MODE,
+        'cart_storage': settings.CART_STORAGE,
+        'cart_writes_db': cart_writes_database(),
+    }
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {pragma}')
+                profile[pragma] = cursor.fetchone()[0]
+    return profile
+
+
+#  КЛИЕНТЫ
+
+class LocalSession:
+    # Запросы через WSGI-обработчик Django в этом же процессе (как у тестового клиента).
+    # Хост - первый из ALLOWED_HOSTS, а при пустом списке localhost (его DEBUG разрешает)
+    def __init__(self, user):
+        hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+        self.client = Client(raise_request_exception=False, HTTP_HOST=hosts[0] if hosts else 'localhost')
+        self.client.force_login(user)
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, response.get('Location', ''), response.content
+
+    def post(self, path, data=None):
+        response = self.client.post(path, data or {})
+        return response.status_code, response.get('Location', ''), response.content
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Редиректы не выполняются: по адресу перехода определяется результат действия
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    # Запросы к запущенному серверу (runserver, testserver, gunicorn): вход через форму, cookie и CSRF-токен
+    def __init__(self, base_url, username):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+        self.get(reverse('login'))
+        status, _, _ = self.post(reverse('login'), {'username': username, 'password': PASSWORD})
+        if status != 302:
+            raise LoadTestError(f'Не удалось войти как {username}: ответ {status}')
+
+    def _open(self, request):
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                return response.status, response.headers.get('Location', ''), response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.headers.get('Location', ''), error.read()
+
+    def get(self, path):
+        return self._open(urllib.request.Request(self.base_url + path))
+
+    def post(self, path, data=None):
+        data = dict(data or {})
+        data['csrfmiddlewaretoken'] = next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+        return self._open(urllib.request.Request(self.base_url + path, data=urllib.parse.urlencode(data).encode()))
+
+
+#  ЗАМЕРЫ
+
+def percentile(values, percent):
+    # Перцентиль по ближайшему рангу; values отсортированы
+    if not values:
+        return None
+    return values[max(math.ceil(percent / 100 * len(values)), 1) - 1]
+
+
+class Recorder:
+    # Задержки по точкам входа, ошибки и исходы оформления заказов (общий для всех потоков)
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.outcomes = Counter()
+        self.prepared = Counter()
+        self._lock = threading.Lock()
+
+    def timed(self, endpoint, call, *args):
+        started = time.perf_counter()
+        status, location, body = call(*args)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies[endpoint].append(elapsed)
+            if status >= 400:
+                self.errors[endpoint] += 1
+        return status, location, body
+
+    def count(self, counter, key, amount=1):
+        with self._lock:
+            counter[key] += amount
+
+    def endpoint_stats(self):
+        stats = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            stats[endpoint] = {'requests': len(latencies), 'errors': self.errors[endpoint]}
+            for percent in PERCENTILES:
+                stats[endpoint][f'p{percent}_ms'] = round(percentile(latencies, percent) * 1000, 1)
+            stats[endpoint]['max_ms'] = round(latencies[-1] * 1000, 1)
+        return stats
+
+
+class LockMonitor:
+    # Время записывающих SQL-операторов. В SQLite ожидание блокировки записи проходит внутри
+    # BEGIN IMMEDIATE или самого оператора (до timeout), поэтому долгая запись - это ожидание
+    WRITES = ('BEGIN', 'INSERT', 'UPDATE', 'DELETE', 'SAVEPOINT')
+
+    def __init__(self):
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(self.WRITES):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as error:
+            if 'locked' in str(error):
+                with self._lock:
+                    self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if elapsed >= LOCK_WAIT_SECONDS:
+                with self._lock:
+                    self.waits += 1
+                    self.wait_seconds += elapsed
+
+    def report(self):
+        return {'waits': self.waits, 'wait_ms': round(self.wait_seconds * 1000, 1), 'errors': self.errors}
+
+
+#  СЦЕНАРИИ
+
+def _order_outcome(status, location):
+    # Чем закончилось оформление заказа - по ответу create_order
+    if status >= 500:
+        return 'server_error'
+    if status == 200:
+        return 'unavailable'
+    for outcome, name in (('ordered', 'my_orders'), ('insufficient_funds', 'my_balance'),
+                          ('empty_cart', 'menu'), ('failed', 'view_cart')):
+        if location.endswith(reverse(name)):
+            return outcome
+    return f'http_{status}'
+
+
+def _student_visit(session, dish_ids, recorder):
+    recorder.timed('menu', session.get, reverse('menu'))
+    for dish_id in dish_ids:
+        recorder.timed('add_to_cart', session.get, reverse('add_to_cart', args=[dish_id]))
+    recorder.timed('view_cart', session.get, reverse('view_cart'))
+    status, location, _ = recorder.timed('create_order', session.post, reverse('create_order'))
+    recorder.count(recorder.outcomes, _order_outcome(status, location))
+
+
+def _student_worker(visits, recorder, monitor):
+    try:
+        with ExitStack() as stack:
+            if monitor is not None:
+                stack.enter_context(connection.execute_wrapper(monitor))
+            while True:
+                try:
+                    session, dish_ids = visits.get_nowait()
+                except Empty:
+                    return
+                try:
+                    _student_visit(session, dish_ids, recorder)
+                except (OSError, LoadTestError):
+                    recorder.count(recorder.outcomes, 'client_error')
+    finally:
+        connections.close_all()
+
+
+def _chef_worker(session, dish_ids, rng, stop, recorder, monitor):
+    # Повар готовит порции и отмечает заказы готовыми. Страницы со списком заказов повара нет,
+    # поэтому заказы в статусе "готовится" берутся прямо из базы
+    try:
+        with ExitStack() as stack:
+            if monitor is not None:
+                stack.enter_context(connection.execute_wrapper(monitor))
+            while not stop.is_set():
+                dish_id = rng.choice(dish_ids)
+                _, _, body = recorder.timed('chef_prepare_dishes', session.post, reverse('chef_prepare_dishes'),
+                                            {'dish_id': dish_id, 'quantity': CHEF_BATCH})
+                if 'Приготовлено'.encode() in body:
+                    recorder.count(recorder.prepared, dish_id, CHEF_BATCH)
+                preparing = (Order.objects.filter(status='preparing', customer__username__startswith=STUDENT_PREFIX)
+                             .order_by('created_at').values_list('id', flat=True)[:CHEF_ORDERS])
+                for order_id in list(preparing):
+                    recorder.timed('update_order_status', session.post,
+                                   reverse('update_order_status', args=[order_id]), {'status': 'ready'})
+                stop.wait(CHEF_PAUSE)
+    finally:
+        connections.close_all()
+
+
+#  ПРОВЕРКИ
+
+def _prepared_portions():
+    return dict(PreparedDish.objects.filter(dish__category__name=CATEGORY_NAME)
+                .values('dish_id').order_by().annotate(total=Sum('quantity')).values_list('dish_id', 'total'))
+
+
+def take_snapshot():
+    # Состояние перед перерывом: готовые порции, балансы учеников и запасы
+    return {
+        'at': timezone.now(),
+        'prepared': _prepared_portions(),
+        'balances': dict(CustomUser.objects.filter(username__startswith=STUDENT_PREFIX).values_list('id', 'balance')),
+        'stock': dict(IngredientStock.objects.filter(ingredient__name__startswith=INGREDIENT_PREFIX)
+                      .values_list('ingredient_id', 'current_quantity')),
+    }
+
+
+def check_consistency(snapshot, chef_prepared):
+    # Инварианты после перерыва. Готовые порции: было + приготовлено поварами - продано из готовых = осталось
+    # (больше осталось - порция продана дважды, меньше - потеряно приготовленное).
+    # Балансы и запасы должны сходиться с журналами транзакций и движения запасов за время прогона
+    since = snapshot['at']
+    run_orders = Order.objects.filter(customer_id__in=snapshot['balances'], created_at__gte=since)
+    sold = dict(OrderItem.objects.filter(order__in=run_orders, status='ready')
+                .values('dish_id').order_by().annotate(total=Sum('quantity')).values_list('dish_id', 'total'))
+    prepared = _prepared_portions()
+    oversold = lost = 0
+    for dish_id in set(snapshot['prepared']) | set(prepared) | set(chef_prepared):
+        expected = snapshot['prepared'].get(dish_id, 0) + chef_prepared.get(dish_id, 0) - sold.get(dish_id, 0)
+        actual = prepared.get(dish_id, 0)
+        oversold += max(actual - expected, 0)
+        lost += max(expected - actual, 0)
+
+    movements = dict(Transaction.objects.filter(user_id__in=snapshot['balances'], created_at__gte=since)
+                     .values('user_id').order_by().annotate(total=Sum('amount')).values_list('user_id', 'total'))
+    balances = dict(CustomUser.objects.filter(id__in=snapshot['balances']).values_list('id', 'balance'))
+    balance_mismatches = sum(
+        1 for user_id, balance in balances.items()
+        if balance != snapshot['balances'][user_id] + movements.get(user_id, 0)
+    )
+
+    changes = dict(StockHistory.objects.filter(ingredient_id__in=snapshot['stock'], created_at__gte=since,
+                                               operation_type__in=STOCK_MOVEMENT_TYPES)
+                   .values('ingredient_id').order_by().annotate(total=Sum('quantity_change'))
+                   .values_list('ingredient_id', 'total'))
+    stock = dict(IngredientStock.objects.filter(ingredient_id__in=snapshot['stock'])
+                 .values_list('ingredient_id', 'current_quantity'))
+    stock_mismatches = sum(
+        1 for ingredient_id, quantity in stock.items()
+        if quantity != snapshot['stock'][ingredient_id] + changes.get(ingredient_id, 0)
+    )
+
+    report = {
+        'oversold_portions': oversold,
+        'lost_prepared_portions': lost,
+        'balance_mismatches': balance_mismatches,
+        'negative_balances': sum(1 for balance in balances.values() if balance < 0),
+        'unpaid_orders': run_orders.exclude(payments__status='paid').count(),
+        'stock_mismatches': stock_mismatches,
+        'negative_stock': sum(1 for quantity in stock.values() if quantity < 0),
+    }
+    report['violations'] = sum(report.values())
+    return report
+
+
+#  ПРОГОН
+
+def run_lunch_rush(concurrency=50, seed=1, url=None):
+    # Большая перемена: все ученики школы оформляют обед через concurrency параллельных клиентов,
+    # повара параллельно готовят. Без url запросы идут через WSGI-обработчик в этом процессе
+    students = list(CustomUser.objects.filter(username__startswith=STUDENT_PREFIX).order_by('username'))
+    chefs = list(CustomUser.objects.filter(username__startswith=CHEF_PREFIX).order_by('username'))
+    dish_ids = list(Dish.objects.filter(category__name=CATEGORY_NAME).order_by('id').values_list('id', flat=True))
+    if not students or not dish_ids:
+        raise LoadTestError('Нет данных нагрузочного теста: сначала заполните школу (seed_school)')
+
+    rng = random.Random(seed)
+    # Популярность блюд убывает как 1/ранг: несколько блюд разбирают быстрее остальных
+    weights = [1 / rank for rank in range(1, len(dish_ids) + 1)]
+    carts = [rng.choices(dish_ids, weights, k=CART_SIZE) for _ in students]
+
+    if url:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            sessions = list(pool.map(lambda user: HttpSession(url, user.username), students + chefs))
+        monitor = None
+    else:
+        sessions = [LocalSession(user) for user in students + chefs]
+        monitor = LockMonitor() if connection.vendor == 'sqlite' else None
+    student_sessions, chef_sessions = sessions[:len(students)], sessions[len(students):]
+
+    visits = Queue()
+    for session, cart in zip(student_sessions, carts):
+        visits.put((session, cart))
+    snapshot = take_snapshot()
+    recorder = Recorder()
+    stop = threading.Event()
+
+    started = time.perf_counter()
+    chef_threads = [
+        threading.Thread(target=_chef_worker, args=(session, dish_ids, random.Random(seed + number), stop, recorder, monitor))
+        for number, session in enumerate(chef_sessions)
+    ]
+    student_threads = [
+        threading.Thread(target=_student_worker, args=(visits, recorder, monitor))
+        for _ in range(concurrency)
+    ]
+    for thread in chef_threads + student_threads:
+        thread.start()
+    for thread in student_threads:
+        thread.join()
+    duration = time.perf_counter() - started
+    stop.set()
+    for thread in chef_threads:
+        thread.join()
+
+    return {
+        'started_at': snapshot['at'].isoformat(),
+        'mode': 'http' if url else 'wsgi',
+        'url': url,
+        'students': len(students),
+        'chefs': len(chefs),
+        'dishes': len(dish_ids),
+        'concurrency': concurrency,
+        'seed': seed,
+        'database': database_profile(),
+        'duration_s': round(duration, 2),
+        'orders_per_second': round(recorder.outcomes['ordered'] / duration, 2) if duration else None,
+        'outcomes': dict(recorder.outcomes),
+        'endpoints': recorder.endpoint_stats(),
+        'chef_prepared_portions': sum(recorder.prepared.values()),
+        # Ожидания блокировок видны только при запросах в этом же процессе
+        'sqlite_locks': monitor.report() if monitor is not None else None,
+        'consistency': check_consistency(snapshot, recorder.prepared),
+    }
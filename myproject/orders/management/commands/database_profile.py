@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from orders.loadtest import cart_writes_database
+
+
+# Проверка, что настройки профиля базы данных действительно применились к соединению
+class Command(BaseCommand):
+    help = 'Показывает профиль базы данных (DB_PROFILE) и фактические параметры соединения'
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES['default']
+        self.stdout.write(f'Профиль: {settings.DB_PROFILE} ({connection.vendor})')
+        self.stdout.write(f"CONN_MAX_AGE: {database['CONN_MAX_AGE']}, "
+                          f"проверка соединений: {database.get('CONN_HEALTH_CHECKS', False)}")
+        self.stdout.write(f'Кэш: {settings.CACHE_BACKEND}, сессии: {settings.SESSION_MODE}, '
+                          f'корзина: {settings.CART_STORAGE}')
+        if cart_writes_database():
+            self.stdout.write(self.style.WARNING(
+                'Корзина хранится в сессии в БД: каждое изменение корзины пишет в django_session '
+                '(нужен общий кэш для CART_STORAGE=cache или SESSION_MODE=signed_cookies)'
+            ))
+
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size'):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    self.stdout.write(f'{pragma}: {cursor.fetchone()[0]}')
+            else:
+                cursor.execute('SHOW server_version')
+                self.stdout.write(f'Версия сервера: {cursor.fetchone()[0]}')
+                pool = database['OPTIONS'].get('pool')
+                self.stdout.write(f"Пул соединений: {pool if pool else 'нет'}")
@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from orders.exports import EXPORTS, FORMATS, stream_export
+
+
+# Выгрузка заказов, платежей, транзакций или журнала запасов в CSV / JSONL
+class Command(BaseCommand):
+    help = 'Выгружает данные в CSV или JSONL построчно, не загружая таблицу в память'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(EXPORTS), help='Что выгружать')
+        parser.add_argument('--format', choices=FORMATS, default='csv', help='Формат файла')
+        parser.add_argument('--start', type=date.fromisoformat, help='С даты (ГГГГ-ММ-ДД)')
+        parser.add_argument('--end', type=date.fromisoformat, help='По дату включительно (ГГГГ-ММ-ДД)')
+        parser.add_argument('--output', help='Файл для выгрузки (по умолчанию - стандартный вывод)')
+
+    def handle(self, *args, **options):
+        lines = stream_export(options['dataset'], options['format'], options['start'], options['end'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(lines)
+            self.stderr.write(self.style.SUCCESS(f"Выгрузка сохранена: {options['output']}"))
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
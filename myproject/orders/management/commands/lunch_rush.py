@@ -0,0 +1,69 @@
+import json
+import logging
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.loadtest import LoadTestError, benchmark_database, run_lunch_rush, seed_school
+
+
+# Нагрузочный тест большой перемены. По умолчанию создает отдельную временную базу, заполняет ее
+# и гоняет запросы через WSGI-обработчик в этом процессе. С --url нагружает запущенный сервер
+# (runserver, testserver, gunicorn) с теми же настройками - его базу надо заранее заполнить через --seed-only
+class Command(BaseCommand):
+    help = 'Нагрузочный тест обеда: задержки по страницам, заказы в секунду, блокировки и нарушения целостности'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=500, help='Сколько учеников приходит на перемену')
+        parser.add_argument('--chefs', type=int, default=2)
+        parser.add_argument('--dishes', type=int, default=20)
+        parser.add_argument('--concurrency', type=int, default=50, help='Параллельных клиентов')
+        parser.add_argument('--seed', type=int, default=1, help='Зерно генератора: одинаковые данные и заказы')
+        parser.add_argument('--url', help='Адрес запущенного сервера, например http://127.0.0.1:8000')
+        parser.add_argument('--seed-only', action='store_true',
+                            help='Только заполнить текущую базу данными теста (для прогона с --url)')
+        parser.add_argument('--output', help='Файл для отчета JSON (по умолчанию lunch_rush_<время>.json)')
+
+    def handle(self, *args, **options):
+        school = {key: options[key] for key in ('students', 'chefs', 'dishes', 'seed')}
+        if options['seed_only']:
+            seed_school(**school)
+            self.stdout.write(self.style.SUCCESS(f"Школа заполнена: {options['students']} учеников"))
+            return
+
+        # Журнал медленных запросов на время прогона молчит: под нагрузкой медленные почти все
+        request_log = logging.getLogger('orders.requests')
+        level = request_log.level
+        request_log.setLevel(logging.ERROR)
+        try:
+            if options['url']:
+                report = run_lunch_rush(options['concurrency'], options['seed'], options['url'])
+            else:
+                with benchmark_database():
+                    seed_school(**school)
+                    report = run_lunch_rush(options['concurrency'], options['seed'])
+        except LoadTestError as error:
+            raise CommandError(str(error))
+        finally:
+            request_log.setLevel(level)
+
+        output = options['output'] or f"lunch_rush_{datetime.now():%Y%m%d-%H%M%S}.json"
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        self.print_report(report, output)
+
+    def print_report(self, report, output):
+        self.stdout.write(f"База: {report['database']['profile']} ({report['database'].get('journal_mode', '-')}), "
+                          f"режим: {report['mode']}, клиентов: {report['concurrency']}")
+        self.stdout.write(f"{'Страница':<22}{'запросов':>9}{'ошибок':>8}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}")
+        for endpoint, stats in report['endpoints'].items():
+            self.stdout.write(f"{endpoint:<22}{stats['requests']:>9}{stats['errors']:>8}"
+                              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+        self.stdout.write(f"Заказов в секунду: {report['orders_per_second']} за {report['duration_s']} с; "
+                          f"исходы: {report['outcomes']}")
+        if report['sqlite_locks'] is not None:
+            self.stdout.write(f"Ожидания блокировок SQLite: {report['sqlite_locks']}")
+        consistency = report['consistency']
+        style = self.style.SUCCESS if not consistency['violations'] else self.style.ERROR
+        self.stdout.write(style(f'Целостность: {consistency}'))
+        self.stdout.write(f'Отчет: {output}')
@@ -0,0 +1,77 @@
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.loadtest import benchmark_database, database_profile
+from orders.microbench import (REPEAT, THRESHOLD, build_benchmarks, compare, load_baseline, run_benchmarks,
+                               save_baseline)
+
+
+STATUS_LABELS = {
+    'new': 'новый',
+    'ok': 'ок',
+    'faster': 'быстрее',
+    'slower': 'МЕДЛЕННЕЕ',
+    'more_queries': 'БОЛЬШЕ ЗАПРОСОВ',
+}
+
+
+# Микробенчмарки горячих путей (проверка и резерв ингредиентов, списание баланса, корзина, комбо-наборы)
+# на разных размерах рецепта, запасов и корзины. Гоняются в отдельной временной базе; результаты
+# сравниваются с сохраненным эталоном (--save-baseline записывает текущие результаты как эталон)
+class Command(BaseCommand):
+    help = 'Микробенчмарки горячих путей: время и число SQL-запросов в сравнении с эталоном'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=REPEAT, help='Сколько раз вызывать каждый путь')
+        parser.add_argument('--only', help='Только замеры, в названии которых есть эта подстрока')
+        parser.add_argument('--baseline', default='microbench_baseline.json', help='Файл эталона')
+        parser.add_argument('--save-baseline', action='store_true', help='Записать результаты как новый эталон')
+        parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                            help='Допустимый рост медианы времени, процентов')
+        parser.add_argument('--strict', action='store_true',
+                            help='Завершиться с ошибкой, если есть замедления или лишние запросы')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть не меньше 1')
+        baseline = load_baseline(options['baseline'])
+
+        # Журнал медленных запросов молчит: корзина на 20 блюд превышает порог запросов намеренно
+        request_log = logging.getLogger('orders.requests')
+        level = request_log.level
+        request_log.setLevel(logging.ERROR)
+        try:
+            with benchmark_database():
+                results = run_benchmarks(build_benchmarks(), options['repeat'], options['only'])
+                database = database_profile()
+        finally:
+            request_log.setLevel(level)
+
+        rows = compare(results, baseline, options['threshold'])
+        self.print_table(rows, baseline)
+        if options['save_baseline']:
+            save_baseline(options['baseline'], results, options['repeat'], database)
+            self.stdout.write(self.style.SUCCESS(f"Эталон записан: {options['baseline']}"))
+
+        regressions = [row for row in rows if row['status'] in ('slower', 'more_queries')]
+        if regressions and options['strict']:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+
+    def print_table(self, rows, baseline):
+        if baseline is None:
+            self.stdout.write('Эталона нет: сравнивать не с чем (запишите его с --save-baseline)')
+        self.stdout.write(f"{'Путь':<32}{'случай':<24}{'запросов':>14}{'медиана, мс':>22}{'изм.':>9}  итог")
+        for row in rows:
+            queries = (str(row['queries']) if row['base_queries'] is None
+                       else f"{row['base_queries']} -> {row['queries']}")
+            timing = (f"{row['median_ms']:.3f}" if row['base_median_ms'] is None
+                      else f"{row['base_median_ms']:.3f} -> {row['median_ms']:.3f}")
+            change = '' if row['change'] is None else f"{row['change']:+.1f}%"
+            line = (f"{row['name']:<32}{row['case']:<24}{queries:>14}{timing:>22}{change:>9}  "
+                    f"{STATUS_LABELS[row['status']]}")
+            if row['status'] in ('slower', 'more_queries'):
+                line = self.style.ERROR(line)
+            elif row['status'] == 'faster':
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from orders.demand import rebuild_demand_cube
+
+
+# Полный пересчет спроса по дням недели и часам (после импорта или удаления заказов)
+class Command(BaseCommand):
+    help = 'Пересчитывает спрос по дням недели, часам и блюдам по всем заказам'
+
+    def handle(self, *args, **options):
+        cells = rebuild_demand_cube()
+        self.stdout.write(self.style.SUCCESS(f'Ячеек спроса: {cells}'))
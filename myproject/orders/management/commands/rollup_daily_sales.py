@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from orders.sales import roll_up_daily_sales
+
+
+# Сводки продаж по дням для страницы статистики (запускать по расписанию раз в сутки ночью)
+class Command(BaseCommand):
+    help = 'Обновляет сводки продаж, закупок и списаний по завершенным дням'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild-days', type=int, default=0,
+                            help='Пересчитать заново последние N дней')
+
+    def handle(self, *args, **options):
+        days = roll_up_daily_sales(rebuild_days=options['rebuild_days'])
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано дней: {days}'))
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.inventory import compact_stock_history, roll_up_stock_history
+
+
+# Сводки журнала запасов по дням (запускать по расписанию, например раз в сутки ночью)
+class Command(BaseCommand):
+    help = 'Обновляет сводки журнала запасов по дням и удаляет старые подробные записи'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=settings.STOCK_HISTORY_RETENTION_DAYS,
+                            help='Сколько дней хранить подробные записи')
+        parser.add_argument('--no-compact', action='store_true',
+                            help='Только обновить сводки, записи не удалять')
+
+    def handle(self, *args, **options):
+        rolled_up = roll_up_stock_history()
+        self.stdout.write(f'Добавлено в сводки записей: {rolled_up}')
+
+        if not options['no_compact']:
+            deleted = compact_stock_history(options['retention_days'])
+            self.stdout.write(f'Удалено старых записей: {deleted}')
+
+        self.stdout.write(self.style.SUCCESS('Готово'))
@@ -0,0 +1,38 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.seeding import BATCH_SIZE, PRESETS, SEED_PASSWORD, SeedError, seed_canteen
+
+
+# Заполняет базу данными столовой за несколько учебных лет: для проверки запросов и отчетов
+# на объемах, близких к реальным. Одинаковое --seed дает одинаковые данные
+class Command(BaseCommand):
+    help = 'Синтетические данные столовой: ученики, блюда, заказы, платежи, движение запасов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--preset', choices=sorted(PRESETS), default='small',
+                            help='Размер: small - минуты работы, large - около миллиона заказов')
+        parser.add_argument('--seed', type=int, default=1, help='Зерно генератора')
+        parser.add_argument('--students', type=int)
+        parser.add_argument('--dishes', type=int)
+        parser.add_argument('--ingredients', type=int)
+        parser.add_argument('--days', type=int, help='Сколько дней истории до сегодня')
+        parser.add_argument('--orders-per-day', type=int)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--flush', action='store_true', help='Сначала удалить все данные из базы')
+        parser.add_argument('--skip-rollups', action='store_true',
+                            help='Не пересчитывать сводки продаж, спроса и снимки запасов')
+
+    def handle(self, *args, **options):
+        if options['flush']:
+            call_command('flush', interactive=False, verbosity=0)
+        overrides = {key: options[key] for key in ('students', 'dishes', 'ingredients', 'days', 'orders_per_day')}
+        try:
+            counts, duration = seed_canteen(options['preset'], seed=options['seed'], rollups=not options['skip_rollups'],
+                                            batch_size=options['batch_size'], **overrides)
+        except SeedError as error:
+            raise CommandError(f'{error}. Используйте --flush или отдельную базу (DB_PROFILE)')
+
+        for model, count in sorted(counts.items()):
+            self.stdout.write(f'{model:<16}{count:>12}')
+        self.stdout.write(self.style.SUCCESS(f'Готово за {duration:.0f} с. Пароль всех пользователей: {SEED_PASSWORD}'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.inventory import stock_at, take_stock_snapshots
+from orders.models import IngredientStock
+
+
+# Периодический снимок запасов (запускать по расписанию, например раз в сутки)
+class Command(BaseCommand):
+    help = 'Сохраняет снимок запасов всех ингредиентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Сверить текущие запасы с журналом перед снимком')
+
+    def handle(self, *args, **options):
+        if options['check']:
+            now = timezone.now()
+            drift = 0
+            for stock in IngredientStock.objects.select_related('ingredient'):
+                expected = stock_at(stock.ingredient, now)
+                if expected != stock.current_quantity:
+                    drift += 1
+                    self.stdout.write(self.style.WARNING(
+                        f'{stock.ingredient.name}: на складе {stock.current_quantity}, по журналу {expected}'
+                    ))
+            if not drift:
+                self.stdout.write('Запасы совпадают с журналом')
+
+        count = take_stock_snapshots()
+        self.stdout.write(self.style.SUCCESS(f'Сохранено снимков: {count}'))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from orders.forecasting import forecast_ingredients
+from orders.inventory import recount_stock_levels
+from orders.models import IngredientStock
+
+
+# Пересчет минимального запаса по прогнозу расхода (например, раз в неделю)
+class Command(BaseCommand):
+    help = 'Обновляет минимальный запас ингредиентов по прогнозу расхода'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать новые значения, ничего не сохранять')
+
+    def handle(self, *args, **options):
+        stocks = list(IngredientStock.objects.select_related('ingredient'))
+        forecasts = forecast_ingredients(stocks)
+
+        changed = []
+        for stock in stocks:
+            forecast = forecasts[stock.ingredient_id]
+            # Без истории расхода оставляем минимальный запас как есть
+            if forecast['days_of_cover'] is None or forecast['reorder_point'] == stock.min_quantity:
+                continue
+            self.stdout.write(f'{stock.ingredient.name}: {stock.min_quantity} → {forecast["reorder_point"]} {stock.unit}')
+            stock.min_quantity = forecast['reorder_point']
+            changed.append(stock)
+
+        if not options['dry_run']:
+            IngredientStock.objects.bulk_update(changed, ['min_quantity'])
+            recount_stock_levels()
+        self.stdout.write(self.style.SUCCESS(f'Обновлено ингредиентов: {len(changed)}'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.inventory import write_off_expired_lots
+from orders.models import IngredientLot
+
+
+# Списание просроченных партий (запускать по расписанию каждую ночь)
+class Command(BaseCommand):
+    help = 'Списывает просроченные партии ингредиентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать просроченные партии, ничего не списывать')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            expired = (IngredientLot.objects.select_related('ingredient')
+                       .filter(remaining_base__gt=0, expires_at__lt=timezone.localdate()))
+            for lot in expired:
+                self.stdout.write(str(lot))
+            self.stdout.write(self.style.SUCCESS(f'Просроченных партий: {len(expired)}'))
+            return
+
+        entries = write_off_expired_lots()
+        for entry in entries:
+            self.stdout.write(f'{entry.ingredient.name}: {entry.quantity_change} {entry.ingredient.unit}, '
+                              f'{entry.total_cost} руб.')
+        self.stdout.write(self.style.SUCCESS(f'Списано ингредиентов: {len(entries)}'))
@@ -0,0 +1,199 @@
+import json
+import time
+from decimal import Decimal
+from statistics import median
+
+from django.contrib.auth.hashers import make_password
+from django.db import connections, transaction
+from django.urls import reverse
+
+from users.models import CustomUser
+
+from .inventory import record_stock_changes
+from .loadtest import LocalSession
+from .middleware import QueryStats
+from .models import Category, ComboItem, ComboSet, Dish, DishIngredient, Ingredient, PreparedDish
+from .units import to_base
+from .views import check_combo_availability
+
+
+# Размеры, по которым гоняются горячие пути:
+# рецепт - ингредиентов в блюде, запас - открытых партий на ингредиент (глубина FIFO),
+# корзина - блюд в корзине или комбо-наборе, готовые - записей PreparedDish у блюда
+RECIPE_SIZES = (1, 5, 20)
+STOCK_SIZES = (1, 10, 100)
+CART_SIZES = (1, 5, 20)
+PREPARED_SIZES = (1, 5, 20)
+REPEAT = 20
+# Рост медианы больше порога (в процентах) - замедление; любой рост числа запросов - регрессия
+THRESHOLD = 25
+PREFIX = 'bench'
+
+
+class Benchmark:
+    # Один замер: функция без аргументов, вызываемая repeat раз. Каждый вызов - в транзакции,
+    # которая затем откатывается, поэтому изменяющие данные пути каждый раз стартуют с одного состояния.
+    # prepare (если есть) выполняется перед вызовом и в замер не входит
+    def __init__(self, name, case, call, prepare=None):
+        self.name = name
+        self.case = case
+        self.call = call
+        self.prepare = prepare
+
+    @property
+    def key(self):
+        return f'{self.name}[{self.case}]'
+
+    def run(self, repeat):
+        timings = []
+        queries = []
+        for _ in range(repeat):
+            with transaction.atomic():
+                if self.prepare is not None:
+                    self.prepare()
+                stats = QueryStats()
+                with connections['default'].execute_wrapper(stats):
+                    started = time.perf_counter()
+                    self.call()
+                    timings.append(time.perf_counter() - started)
+                queries.append(stats.count)
+                transaction.set_rollback(True)
+        return {
+            'name': self.name,
+            'case': self.case,
+            'queries': max(queries),
+            'median_ms': round(median(timings) * 1000, 3),
+            'min_ms': round(min(timings) * 1000, 3),
+        }
+
+
+#  ДАННЫЕ
+
+def _ingredients(count, lots):
+    # Ингредиенты с lots партиями каждый: по 1 кг на партию
+    products = Ingredient.objects.bulk_create([
+        Ingredient(name=f'{PREFIX} ингредиент {number:03d} ({lots} партий)', unit='г') for number in range(count)
+    ])
+    record_stock_changes([
+        {'ingredient': product, 'operation_type': 'restock', 'quantity_change': Decimal(1000),
+         'total_cost': Decimal(100), 'notes': f'{PREFIX}: партия {lot + 1}'}
+        for lot in range(lots) for product in products
+    ])
+    return products
+
+
+def _dish(category, name, products, prepared=1):
+    # Блюдо по 10 г каждого ингредиента и prepared записей готовых порций
+    dish = Dish.objects.create(name=name, description='', price=Decimal(100), category=category)
+    DishIngredient.objects.bulk_create([
+        DishIngredient(dish=dish, ingredient=product, quantity=Decimal(10), quantity_base=to_base(10, product.unit))
+        for product in products
+    ])
+    PreparedDish.objects.bulk_create([
+        PreparedDish(dish=dish, quantity=100, max_quantity=200) for _ in range(prepared)
+    ])
+    return dish
+
+
+def _student():
+    return CustomUser.objects.create(username=f'{PREFIX}-student', email=f'{PREFIX}-student@example.com',
+                                     role='student', balance=Decimal(1000000), password=make_password(None))
+
+
+def build_benchmarks(recipe_sizes=RECIPE_SIZES, stock_sizes=STOCK_SIZES, cart_sizes=CART_SIZES,
+                     prepared_sizes=PREPARED_SIZES):
+    # Заполняет базу данными для всех размеров и возвращает список замеров
+    category = Category.objects.create(name=f'{PREFIX}: горячие пути')
+    student = _student()
+    benchmarks = []
+
+    for lots in stock_sizes:
+        products = _ingredients(max(recipe_sizes), lots)
+        for size in recipe_sizes:
+            dish = _dish(category, f'{PREFIX} рецепт {size} / партий {lots}', products[:size])
+            case = f'рецепт={size} партий={lots}'
+            benchmarks += [
+                Benchmark('Dish.check_availability', case, lambda dish=dish: dish.check_availability(5)),
+                Benchmark('Dish.reserve_ingredients', case, lambda dish=dish: dish.reserve_ingredients(5, student)),
+            ]
+
+    for prepared in prepared_sizes:
+        dish = _dish(category, f'{PREFIX} готовых {prepared}', [], prepared)
+        benchmarks.append(Benchmark('Dish.get_max_available_quantity', f'готовых={prepared}',
+                                    dish.get_max_available_quantity))
+
+    benchmarks.append(Benchmark('CustomUser.deduct_balance', '-',
+                                lambda: student.deduct_balance(Decimal(100), f'{PREFIX}: списание')))
+
+    # Корзина и комбо-наборы: блюда только из готовых порций
+    cart_dishes = [_dish(category, f'{PREFIX} корзина {number:02d}', []) for number in range(max(cart_sizes))]
+    session = LocalSession(student)
+    for size in cart_sizes:
+        combo = ComboSet.objects.create(name=f'{PREFIX} набор {size}', created_by=student,
+                                        total_price=Decimal(100) * size)
+        ComboItem.objects.bulk_create([ComboItem(combo_set=combo, dish=dish) for dish in cart_dishes[:size]])
+        benchmarks.append(Benchmark('check_combo_availability', f'блюд={size}',
+                                    lambda combo=combo: check_combo_availability(combo)))
+
+        def fill_cart(dishes=cart_dishes[:size]):
+            for dish in dishes:
+                session.post(reverse('update_cart', args=[dish.id]), {'quantity': 1})
+
+        benchmarks += [
+            Benchmark('view_cart', f'блюд={size}', lambda: session.get(reverse('view_cart')), fill_cart),
+            Benchmark('create_order', f'блюд={size}', lambda: session.post(reverse('create_order')), fill_cart),
+        ]
+    return benchmarks
+
+
+#  ЗАПУСК И СРАВНЕНИЕ
+
+def run_benchmarks(benchmarks, repeat=REPEAT, only=None):
+    # Результаты замеров; only - подстрока в названии замера
+    return [benchmark.run(repeat) for benchmark in benchmarks if not only or only in benchmark.key]
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    # Строки таблицы сравнения с эталоном: было/стало, изменение медианы в процентах и итог
+    previous = (baseline or {}).get('results', {})
+    rows = []
+    for result in results:
+        key = f"{result['name']}[{result['case']}]"
+        row = dict(result, key=key, base_queries=None, base_median_ms=None, change=None)
+        before = previous.get(key)
+        if before is None:
+            row['status'] = 'new'
+        else:
+            row['base_queries'] = before['queries']
+            row['base_median_ms'] = before['median_ms']
+            if before['median_ms']:
+                row['change'] = round((result['median_ms'] / before['median_ms'] - 1) * 100, 1)
+            if result['queries'] > before['queries']:
+                row['status'] = 'more_queries'
+            elif row['change'] is not None and row['change'] > threshold:
+                row['status'] = 'slower'
+            elif result['queries'] < before['queries'] or (row['change'] is not None and row['change'] < -threshold):
+                row['status'] = 'faster'
+            else:
+                row['status'] = 'ok'
+        rows.append(row)
+    return rows
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results, repeat, database):
+    # database - параметры базы, на которой сделаны замеры (database_profile)
+    baseline = {
+        'database': database,
+        'repeat': repeat,
+        'results': {f"{result['name']}[{result['case']}]": result for result in results},
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(baseline, file, ensure_ascii=False, indent=2)
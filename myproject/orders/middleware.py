@@ -0,0 +1,54 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('orders.requests')
+
+
+class QueryStats:
+    # Обертка выполнения SQL (connection.execute_wrapper): количество запросов и суммарное время
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class QueryStatsMiddleware:
+    # Считает SQL-запросы и их время для каждого HTTP-запроса (request.query_stats),
+    # медленные запросы и запросы с лишними обращениями к БД пишет в журнал orders.requests.
+    # Запросы потоковых ответов, выполняемые после возврата из view, не учитываются
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = request.query_stats = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        total_ms, sql_ms = duration * 1000, stats.duration * 1000
+        if settings.DEBUG:
+            response['Server-Timing'] = f'db;dur={sql_ms:.1f};desc="{stats.count} queries", total;dur={total_ms:.1f}'
+        if total_ms >= settings.SLOW_REQUEST_MS or stats.count >= settings.SLOW_REQUEST_QUERIES:
+            logger.warning('Медленный запрос %s %s: %d, %.0f мс, SQL: %d запросов за %.0f мс',
+                           request.method, request.get_full_path(), response.status_code,
+                           total_ms, stats.count, sql_ms)
+        else:
+            logger.debug('%s %s: %d, %.0f мс, SQL: %d запросов за %.0f мс',
+                         request.method, request.get_full_path(), response.status_code,
+                         total_ms, stats.count, sql_ms)
+        return response
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0018_comboorder_main_order'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Количество')),
+                ('last_history_id', models.PositiveBigIntegerField(default=0, verbose_name='Последняя запись журнала')),
+                ('taken_at', models.DateTimeField(verbose_name='Момент снимка')),
+            ],
+            options={
+                'verbose_name': 'Снимок запаса',
+                'verbose_name_plural': 'Снимки запасов',
+                'ordering': ['-taken_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockhistory',
+            index=models.Index(fields=['ingredient', 'created_at'], name='stockhistory_ingr_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockhistory',
+            index=models.Index(fields=['operation_type', 'created_at'], name='stockhistory_op_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='stocksnapshot',
+            name='ingredient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='orders.ingredient', verbose_name='Ингредиент'),
+        ),
+        migrations.AddIndex(
+            model_name='stocksnapshot',
+            index=models.Index(fields=['ingredient', '-taken_at'], name='stocksnapshot_ingr_taken_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0019_stocksnapshot_stockhistory_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('operation_type', models.CharField(choices=[('restock', 'Пополнение'), ('usage', 'Использование'), ('adjustment', 'Корректировка'), ('waste', 'Списание (брак)'), ('request', 'Запрос на пополнение')], max_length=20, verbose_name='Тип операции')),
+                ('quantity_change', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Изменение количества')),
+                ('total_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Общая стоимость')),
+                ('entries_count', models.PositiveIntegerField(default=0, verbose_name='Количество операций')),
+                ('last_history_id', models.PositiveBigIntegerField(default=0, verbose_name='Последняя запись журнала')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='orders.ingredient', verbose_name='Ингредиент')),
+            ],
+            options={
+                'verbose_name': 'Сводка запасов за день',
+                'verbose_name_plural': 'Сводки запасов по дням',
+                'ordering': ['-day', 'ingredient'],
+                'indexes': [models.Index(fields=['operation_type', 'day'], name='stockrollup_op_day_idx')],
+                'unique_together': {('day', 'ingredient', 'operation_type')},
+            },
+        ),
+    ]
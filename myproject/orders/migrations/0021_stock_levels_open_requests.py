@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:21
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def fill_stock_levels(apps, schema_editor):
+    # Уровни и счетчики для уже существующих запасов
+    IngredientStock = apps.get_model('orders', 'IngredientStock')
+    StockLevelCounter = apps.get_model('orders', 'StockLevelCounter')
+    StockHistory = apps.get_model('orders', 'StockHistory')
+
+    IngredientStock.objects.filter(current_quantity__lte=0).update(level='out')
+    IngredientStock.objects.filter(current_quantity__gt=0, current_quantity__lte=F('min_quantity')).update(level='low')
+    IngredientStock.objects.filter(current_quantity__gt=F('min_quantity')).update(level='ok')
+
+    counts = dict(IngredientStock.objects.order_by().values('level').annotate(total=Count('id')).values_list('level', 'total'))
+    for level in ('ok', 'low', 'out'):
+        StockLevelCounter.objects.create(level=level, count=counts.get(level, 0))
+
+    # Уже выполненные запросы отмечались только в примечании
+    StockHistory.objects.filter(operation_type='request', notes__contains='| Выполнено').update(fulfilled_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0020_stockdailyrollup'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLevelCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('ok', 'Достаточно'), ('low', 'Мало'), ('out', 'Закончился')], max_length=10, unique=True, verbose_name='Уровень запаса')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество ингредиентов')),
+            ],
+            options={
+                'verbose_name': 'Счетчик уровня запасов',
+                'verbose_name_plural': 'Счетчики уровней запасов',
+            },
+        ),
+        migrations.AddField(
+            model_name='ingredientstock',
+            name='level',
+            field=models.CharField(choices=[('ok', 'Достаточно'), ('low', 'Мало'), ('out', 'Закончился')], db_index=True, default='out', max_length=10, verbose_name='Уровень запаса'),
+        ),
+        migrations.AddField(
+            model_name='stockhistory',
+            name='fulfilled_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Запрос выполнен'),
+        ),
+        migrations.AddIndex(
+            model_name='stockhistory',
+            index=models.Index(condition=models.Q(('fulfilled_at__isnull', True), ('operation_type', 'request')), fields=['ingredient'], name='stockhistory_open_request_idx'),
+        ),
+        migrations.RunPython(fill_stock_levels, migrations.RunPython.noop),
+    ]
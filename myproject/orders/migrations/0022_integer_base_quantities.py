@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:25
+
+from django.db import migrations, models
+
+from orders.units import to_base
+
+
+def fill_base_quantities(apps, schema_editor):
+    # Целые количества для существующих рецептов и запасов
+    DishIngredient = apps.get_model('orders', 'DishIngredient')
+    IngredientStock = apps.get_model('orders', 'IngredientStock')
+
+    recipe_items = list(DishIngredient.objects.select_related('ingredient'))
+    for item in recipe_items:
+        item.quantity_base = to_base(item.quantity, item.ingredient.unit)
+    DishIngredient.objects.bulk_update(recipe_items, ['quantity_base'])
+
+    stocks = list(IngredientStock.objects.select_related('ingredient'))
+    for stock in stocks:
+        stock.quantity_base = to_base(stock.current_quantity, stock.ingredient.unit)
+    IngredientStock.objects.bulk_update(stocks, ['quantity_base'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0021_stock_levels_open_requests'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dishingredient',
+            name='quantity_base',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Количество в базовых единицах'),
+        ),
+        migrations.AddField(
+            model_name='ingredientstock',
+            name='quantity_base',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Количество в базовых единицах'),
+        ),
+        migrations.RunPython(fill_base_quantities, migrations.RunPython.noop),
+        # Единица измерения запаса дублировала единицу ингредиента
+        migrations.RemoveField(
+            model_name='ingredientstock',
+            name='unit',
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_opening_lots(apps, schema_editor):
+    # Текущие остатки становятся начальными партиями без срока годности
+    IngredientStock = apps.get_model('orders', 'IngredientStock')
+    IngredientCost = apps.get_model('orders', 'IngredientCost')
+    IngredientLot = apps.get_model('orders', 'IngredientLot')
+
+    costs = dict(IngredientCost.objects.values_list('ingredient_id', 'cost_per_unit'))
+    IngredientLot.objects.bulk_create([
+        IngredientLot(
+            ingredient_id=stock.ingredient_id,
+            quantity=stock.current_quantity,
+            remaining_base=stock.quantity_base,
+            cost_per_unit=costs.get(stock.ingredient_id, 0),
+        )
+        for stock in IngredientStock.objects.filter(quantity_base__gt=0)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0022_integer_base_quantities'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='shelf_life_days',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Срок годности, дней'),
+        ),
+        migrations.CreateModel(
+            name='IngredientLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Поступило')),
+                ('remaining_base', models.BigIntegerField(default=0, verbose_name='Остаток в базовых единицах')),
+                ('cost_per_unit', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Стоимость за единицу')),
+                ('expires_at', models.DateField(blank=True, null=True, verbose_name='Годен до')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата поступления')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='orders.ingredient', verbose_name='Ингредиент')),
+                ('restock_entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lots', to='orders.stockhistory', verbose_name='Поступление')),
+            ],
+            options={
+                'verbose_name': 'Партия ингредиента',
+                'verbose_name_plural': 'Партии ингредиентов',
+                'ordering': ['expires_at', 'received_at'],
+                'indexes': [models.Index(condition=models.Q(('remaining_base__gt', 0)), fields=['ingredient', 'expires_at', 'received_at'], name='lot_fifo_idx'), models.Index(condition=models.Q(('remaining_base__gt', 0)), fields=['expires_at'], name='lot_expiry_idx')],
+            },
+        ),
+        migrations.RunPython(create_opening_lots, migrations.RunPython.noop),
+    ]
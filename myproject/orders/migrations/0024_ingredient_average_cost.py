@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:29
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_average_cost(apps, schema_editor):
+    # Средняя стоимость начинается с текущей цены. Прошлый расход оцениваем по ней же,
+    # иначе себестоимость в статистике будет нулевой
+    IngredientCost = apps.get_model('orders', 'IngredientCost')
+    StockHistory = apps.get_model('orders', 'StockHistory')
+    StockDailyRollup = apps.get_model('orders', 'StockDailyRollup')
+
+    IngredientCost.objects.update(average_cost=F('cost_per_unit'))
+    for ingredient_id, cost in IngredientCost.objects.values_list('ingredient_id', 'cost_per_unit'):
+        StockHistory.objects.filter(ingredient_id=ingredient_id, operation_type='usage', total_cost=0) \
+            .update(total_cost=-F('quantity_change') * cost)
+        StockDailyRollup.objects.filter(ingredient_id=ingredient_id, operation_type='usage', total_cost=0) \
+            .update(total_cost=-F('quantity_change') * cost)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0023_ingredient_lots'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredientcost',
+            name='average_cost',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=12, verbose_name='Средняя стоимость за единицу (руб)'),
+        ),
+        migrations.RunPython(fill_average_cost, migrations.RunPython.noop),
+    ]
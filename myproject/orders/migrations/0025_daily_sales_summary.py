@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0024_ingredient_average_cost'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyDishSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('portions', models.PositiveIntegerField(default=0, verbose_name='Порций')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Выручка')),
+            ],
+            options={
+                'verbose_name': 'Продажи блюда за день',
+                'verbose_name_plural': 'Продажи блюд по дням',
+                'ordering': ['-day', 'dish'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailySalesSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='День')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Доход')),
+                ('payments_count', models.PositiveIntegerField(default=0, verbose_name='Оплаченных платежей')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='Заказов')),
+                ('portions_sold', models.PositiveIntegerField(default=0, verbose_name='Продано порций')),
+                ('ingredient_spend', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Затраты на закупки')),
+                ('cogs', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Себестоимость израсходованного')),
+                ('waste_cost', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Списания')),
+                ('active_customers', models.PositiveIntegerField(default=0, verbose_name='Учеников с заказами')),
+                ('new_users', models.PositiveIntegerField(default=0, verbose_name='Новых пользователей')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Пересчитано')),
+            ],
+            options={
+                'verbose_name': 'Продажи за день',
+                'verbose_name_plural': 'Продажи по дням',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['created_at'], name='order_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'created_at'], name='payment_status_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='dailydishsales',
+            name='dish',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='orders.dish', verbose_name='Блюдо'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailydishsales',
+            unique_together={('day', 'dish')},
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+
+
+def fill_demand_cube(apps, schema_editor):
+    # Спрос по уже сделанным неотмененным заказам (та же выборка, что в demand.rebuild_demand_cube)
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    DemandCell = apps.get_model('orders', 'DemandCell')
+    rows = (OrderItem.objects.exclude(order__status='cancelled').order_by()
+            .annotate(weekday=ExtractIsoWeekDay('order__created_at'), hour=ExtractHour('order__created_at'))
+            .values('weekday', 'hour', 'dish_id')
+            .annotate(portions=Sum('quantity')))
+    DemandCell.objects.bulk_create([
+        DemandCell(weekday=row['weekday'] - 1, hour=row['hour'], dish_id=row['dish_id'], portions=row['portions'])
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0026_transaction_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandCell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(verbose_name='День недели')),
+                ('hour', models.PositiveSmallIntegerField(verbose_name='Час')),
+                ('portions', models.PositiveIntegerField(default=0, verbose_name='Порций')),
+                ('dish', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_cells', to='orders.dish', verbose_name='Блюдо')),
+            ],
+            options={
+                'verbose_name': 'Спрос по времени',
+                'verbose_name_plural': 'Спрос по времени',
+                'unique_together': {('weekday', 'hour', 'dish')},
+            },
+        ),
+        migrations.RunPython(fill_demand_cube, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:40
+
+from django.db import migrations, models
+from django.db.models import Max
+from django.db.models.functions import TruncDate
+
+from orders.hyperloglog import HyperLogLog
+
+
+def fill_customer_sketches(apps, schema_editor):
+    # Скетчи для дней, уже свернутых в сводки продаж (следующие дни досчитает rollup_daily_sales)
+    DailySalesSummary = apps.get_model('orders', 'DailySalesSummary')
+    DailyCustomerSketch = apps.get_model('orders', 'DailyCustomerSketch')
+    Order = apps.get_model('orders', 'Order')
+    last_day = DailySalesSummary.objects.aggregate(last=Max('day'))['last']
+    if last_day is None:
+        return
+    customers = {}
+    rows = (Order.objects.exclude(status='cancelled').order_by()
+            .annotate(day=TruncDate('created_at')).filter(day__lte=last_day)
+            .values_list('day', 'customer_id').distinct())
+    for day, customer_id in rows:
+        customers.setdefault(day, set()).add(customer_id)
+    DailyCustomerSketch.objects.bulk_create([
+        DailyCustomerSketch(day=day, registers=HyperLogLog().update(customer_ids).to_bytes())
+        for day, customer_ids in customers.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0027_demand_cube'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCustomerSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True, verbose_name='День')),
+                ('registers', models.BinaryField(verbose_name='Регистры')),
+            ],
+            options={
+                'verbose_name': 'Покупатели за день (скетч)',
+                'verbose_name_plural': 'Покупатели по дням (скетчи)',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.RunPython(fill_customer_sketches, migrations.RunPython.noop),
+    ]
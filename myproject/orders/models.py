@@ -3,6 +3,8 @@ from users.models import CustomUser
 from django.conf import settings
 from decimal import Decimal
 
+from .units import to_base, from_base
+
 
 # КАТЕГОРИИ БЛЮД - для группировки (супы, салаты, горячее)
 class Category(models.Model):
@@ -22,6 +24,8 @@ class Category(models.Model):
 class Ingredient(models.Model):
     name = models.CharField(max_length=100, verbose_name='Название')
     unit = models.CharField(max_length=20, verbose_name='Единица измерения')  # г, мл, шт
+    # Срок годности новой партии по умолчанию (пусто - не портится)
+    shelf_life_days = models.PositiveIntegerField(null=True, blank=True, verbose_name='Срок годности, дней')
 
     class Meta:
         verbose_name = 'Ингредиент'
@@ -31,17 +35,47 @@ class Ingredient(models.Model):
     def str(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # При смене единицы измерения пересчитываем количества в базовых единицах
+        old_unit = None
+        if self.pk:
+            old_unit = Ingredient.objects.filter(pk=self.pk).values_list('unit', flat=True).first()
+        super().save(*args, **kwargs)
+        if old_unit is not None and old_unit != self.unit:
+            self.update_base_quantities()
+
+    def update_base_quantities(self):
+        # Пересчет целых количеств в рецептах и на складе из десятичных
+        recipe_items = list(self.dishingredient_set.all())
+        for item in recipe_items:
+            item.quantity_base = to_base(item.quantity, self.unit)
+        DishIngredient.objects.bulk_update(recipe_items, ['quantity_base'])
+        for stock in IngredientStock.objects.filter(ingredient=self):
+            stock.quantity_base = to_base(stock.current_quantity, self.unit)
+            stock.save(update_fields=['quantity_base'])
+
 
 # ЗАПАСЫ ИНГРЕДИЕНТОВ НА СКЛАДЕ
 class IngredientStock(models.Model):
+    # Уровень запаса относительно минимума (пересчитывается при каждом изменении)
+    LEVEL_CHOICES = [
+        ('ok', 'Достаточно'),
+        ('low', 'Мало'),
+        ('out', 'Закончился'),
+    ]
+    
     ingredient = models.OneToOneField(Ingredient, on_delete=models.CASCADE, 
                                       related_name='stock', verbose_name='Ингредиент')
     current_quantity = models.DecimalField(max_digits=10, decimal_places=2, 
                                            default=0, verbose_name='Текущее количество')
     min_quantity = models.DecimalField(max_digits=10, decimal_places=2, 
                                        default=10, verbose_name='Минимальное количество')
-    unit = models.CharField(max_length=20, verbose_name='Единица измерения')
+    # То же количество в целых базовых единицах (мг, мкл, тысячные штуки) - для быстрых проверок
+    quantity_base = models.BigIntegerField(default=0, editable=False,
+                                           verbose_name='Количество в базовых единицах')
     last_restocked = models.DateTimeField(auto_now=True, verbose_name='Последнее пополнение')
+    level = models.CharField(max_length=10, choices=LEVEL_CHOICES, default='out',
+                             db_index=True, verbose_name='Уровень запаса')
     
     class Meta:
         verbose_name = 'Запас ингредиента'
@@ -50,6 +84,11 @@ class IngredientStock(models.Model):
     
     def str(self):
         return f"{self.ingredient.name}: {self.current_quantity} {self.unit}"
+
+    @property
+    def unit(self):
+        # Единица измерения хранится только у ингредиента
+        return self.ingredient.unit
     
     @property
     def is_low(self):
@@ -62,38 +101,6 @@ class IngredientStock(models.Model):
         return self.current_quantity <= 0
 
 
-# ИСТОРИЯ ИЗМЕНЕНИЙ ЗАПАСОВ
-class StockHistory(models.Model):
-    # Типы операций
-    OPERATION_TYPES = [
-        ('restock', 'Пополнение'),
-        ('usage', 'Использование'),
-        ('adjustment', 'Корректировка'),
-        ('waste', 'Списание (брак)'),
-        ('request', 'Запрос на пополнение'),
-    ]
-    
-    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, 
-                                   related_name='stock_history')
-    operation_type = models.CharField(max_length=20, choices=OPERATION_TYPES)
-    quantity_change = models.DecimalField(max_digits=10, decimal_places=2, 
-                                          verbose_name='Изменение количества')
-    quantity_before = models.DecimalField(max_digits=10, decimal_places=2)
-    quantity_after = models.DecimalField(max_digits=10, decimal_places=2)
-    performed_by = models.ForeignKey(CustomUser, on_delete=models.SET_NULL, 
-                                     null=True, verbose_name='Кто выполнил')
-    notes = models.TextField(blank=True, verbose_name='Примечания')
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата операции')
-    
-    class Meta:
-        verbose_name = 'История запасов'
-        verbose_name_plural = 'История запасов'
-        ordering = ['-created_at']
-    
-    def str(self):
-        return f"{self.get_operation_type_display()}: {self.ingredient.name} ({self.quantity_change})"
-
-
 # БЛЮДА - вся информация о позициях в меню
 class Dish(models.Model):
     name = models.CharField(max_length=200, verbose_name='Название')
@@ -121,34 +128,54 @@ class Dish(models.Model):
     # Средняя оценка блюда из отзывов
     @property
     def average_rating(self):
+        # Если отзывы загружены prefetch_related, считаем по ним без запроса к БД
+        if 'reviews' in getattr(self, '_prefetched_objects_cache', {}):
+            ratings = [review.rating for review in self.reviews.all()]
+            return sum(ratings) / len(ratings) if ratings else 0
         from django.db.models import Avg
         result = self.reviews.aggregate(Avg('rating'))
         return result['rating__avg'] or 0
 
-    def check_availability(self, quantity=1):
-        # Проверяет, можно ли приготовить указанное количество этого блюда
-        unavailable_ingredients = []
-        
-        for dish_ingredient in self.ingredients.all():
-            required = dish_ingredient.quantity * quantity
+    def _recipe_with_stock(self):
+        # Рецепт вместе с запасами: (ингредиент блюда, запас или None)
+        items = []
+        for dish_ingredient in self.ingredients.select_related('ingredient__stock'):
             try:
                 stock = dish_ingredient.ingredient.stock
-                if stock.current_quantity < required:
-                    unavailable_ingredients.append({
-                        'ingredient': dish_ingredient.ingredient,
-                        'required': required,
-                        'available': stock.current_quantity,
-                        'missing': required - stock.current_quantity
-                    })
             except IngredientStock.DoesNotExist:
+                stock = None
+            items.append((dish_ingredient, stock))
+        return items
+
+    def check_availability(self, quantity=1):
+        # Проверяет, можно ли приготовить указанное количество этого блюда.
+        # Сравнение идет в целых базовых единицах, в Decimal переводятся только недостающие
+        unavailable_ingredients = []
+        
+        for dish_ingredient, stock in self._recipe_with_stock():
+            required = dish_ingredient.quantity_base * quantity
+            available = stock.quantity_base if stock is not None else 0
+            if available < required:
+                unit = dish_ingredient.ingredient.unit
                 unavailable_ingredients.append({
                     'ingredient': dish_ingredient.ingredient,
-                    'required': required,
-                    'available': 0,
-                    'missing': required
+                    'required': from_base(required, unit),
+                    'available': from_base(available, unit),
+                    'missing': from_base(required - available, unit)
                 })
         
         return len(unavailable_ingredients) == 0, unavailable_ingredients
+
+    def max_preparable(self):
+        # Сколько порций можно приготовить из текущих запасов (целочисленное деление)
+        portions = None
+        for dish_ingredient, stock in self._recipe_with_stock():
+            if dish_ingredient.quantity_base <= 0:
+                continue
+            available = stock.quantity_base if stock is not None else 0
+            can_make = max(available, 0) // dish_ingredient.quantity_base
+            portions = can_make if portions is None else min(portions, can_make)
+        return portions or 0
     
     def reserve_ingredients(self, quantity=1, user=None):
         # Резервирует ингредиенты для приготовления блюд
@@ -157,24 +184,28 @@ class Dish(models.Model):
         if not is_available:
             return False, missing
         
-        # Резервируем ингредиенты
-        for dish_ingredient in self.ingredients.all():
-            required = dish_ingredient.quantity * quantity
-            stock = dish_ingredient.ingredient.stock
-            stock.current_quantity -= required
-            stock.save()
-            
-            # Записываем в историю
-            StockHistory.objects.create(
-                ingredient=dish_ingredient.ingredient,
-                operation_type='usage',
-                quantity_change=-required,
-                quantity_before=stock.current_quantity + required,
-                quantity_after=stock.current_quantity,
-                performed_by=user,
-                notes=f"Использовано для приготовления {self.name} x{quantity}"
-            )
-        
+        # Импорт внутри метода, чтобы избежать круговой зависимости
+        from .inventory import record_stock_changes, InsufficientStockError
+
+        # Резервируем ингредиенты: все списания проходят через журнал одной транзакцией
+        try:
+            record_stock_changes([
+                {
+                    'ingredient': dish_ingredient.ingredient,
+                    'operation_type': 'usage',
+                    'quantity_change': -(dish_ingredient.quantity * quantity),
+                    'notes': f"Использовано для приготовления {self.name} x{quantity}",
+                }
+                for dish_ingredient in self.ingredients.select_related('ingredient')
+            ], user=user, allow_negative=False)
+        except InsufficientStockError as e:
+            return False, [{
+                'ingredient': e.ingredient,
+                'required': e.required,
+                'available': e.available,
+                'missing': e.required - e.available
+            }]
+
         return True, []
 
     def get_max_available_quantity(self):
@@ -200,6 +231,9 @@ class DishIngredient(models.Model):
     dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='ingredients')
     ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
     quantity = models.DecimalField(max_digits=6, decimal_places=2, verbose_name='Количество')
+    # Количество в целых базовых единицах, заполняется при сохранении
+    quantity_base = models.BigIntegerField(default=0, editable=False,
+                                           verbose_name='Количество в базовых единицах')
 
     class Meta:
         verbose_name = 'Ингредиент блюда'
@@ -210,6 +244,10 @@ class DishIngredient(models.Model):
     def str(self):
         return f"{self.ingredient.name} — {self.quantity} {self.ingredient.unit} ({self.dish.name})"
 
+    def save(self, *args, **kwargs):
+        self.quantity_base = to_base(self.quantity, self.ingredient.unit)
+        super().save(*args, **kwargs)
+
 
 # БЛЮДА ГОТОВЫЕ К ВЫДАЧЕ
 class PreparedDish(models.Model):
@@ -266,6 +304,9 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
     
     def str(self):
         return f"Заказ #{self.id} от {self.customer.username}"
@@ -344,6 +385,10 @@ class Payment(models.Model):
     class Meta:
         verbose_name = 'Платеж'
         verbose_name_plural = 'Платежи'
+        indexes = [
+            # Доход за период (статистика и сводки по дням)
+            models.Index(fields=['status', 'created_at'], name='payment_status_created_idx'),
+        ]
     
     def str(self):
         return f"Платеж #{self.id} - {self.amount} руб."
@@ -371,6 +416,10 @@ class Transaction(models.Model):
         verbose_name = 'Транзакция'
         verbose_name_plural = 'Транзакции'
         ordering = ['-created_at']
+        indexes = [
+            # Выгрузка за период
+            models.Index(fields=['created_at'], name='transaction_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_transaction_type_display()}: {self.amount} руб."
@@ -542,6 +591,9 @@ class IngredientCost(models.Model):
                                       related_name='cost', verbose_name='Ингредиент')
     cost_per_unit = models.DecimalField(max_digits=10, decimal_places=2, 
                                         default=0, verbose_name='Стоимость за единицу (руб)')
+    # Средневзвешенная стоимость запаса, пересчитывается при каждом поступлении (orders.inventory)
+    average_cost = models.DecimalField(max_digits=12, decimal_places=4, default=0,
+                                       verbose_name='Средняя стоимость за единицу (руб)')
     last_updated = models.DateTimeField(auto_now=True, verbose_name='Последнее обновление')
     
     class Meta:
@@ -557,6 +609,9 @@ class IngredientCost(models.Model):
         #Рассчитывает общую стоимость для указанного количества
         return self.cost_per_unit * quantity
 
+
+# ИСТОРИЯ ИЗМЕНЕНИЙ ЗАПАСОВ - журнал операций, по которому считается запас.
+# Записи только добавляются (через orders.inventory), IngredientStock - его проекция
 class StockHistory(models.Model):
     # Типы операций
     OPERATION_TYPES = [
@@ -581,10 +636,198 @@ class StockHistory(models.Model):
                                      null=True, verbose_name='Кто выполнил')
     notes = models.TextField(blank=True, verbose_name='Примечания')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата операции')
+    # Для запросов на пополнение - когда запрос выполнен
+    fulfilled_at = models.DateTimeField(null=True, blank=True, verbose_name='Запрос выполнен')
     
     class Meta:
         verbose_name = 'История запасов'
         verbose_name_plural = 'История запасов'
         ordering = ['-created_at']
+        indexes = [
+            # Открытые запросы на пополнение (для проверки дублей)
+            models.Index(fields=['ingredient'], name='stockhistory_open_request_idx',
+                         condition=models.Q(operation_type='request', fulfilled_at__isnull=True)),
+            # Воспроизведение журнала по ингредиенту после снимка
+            models.Index(fields=['ingredient', 'created_at'], name='stockhistory_ingr_created_idx'),
+            models.Index(fields=['operation_type', 'created_at'], name='stockhistory_op_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_operation_type_display()}: {self.ingredient.name} ({self.quantity_change})"
+
+
+# ПАРТИЯ ИНГРЕДИЕНТА - одна поставка со своей ценой и сроком годности.
+# Создается при пополнении, расходуется по FIFO (сначала то, что раньше испортится)
+class IngredientLot(models.Model):
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE,
+                                   related_name='lots', verbose_name='Ингредиент')
+    restock_entry = models.ForeignKey(StockHistory, on_delete=models.SET_NULL, null=True, blank=True,
+                                      related_name='lots', verbose_name='Поступление')
+    quantity = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Поступило')
+    # Остаток партии в целых базовых единицах (см. orders.units)
+    remaining_base = models.BigIntegerField(default=0, verbose_name='Остаток в базовых единицах')
+    cost_per_unit = models.DecimalField(max_digits=10, decimal_places=2, default=0,
+                                        verbose_name='Стоимость за единицу')
+    expires_at = models.DateField(null=True, blank=True, verbose_name='Годен до')
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата поступления')
+
+    class Meta:
+        verbose_name = 'Партия ингредиента'
+        verbose_name_plural = 'Партии ингредиентов'
+        ordering = ['expires_at', 'received_at']
+        indexes = [
+            # Голова очереди FIFO по ингредиенту - только непустые партии
+            models.Index(fields=['ingredient', 'expires_at', 'received_at'], name='lot_fifo_idx',
+                         condition=models.Q(remaining_base__gt=0)),
+            # Поиск просроченных партий для списания
+            models.Index(fields=['expires_at'], name='lot_expiry_idx',
+                         condition=models.Q(remaining_base__gt=0)),
+        ]
+
+    def __str__(self):
+        expires = f"до {self.expires_at:%d.%m.%Y}" if self.expires_at else "без срока"
+        return f"{self.ingredient.name}: {self.remaining} {self.ingredient.unit} ({expires})"
+
+    @property
+    def remaining(self):
+        return from_base(self.remaining_base, self.ingredient.unit)
+
+
+# СНИМОК ЗАПАСА - количество ингредиента на момент времени,
+# чтобы не пересчитывать весь журнал с начала
+class StockSnapshot(models.Model):
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE,
+                                   related_name='stock_snapshots', verbose_name='Ингредиент')
+    quantity = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Количество')
+    # Последняя запись журнала, уже учтенная в снимке
+    last_history_id = models.PositiveBigIntegerField(default=0, verbose_name='Последняя запись журнала')
+    taken_at = models.DateTimeField(verbose_name='Момент снимка')
+
+    class Meta:
+        verbose_name = 'Снимок запаса'
+        verbose_name_plural = 'Снимки запасов'
+        ordering = ['-taken_at']
+        indexes = [
+            models.Index(fields=['ingredient', '-taken_at'], name='stocksnapshot_ingr_taken_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ingredient.name}: {self.quantity} ({self.taken_at:%d.%m.%Y %H:%M})"
+
+
+# СВОДКА ЖУРНАЛА ЗАПАСОВ ЗА ДЕНЬ - по ингредиенту и типу операции
+# (обновляется командой rollup_stock_history)
+class StockDailyRollup(models.Model):
+    day = models.DateField(verbose_name='День')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE,
+                                   related_name='daily_rollups', verbose_name='Ингредиент')
+    operation_type = models.CharField(max_length=20, choices=StockHistory.OPERATION_TYPES,
+                                      verbose_name='Тип операции')
+    quantity_change = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                          verbose_name='Изменение количества')
+    total_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0,
+                                     verbose_name='Общая стоимость')
+    entries_count = models.PositiveIntegerField(default=0, verbose_name='Количество операций')
+    # Последняя запись журнала, учтенная в сводках
+    last_history_id = models.PositiveBigIntegerField(default=0, verbose_name='Последняя запись журнала')
+
+    class Meta:
+        verbose_name = 'Сводка запасов за день'
+        verbose_name_plural = 'Сводки запасов по дням'
+        ordering = ['-day', 'ingredient']
+        unique_together = ('day', 'ingredient', 'operation_type')
+        indexes = [
+            models.Index(fields=['operation_type', 'day'], name='stockrollup_op_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day:%d.%m.%Y} {self.ingredient.name}: {self.get_operation_type_display()}"
+
 
+# СЧЕТЧИКИ УРОВНЕЙ ЗАПАСОВ - сколько ингредиентов мало / закончилось,
+# обновляются вместе с запасами (orders.inventory), чтобы не пересчитывать на каждой странице
+class StockLevelCounter(models.Model):
+    level = models.CharField(max_length=10, choices=IngredientStock.LEVEL_CHOICES,
+                             unique=True, verbose_name='Уровень запаса')
+    count = models.IntegerField(default=0, verbose_name='Количество ингредиентов')
 
+    class Meta:
+        verbose_name = 'Счетчик уровня запасов'
+        verbose_name_plural = 'Счетчики уровней запасов'
+
+    def __str__(self):
+        return f"{self.get_level_display()}: {self.count}"
+
+
+# ПРОДАЖИ ЗА ДЕНЬ - сводка для страницы статистики
+# (обновляется командой rollup_daily_sales, текущий день считается на лету)
+class DailySalesSummary(models.Model):
+    day = models.DateField(unique=True, verbose_name='День')
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Доход')
+    payments_count = models.PositiveIntegerField(default=0, verbose_name='Оплаченных платежей')
+    orders_count = models.PositiveIntegerField(default=0, verbose_name='Заказов')
+    portions_sold = models.PositiveIntegerField(default=0, verbose_name='Продано порций')
+    ingredient_spend = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                                           verbose_name='Затраты на закупки')
+    cogs = models.DecimalField(max_digits=12, decimal_places=2, default=0,
+                               verbose_name='Себестоимость израсходованного')
+    waste_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Списания')
+    active_customers = models.PositiveIntegerField(default=0, verbose_name='Учеников с заказами')
+    new_users = models.PositiveIntegerField(default=0, verbose_name='Новых пользователей')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Пересчитано')
+
+    class Meta:
+        verbose_name = 'Продажи за день'
+        verbose_name_plural = 'Продажи по дням'
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day:%d.%m.%Y}: {self.revenue} руб."
+
+
+# ПРОДАЖИ БЛЮДА ЗА ДЕНЬ - порции и выручка по каждому блюду
+class DailyDishSales(models.Model):
+    day = models.DateField(verbose_name='День')
+    dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='daily_sales', verbose_name='Блюдо')
+    portions = models.PositiveIntegerField(default=0, verbose_name='Порций')
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, verbose_name='Выручка')
+
+    class Meta:
+        verbose_name = 'Продажи блюда за день'
+        verbose_name_plural = 'Продажи блюд по дням'
+        ordering = ['-day', 'dish']
+        unique_together = ('day', 'dish')
+
+    def __str__(self):
+        return f"{self.day:%d.%m.%Y} {self.dish.name}: {self.portions}"
+
+
+# СПРОС ПО ВРЕМЕНИ - сколько порций блюда заказывают в день недели и час
+# (обновляется при создании элементов заказа, пересчет - командой rebuild_demand_cube)
+class DemandCell(models.Model):
+    weekday = models.PositiveSmallIntegerField(verbose_name='День недели')  # 0 - понедельник
+    hour = models.PositiveSmallIntegerField(verbose_name='Час')
+    dish = models.ForeignKey(Dish, on_delete=models.CASCADE, related_name='demand_cells', verbose_name='Блюдо')
+    portions = models.PositiveIntegerField(default=0, verbose_name='Порций')
+
+    class Meta:
+        verbose_name = 'Спрос по времени'
+        verbose_name_plural = 'Спрос по времени'
+        unique_together = ('weekday', 'hour', 'dish')
+
+    def __str__(self):
+        return f"{self.dish.name}: день {self.weekday}, {self.hour}:00 - {self.portions}"
+
+
+# УНИКАЛЬНЫЕ ПОКУПАТЕЛИ ЗА ДЕНЬ - HyperLogLog-скетч (orders.hyperloglog), объединяется по диапазонам дней
+class DailyCustomerSketch(models.Model):
+    day = models.DateField(unique=True, verbose_name='День')
+    registers = models.BinaryField(verbose_name='Регистры')
+
+    class Meta:
+        verbose_name = 'Покупатели за день (скетч)'
+        verbose_name_plural = 'Покупатели по дням (скетчи)'
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day:%d.%m.%Y}"
@@ -0,0 +1,205 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from users.models import CustomUser
+
+from .hyperloglog import HyperLogLog
+from .inventory import roll_up_stock_history, start_of_today
+from .models import (DailyCustomerSketch, DailyDishSales, DailySalesSummary, Order, OrderItem, Payment,
+                     StockDailyRollup, StockHistory)
+
+
+# Какие операции со складом попадают в сводку и под каким полем
+STOCK_COST_FIELDS = {'restock': 'ingredient_spend', 'usage': 'cogs', 'waste': 'waste_cost'}
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _first_activity_day():
+    # Первый день, за который есть платежи, заказы или операции со складом
+    candidates = [
+        Payment.objects.aggregate(first=Min('created_at'))['first'],
+        Order.objects.aggregate(first=Min('created_at'))['first'],
+    ]
+    candidates = [timezone.localdate(moment) for moment in candidates if moment]
+    first_rollup = StockDailyRollup.objects.aggregate(first=Min('day'))['first']
+    if first_rollup:
+        candidates.append(first_rollup)
+    return min(candidates) if candidates else None
+
+
+def _by_day(queryset, field, **aggregates):
+    # {день: {агрегаты}} для запроса, сгруппированного по дате поля field
+    rows = (queryset.order_by().annotate(day=TruncDate(field))
+            .values('day').annotate(**aggregates))
+    return {row['day']: row for row in rows}
+
+
+def _customers_by_day(since, until=None):
+    # {день: {id покупателей}} по неотмененным заказам с момента since
+    orders = Order.objects.filter(created_at__gte=since).exclude(status='cancelled')
+    if until:
+        orders = orders.filter(created_at__lt=until)
+    customers = {}
+    rows = orders.order_by().annotate(day=TruncDate('created_at')).values_list('day', 'customer_id').distinct()
+    for day, customer_id in rows:
+        customers.setdefault(day, set()).add(customer_id)
+    return customers
+
+
+def roll_up_daily_sales(rebuild_days=0):
+    # Досчитывает сводки продаж по завершенным дням, начиная со дня после последней сводки.
+    # rebuild_days - сколько последних дней пересчитать заново (например, после изменения статуса платежей).
+    # Возвращает количество пересчитанных дней
+    roll_up_stock_history()
+    today = timezone.localdate()
+    last_day = DailySalesSummary.objects.aggregate(last=Max('day'))['last']
+    first_day = last_day + timedelta(days=1) if last_day else _first_activity_day()
+    if first_day is None:
+        return 0
+    if rebuild_days:
+        first_day = min(first_day, today - timedelta(days=rebuild_days))
+    if first_day >= today:
+        return 0
+
+    start, end = start_of_day(first_day), start_of_today()
+    payments = _by_day(Payment.objects.filter(status='paid', created_at__gte=start, created_at__lt=end),
+                       'created_at', revenue=Sum('amount'), count=Count('id'))
+    orders = _by_day(Order.objects.filter(created_at__gte=start, created_at__lt=end).exclude(status='cancelled'),
+                     'created_at', count=Count('id'), customers=Count('customer', distinct=True))
+    users = _by_day(CustomUser.objects.filter(date_joined__gte=start, date_joined__lt=end),
+                    'date_joined', count=Count('id'))
+    dish_sales = (OrderItem.objects
+                  .filter(order__created_at__gte=start, order__created_at__lt=end)
+                  .exclude(order__status='cancelled')
+                  .order_by().annotate(day=TruncDate('order__created_at'))
+                  .values('day', 'dish_id')
+                  .annotate(portions=Sum('quantity'), revenue=Sum(F('price_at_time') * F('quantity'))))
+    stock_costs = (StockDailyRollup.objects
+                   .filter(day__gte=first_day, day__lt=today, operation_type__in=STOCK_COST_FIELDS)
+                   .values('day', 'operation_type').order_by()
+                   .annotate(total=Sum('total_cost')))
+
+    summaries = {}
+    day = first_day
+    while day < today:
+        summaries[day] = DailySalesSummary(
+            day=day,
+            revenue=payments.get(day, {}).get('revenue') or 0,
+            payments_count=payments.get(day, {}).get('count', 0),
+            orders_count=orders.get(day, {}).get('count', 0),
+            active_customers=orders.get(day, {}).get('customers', 0),
+            new_users=users.get(day, {}).get('count', 0),
+        )
+        day += timedelta(days=1)
+
+    dish_rows = []
+    for row in dish_sales:
+        summaries[row['day']].portions_sold += row['portions']
+        dish_rows.append(DailyDishSales(day=row['day'], dish_id=row['dish_id'],
+                                        portions=row['portions'], revenue=row['revenue']))
+    for row in stock_costs:
+        setattr(summaries[row['day']], STOCK_COST_FIELDS[row['operation_type']], row['total'])
+    sketches = [
+        DailyCustomerSketch(day=day, registers=HyperLogLog().update(customer_ids).to_bytes())
+        for day, customer_ids in _customers_by_day(start, end).items()
+    ]
+
+    with transaction.atomic():
+        DailySalesSummary.objects.filter(day__gte=first_day).delete()
+        DailyDishSales.objects.filter(day__gte=first_day).delete()
+        DailyCustomerSketch.objects.filter(day__gte=first_day).delete()
+        DailySalesSummary.objects.bulk_create(summaries.values())
+        DailyDishSales.objects.bulk_create(dish_rows)
+        DailyCustomerSketch.objects.bulk_create(sketches)
+
+    return len(summaries)
+
+
+def sales_dashboard():
+    # Показатели для страницы статистики: сводки по прошлым дням + живые данные после последней сводки.
+    # Если команда давно не запускалась, несвернутые дни тоже считаются на лету (по индексам дат)
+    totals = DailySalesSummary.objects.aggregate(
+        last_day=Max('day'), revenue=Sum('revenue'), payments=Sum('payments_count'),
+        orders=Sum('orders_count'), portions=Sum('portions_sold'),
+        ingredient_spend=Sum('ingredient_spend'), cogs=Sum('cogs'), waste_cost=Sum('waste_cost'),
+    )
+    live_start = start_of_day(totals['last_day'] + timedelta(days=1)) if totals['last_day'] else None
+    today_start = start_of_today()
+
+    def live(queryset, field='created_at'):
+        return queryset.filter(**{f'{field}__gte': live_start}) if live_start else queryset
+
+    today = Q(created_at__gte=today_start)
+    payments = live(Payment.objects.filter(status='paid')).aggregate(
+        revenue=Sum('amount'), count=Count('id'),
+        today_revenue=Sum('amount', filter=today), today_count=Count('id', filter=today),
+    )
+    orders = live(Order.objects.exclude(status='cancelled')).aggregate(
+        count=Count('id'), today_count=Count('id', filter=today),
+    )
+    stock = {
+        row['operation_type']: row
+        for row in live(StockHistory.objects.filter(operation_type__in=STOCK_COST_FIELDS))
+        .values('operation_type').order_by()
+        .annotate(total=Sum('total_cost'), today=Sum('total_cost', filter=today))
+    }
+
+    def stock_total(operation_type, key='total'):
+        return stock.get(operation_type, {}).get(key) or Decimal('0')
+
+    dashboard = {
+        'total_income': (totals['revenue'] or Decimal('0')) + (payments['revenue'] or Decimal('0')),
+        'today_income': payments['today_revenue'] or Decimal('0'),
+        'total_payments': (totals['payments'] or 0) + payments['count'],
+        'today_payments': payments['today_count'],
+        'total_orders': (totals['orders'] or 0) + orders['count'],
+        'today_orders': orders['today_count'],
+    }
+    for operation_type, field in STOCK_COST_FIELDS.items():
+        dashboard[f'total_{field}'] = (totals[field] or Decimal('0')) + stock_total(operation_type)
+        dashboard[f'today_{field}'] = stock_total(operation_type, 'today')
+    return dashboard
+
+
+def unique_customers(starts, end=None):
+    # Число различных покупателей с каждого дня из starts по end (включительно, по умолчанию сегодня): {start: число}.
+    # Свернутые дни объединяются из скетчей (приближенно, O(дней)), остальные - точно по заказам
+    end = end or timezone.localdate()
+    first = min(starts)
+    last_day = DailySalesSummary.objects.aggregate(last=Max('day'))['last']
+    live_from = max(first, last_day + timedelta(days=1)) if last_day else first
+
+    sketches = []
+    if last_day and first <= last_day:
+        sketches = [
+            (day, HyperLogLog(registers))
+            for day, registers in DailyCustomerSketch.objects
+            .filter(day__gte=first, day__lte=min(end, last_day)).values_list('day', 'registers')
+        ]
+    live = {}
+    if live_from <= end:
+        live = _customers_by_day(start_of_day(live_from), start_of_day(end + timedelta(days=1)))
+
+    counts = {}
+    for start in starts:
+        exact = set()
+        for day, customer_ids in live.items():
+            if day >= start:
+                exact |= customer_ids
+        period_sketches = [sketch for day, sketch in sketches if day >= start]
+        if not period_sketches:
+            counts[start] = len(exact)
+            continue
+        merged = HyperLogLog()
+        for sketch in period_sketches:
+            merged.merge(sketch)
+        counts[start] = merged.update(exact).count()
+    return counts
@@ -0,0 +1,491 @@
+import random
+import time
+from bisect import bisect
+from collections import Counter, deque
+from datetime import datetime, time as day_time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, models, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from users.models import CustomUser
+
+from .catalog import invalidate_catalog
+from .costing import invalidate_dish_costs
+from .demand import rebuild_demand_cube
+from .inventory import recount_stock_levels, roll_up_stock_history, stock_level, take_stock_snapshots
+from .models import (Category, Dish, DishIngredient, Ingredient, IngredientCost, IngredientLot, IngredientStock,
+                     Order, OrderItem, Payment, PreparedDish, Review, StockHistory, Transaction)
+from .sales import roll_up_daily_sales
+from .trending import reset_trending
+from .units import unit_scale
+
+
+# Размеры столовой: large - около миллиона заказов за два учебных года
+PRESETS = {
+    'small': {'students': 300, 'chefs': 3, 'admins': 1, 'dishes': 40, 'ingredients': 60,
+              'days': 60, 'orders_per_day': 150},
+    'medium': {'students': 3000, 'chefs': 8, 'admins': 2, 'dishes': 150, 'ingredients': 200,
+               'days': 365, 'orders_per_day': 1000},
+    'large': {'students': 8000, 'chefs': 15, 'admins': 3, 'dishes': 300, 'ingredients': 400,
+              'days': 730, 'orders_per_day': 1920},
+}
+# Пароль всех созданных пользователей
+SEED_PASSWORD = 'canteen-seed'
+BATCH_SIZE = 5000
+
+CATEGORIES = ['Супы', 'Салаты', 'Горячее', 'Гарниры', 'Выпечка', 'Напитки', 'Десерты', 'Каши']
+PRODUCTS = [
+    ('Картофель', 'г'), ('Морковь', 'г'), ('Лук', 'г'), ('Капуста', 'г'), ('Свекла', 'г'), ('Огурцы', 'г'),
+    ('Помидоры', 'г'), ('Говядина', 'г'), ('Курица', 'г'), ('Свинина', 'г'), ('Рыба', 'г'), ('Рис', 'г'),
+    ('Гречка', 'г'), ('Макароны', 'г'), ('Мука', 'г'), ('Сахар', 'г'), ('Соль', 'г'), ('Масло сливочное', 'г'),
+    ('Масло растительное', 'мл'), ('Молоко', 'мл'), ('Сметана', 'г'), ('Творог', 'г'), ('Сыр', 'г'),
+    ('Яйца', 'шт'), ('Хлеб', 'г'), ('Яблоки', 'г'), ('Апельсиновый сок', 'мл'), ('Чай', 'г'), ('Какао', 'г'),
+    ('Овсяные хлопья', 'г'), ('Горох', 'г'), ('Фасоль', 'г'), ('Зелень', 'г'), ('Изюм', 'г'), ('Мед', 'г'),
+]
+# Перемены, на которые приходятся заказы: (начало, минут, доля заказов)
+BREAKS = [(day_time(9, 40), 20, 0.2), (day_time(11, 30), 40, 0.5), (day_time(13, 10), 30, 0.3)]
+CANCEL_RATE = 0.01
+REVIEW_RATE = 0.03
+ALLERGIC_RATE = 0.1
+# Запасы: пополнение до PAR_DAYS дней расхода, когда остается меньше REORDER_DAYS дней
+PAR_DAYS = 5
+REORDER_DAYS = 2
+
+
+class SeedError(Exception):
+    pass
+
+
+def _money(kopecks):
+    return Decimal(kopecks).scaleb(-2)
+
+
+def _quantity(hundredths):
+    # Количества считаются в сотых долях единицы ингредиента (точность полей модели)
+    return Decimal(hundredths).scaleb(-2)
+
+
+class _BulkWriter:
+    # Копит строки и вставляет их пачками через executemany, минуя создание моделей и pre_save:
+    # на миллионах записей подготовка значений в bulk_create занимает больше времени, чем сама вставка,
+    # а auto_now_add затерла бы даты из прошлого. Таблицы сбрасываются в порядке внешних ключей
+    ORDER = (Order, OrderItem, Payment, Transaction, Review, StockHistory, IngredientLot)
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.pending = {model: [] for model in self.ORDER}
+        self.counts = Counter()
+        self.columns = {model: [(field.attname, field.get_default(), self._adapter(field))
+                                for field in model._meta.concrete_fields] for model in self.ORDER}
+
+    @staticmethod
+    def _adapter(field):
+        # Приведение значения к виду драйвера БД - то же, что делает поле при сохранении
+        ops = connection.ops
+        if isinstance(field, models.DateTimeField):
+            return ops.adapt_datetimefield_value
+        if isinstance(field, models.DateField):
+            return ops.adapt_datefield_value
+        if isinstance(field, models.DecimalField):
+            return lambda value: ops.adapt_decimalfield_value(value, field.max_digits, field.decimal_places)
+        return None
+
+    def add(self, model, **values):
+        row = []
+        for attname, default, adapt in self.columns[model]:
+            value = values.get(attname, default)
+            row.append(adapt(value) if adapt is not None and value is not None else value)
+        rows = self.pending[model]
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        quote = connection.ops.quote_name
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model in self.ORDER:
+                rows = self.pending[model]
+                if not rows:
+                    continue
+                columns = [field.column for field in model._meta.concrete_fields]
+                cursor.executemany(
+                    f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(map(quote, columns))}) '
+                    f'VALUES ({", ".join(["%s"] * len(columns))})',
+                    rows,
+                )
+                self.counts[model.__name__] += len(rows)
+                rows.clear()
+
+
+class _Ids:
+    # Первичные ключи назначаются заранее: строки пишутся в обход ORM, а на них ссылаются другие записи
+    def __init__(self, *models):
+        self.next = {model: (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1 for model in models}
+
+    def take(self, model):
+        value = self.next[model]
+        self.next[model] += 1
+        return value
+
+
+class CanteenGenerator:
+    # Школьная столовая за несколько лет: заказы по переменам учебных дней, оплата с баланса,
+    # расход ингредиентов на проданные блюда и пополнение запасов. Балансы учеников сходятся
+    # с транзакциями, запасы - с журналом движения и остатками партий (FIFO)
+    def __init__(self, students, chefs, admins, dishes, ingredients, days, orders_per_day, seed=1,
+                 batch_size=BATCH_SIZE):
+        self.size = {'students': students, 'chefs': chefs, 'admins': admins, 'dishes': dishes,
+                     'ingredients': ingredients, 'days': days, 'orders_per_day': orders_per_day}
+        self.rng = random.Random(seed)
+        self.writer = _BulkWriter(batch_size)
+        self.today = timezone.localdate()
+
+    #  Справочники
+
+    def _create_users(self):
+        password = make_password(SEED_PASSWORD)
+        joined = timezone.make_aware(datetime.combine(self.first_day - timedelta(days=30), day_time(8)))
+        users = []
+        for role, prefix, count in (('admin', 'admin', self.size['admins']), ('chef', 'chef', self.size['chefs']),
+                                    ('student', 'student', self.size['students'])):
+            width = len(str(count))
+            for number in range(1, count + 1):
+                username = f'{prefix}{number:0{width}d}'
+                users.append(CustomUser(
+                    username=username, email=f'{username}@school.example', password=password, role=role,
+                    first_name=username.capitalize(), school_class=f'{self.rng.randint(1, 11)}{self.rng.choice("АБВГ")}'
+                    if role == 'student' else '',
+                    date_joined=joined + timedelta(minutes=self.rng.randrange(30 * 24 * 60)),
+                ))
+        CustomUser.objects.bulk_create(users, batch_size=self.writer.batch_size)
+        users = list(CustomUser.objects.filter(username__in=[user.username for user in users]).order_by('id'))
+        self.staff = [user for user in users if user.role != 'student']
+        self.students = [user.id for user in users if user.role == 'student']
+        self.joined = {user.id: user.date_joined for user in users}
+        # Активность учеников неравномерна: одни обедают каждый день, другие - изредка
+        self.student_weights = list(accumulate(self.rng.paretovariate(1.5) for _ in self.students))
+
+    def _create_catalog(self):
+        products = []
+        for number in range(self.size['ingredients']):
+            name, unit = PRODUCTS[number % len(PRODUCTS)]
+            if number >= len(PRODUCTS):
+                name = f'{name} {number // len(PRODUCTS) + 1}'
+            products.append(Ingredient(name=name, unit=unit,
+                                       shelf_life_days=self.rng.choice([None, 5, 14, 30, 180])))
+        Ingredient.objects.bulk_create(products)
+        self.ingredients = list(Ingredient.objects.order_by('-id')[:len(products)])[::-1]
+        # Цена закупки за единицу в копейках: у штучных дороже, у граммов и миллилитров - дешевле
+        self.purchase_price = {
+            ingredient.id: self.rng.randint(800, 3000) if ingredient.unit == 'шт' else self.rng.randint(5, 120)
+            for ingredient in self.ingredients
+        }
+
+        categories = [Category(name=name) for name in CATEGORIES]
+        Category.objects.bulk_create(categories)
+        categories = list(Category.objects.order_by('-id')[:len(categories)])[::-1]
+        chef = self.staff[-1] if self.staff else None
+        created = timezone.make_aware(datetime.combine(self.first_day - timedelta(days=31), day_time(8)))
+        dishes = [
+            Dish(name=f'{category.name} №{number + 1}', description='',
+                 price=_money(self.rng.randrange(40, 200, 5) * 100), category=category, created_by=chef)
+            for number, category in ((number, self.rng.choice(categories)) for number in range(self.size['dishes']))
+        ]
+        Dish.objects.bulk_create(dishes)
+        self.dishes = list(Dish.objects.order_by('-id')[:len(dishes)])[::-1]
+        # Меню появилось до начала истории заказов (update не трогает auto_now_add)
+        Dish.objects.filter(id__in=[dish.id for dish in self.dishes]).update(created_at=created)
+        self.prices = {dish.id: int(dish.price * 100) for dish in self.dishes}
+        # Популярность блюд убывает как 1/ранг (несколько хитов и длинный хвост)
+        self.dish_weights = list(accumulate(1 / rank for rank in range(1, len(self.dishes) + 1)))
+
+        self.recipes = {}
+        recipe_rows = []
+        for dish in self.dishes:
+            recipe = []
+            for ingredient in self.rng.sample(self.ingredients, k=min(self.rng.randint(3, 7), len(self.ingredients))):
+                # Сотые доли единицы: 30-250 г/мл или 1-2 шт
+                amount = self.rng.randint(1, 2) * 100 if ingredient.unit == 'шт' else self.rng.randrange(30, 250, 10) * 100
+                recipe.append((ingredient.id, amount))
+                recipe_rows.append(DishIngredient(dish=dish, ingredient=ingredient, quantity=_quantity(amount),
+                                                  quantity_base=amount * unit_scale(ingredient.unit) // 100))
+            self.recipes[dish.id] = recipe
+        DishIngredient.objects.bulk_create(recipe_rows, batch_size=self.writer.batch_size)
+
+        allergic = self.rng.sample(self.students, k=int(len(self.students) * ALLERGIC_RATE))
+        Allergen = CustomUser.allergens.through
+        Allergen.objects.bulk_create([
+            Allergen(customuser_id=student_id, ingredient_id=ingredient.id)
+            for student_id in allergic
+            for ingredient in self.rng.sample(self.ingredients, k=min(2, len(self.ingredients)))
+        ], batch_size=self.writer.batch_size)
+
+    #  Запасы
+
+    def _plan_stock(self):
+        # Ожидаемый расход в день -> точка заказа и уровень пополнения
+        total = self.dish_weights[-1]
+        portions_per_day = self.size['orders_per_day'] * 2
+        daily = Counter()
+        previous = 0
+        for dish, cumulative in zip(self.dishes, self.dish_weights):
+            share = (cumulative - previous) / total
+            previous = cumulative
+            for ingredient_id, amount in self.recipes[dish.id]:
+                daily[ingredient_id] += share * portions_per_day * amount
+        self.reorder_point = {ingredient.id: int(daily[ingredient.id] * REORDER_DAYS) for ingredient in self.ingredients}
+        self.par_level = {ingredient.id: max(int(daily[ingredient.id] * PAR_DAYS), 100)
+                          for ingredient in self.ingredients}
+        self.stock = {ingredient.id: 0 for ingredient in self.ingredients}
+        self.average_cost = {ingredient.id: Decimal('0') for ingredient in self.ingredients}
+        self.lots = {ingredient.id: deque() for ingredient in self.ingredients}
+        self.units = {ingredient.id: ingredient for ingredient in self.ingredients}
+
+    def _stock_entry(self, ingredient_id, operation_type, change, at, total_cost, notes, user_id):
+        # Записи журнала создаются по порядку дней, поэтому их id растут вместе с днем created_at -
+        # на этом держится отметка roll_up_stock_history
+        before = self.stock[ingredient_id]
+        self.stock[ingredient_id] = before + change
+        entry_id = self.ids.take(StockHistory)
+        self.writer.add(
+            StockHistory, id=entry_id, ingredient_id=ingredient_id, operation_type=operation_type,
+            quantity_change=_quantity(change), quantity_before=_quantity(before),
+            quantity_after=_quantity(before + change), total_cost=total_cost,
+            performed_by_id=user_id, notes=notes, created_at=at,
+        )
+        return entry_id
+
+    def _restock(self, ingredient_id, amount, at, user_id):
+        # Поставка: новая партия, средневзвешенная стоимость как в orders.inventory
+        price = self.purchase_price[ingredient_id] * self.rng.uniform(0.9, 1.15)
+        total_cost = _money(round(amount * price / 100))
+        held = max(self.stock[ingredient_id], 0)
+        if held:
+            self.average_cost[ingredient_id] = (
+                (_quantity(held) * self.average_cost[ingredient_id] + total_cost) / _quantity(held + amount)
+            ).quantize(Decimal('0.0001'))
+        else:
+            self.average_cost[ingredient_id] = (total_cost / _quantity(amount)).quantize(Decimal('0.0001'))
+        entry_id = self._stock_entry(ingredient_id, 'restock', amount, at, total_cost, 'Плановая поставка', user_id)
+        ingredient = self.units[ingredient_id]
+        lot = {
+            'id': self.ids.take(IngredientLot), 'ingredient_id': ingredient_id, 'restock_entry_id': entry_id,
+            'quantity': _quantity(amount), 'cost_per_unit': (total_cost / _quantity(amount)).quantize(Decimal('0.01')),
+            'expires_at': at.date() + timedelta(days=ingredient.shelf_life_days) if ingredient.shelf_life_days else None,
+            'received_at': at,
+        }
+        self.lots[ingredient_id].append([lot, amount])
+
+    def _use(self, ingredient_id, amount, at, notes, user_id, operation_type='usage'):
+        # Расход по FIFO из партий; себестоимость по средневзвешенной стоимости
+        total_cost = (_quantity(amount) * self.average_cost[ingredient_id]).quantize(Decimal('0.01'))
+        self._stock_entry(ingredient_id, operation_type, -amount, at, total_cost, notes, user_id)
+        lots = self.lots[ingredient_id]
+        while amount > 0 and lots:
+            taken = min(amount, lots[0][1])
+            lots[0][1] -= taken
+            amount -= taken
+            if lots[0][1] == 0:
+                self._close_lot(lots.popleft())
+
+    def _close_lot(self, lot_state):
+        lot, remaining = lot_state
+        remaining_base = remaining * unit_scale(self.units[lot['ingredient_id']].unit) // 100
+        self.writer.add(IngredientLot, remaining_base=remaining_base, **lot)
+
+    #  Один учебный день
+
+    def _order_times(self, day, count):
+        moments = []
+        day_start = timezone.make_aware(datetime.combine(day, day_time.min))
+        starts = [(datetime.combine(day, start) - datetime.combine(day, day_time.min)).total_seconds()
+                  for start, _, _ in BREAKS]
+        shares = list(accumulate(share for _, _, share in BREAKS))
+        for _ in range(count):
+            index = bisect(shares, self.rng.random() * shares[-1])
+            index = min(index, len(BREAKS) - 1)
+            moments.append(day_start + timedelta(seconds=starts[index] + self.rng.random() * BREAKS[index][1] * 60))
+        moments.sort()
+        return moments
+
+    def _seed_day(self, day):
+        count = int(self.size['orders_per_day'] * self.rng.uniform(0.8, 1.2))
+        moments = self._order_times(day, count)
+        customers = self.rng.choices(self.students, cum_weights=self.student_weights, k=count)
+        day_start = timezone.make_aware(datetime.combine(day, day_time.min))
+        chef_id = self.staff[-1].id if self.staff else None
+        admin_id = self.staff[0].id if self.staff else None
+
+        sold = Counter()
+        for moment, customer_id in zip(moments, customers):
+            if self.joined[customer_id] > moment:
+                continue
+            dishes = set(self.rng.choices(self.dishes, cum_weights=self.dish_weights, k=self.rng.randint(1, 3)))
+            lines = [(dish, self.rng.choices((1, 2), (0.9, 0.1))[0]) for dish in dishes]
+            total = sum(self.prices[dish.id] * quantity for dish, quantity in lines)
+
+            if self.balance[customer_id] < total:
+                # Родители пополняют баланс перед покупкой
+                deposit = max(total, self.rng.choice((50000, 100000, 150000)))
+                self.balance[customer_id] += deposit
+                self.writer.add(
+                    Transaction, id=self.ids.take(Transaction), user_id=customer_id, amount=_money(deposit),
+                    transaction_type='deposit', balance_after=_money(self.balance[customer_id]),
+                    description='Пополнение баланса', created_at=moment - timedelta(minutes=5),
+                )
+
+            cancelled = self.rng.random() < CANCEL_RATE
+            order_id = self.ids.take(Order)
+            self.writer.add(
+                Order, id=order_id, customer_id=customer_id, status='cancelled' if cancelled else 'picked_up',
+                total_price=_money(total), created_at=moment, updated_at=moment + timedelta(minutes=10),
+            )
+            for dish, quantity in lines:
+                self.writer.add(OrderItem, id=self.ids.take(OrderItem), order_id=order_id, dish_id=dish.id,
+                                quantity=quantity, price_at_time=dish.price, status='ready')
+            if cancelled:
+                continue
+
+            self.balance[customer_id] -= total
+            self.writer.add(
+                Payment, id=self.ids.take(Payment), order_id=order_id, user_id=customer_id, amount=_money(total),
+                status='paid', payment_method='balance', created_at=moment, completed_at=moment,
+                description=f'Оплата заказа #{order_id}',
+            )
+            self.writer.add(
+                Transaction, id=self.ids.take(Transaction), user_id=customer_id, amount=_money(-total),
+                transaction_type='payment', balance_after=_money(self.balance[customer_id]), order_id=order_id,
+                description=f'Оплата заказа #{order_id}', created_at=moment,
+            )
+            for dish, quantity in lines:
+                sold[dish.id] += quantity
+            if self.rng.random() < REVIEW_RATE:
+                dish = lines[0][0]
+                reviewed = moment + timedelta(hours=self.rng.randint(1, 6))
+                self.writer.add(Review, id=self.ids.take(Review), user_id=customer_id, dish_id=dish.id,
+                                order_id=order_id, rating=self.rng.choices((1, 2, 3, 4, 5), (1, 1, 3, 6, 9))[0],
+                                created_at=reviewed, updated_at=reviewed)
+
+        # Утром - поставки под сегодняшний расход, затем приготовление проданного
+        needed = Counter()
+        for dish_id, portions in sold.items():
+            for ingredient_id, amount in self.recipes[dish_id]:
+                needed[ingredient_id] += amount * portions
+        delivery = day_start + timedelta(hours=7)
+        for ingredient in self.ingredients:
+            left = self.stock[ingredient.id] - needed[ingredient.id]
+            if left < self.reorder_point[ingredient.id]:
+                self._restock(ingredient.id, self.par_level[ingredient.id] - left, delivery, admin_id)
+        cooking = day_start + timedelta(hours=8)
+        for offset, (dish_id, portions) in enumerate(sorted(sold.items())):
+            for ingredient_id, amount in self.recipes[dish_id]:
+                self._use(ingredient_id, amount * portions, cooking + timedelta(seconds=offset),
+                          f'Приготовление: блюдо #{dish_id} x{portions}', chef_id)
+
+        # Изредка - списание испорченного
+        for ingredient in self.rng.sample(self.ingredients, k=max(len(self.ingredients) // 50, 1)):
+            waste = min(self.stock[ingredient.id], self.rng.randint(1, 5) * 1000)
+            if waste > 0:
+                self._use(ingredient.id, waste, day_start + timedelta(hours=16), 'Списание', admin_id, 'waste')
+
+    #  Итоговые состояния
+
+    def _prepare_today(self):
+        # Готовые порции на сегодня, приготовленные из текущих запасов
+        chef_id = self.staff[-1].id if self.staff else None
+        cooking = timezone.now() - timedelta(minutes=30)
+        prepared = []
+        for dish in self.dishes[:max(len(self.dishes) // 2, 1)]:
+            portions = self.rng.randint(5, 30)
+            if any(self.stock[ingredient_id] < amount * portions for ingredient_id, amount in self.recipes[dish.id]):
+                continue
+            for ingredient_id, amount in self.recipes[dish.id]:
+                self._use(ingredient_id, amount * portions, cooking,
+                          f'Использовано для приготовления {dish.name} x{portions}', chef_id)
+            prepared.append(PreparedDish(dish=dish, quantity=portions, max_quantity=portions * 2,
+                                         prepared_by_id=chef_id))
+        PreparedDish.objects.bulk_create(prepared)
+
+    def _save_state(self):
+        for lots in self.lots.values():
+            while lots:
+                self._close_lot(lots.popleft())
+        self.writer.flush()
+
+        stocks = []
+        for ingredient in self.ingredients:
+            quantity = _quantity(self.stock[ingredient.id])
+            min_quantity = _quantity(self.reorder_point[ingredient.id])
+            stocks.append(IngredientStock(
+                ingredient=ingredient, current_quantity=quantity, min_quantity=min_quantity,
+                quantity_base=self.stock[ingredient.id] * unit_scale(ingredient.unit) // 100,
+                level=stock_level(quantity, min_quantity),
+            ))
+        IngredientStock.objects.bulk_create(stocks)
+        IngredientCost.objects.bulk_create([
+            IngredientCost(ingredient_id=ingredient_id, average_cost=average_cost,
+                           cost_per_unit=_money(self.purchase_price[ingredient_id]))
+            for ingredient_id, average_cost in self.average_cost.items()
+        ])
+
+        students = list(CustomUser.objects.filter(id__in=self.students))
+        for student in students:
+            student.balance = _money(self.balance[student.id])
+        CustomUser.objects.bulk_update(students, ['balance'], batch_size=self.writer.batch_size)
+
+    def run(self, rollups=True):
+        # Возвращает {модель: создано записей} и время в секундах
+        started = time.perf_counter()
+        self.first_day = self.today - timedelta(days=self.size['days'])
+        self._create_users()
+        self._create_catalog()
+        self._plan_stock()
+        self.ids = _Ids(*_BulkWriter.ORDER)
+
+        # Начальный баланс при регистрации
+        self.balance = {}
+        for student_id in self.students:
+            self.balance[student_id] = self.rng.randrange(200, 1500, 50) * 100
+            self.writer.add(
+                Transaction, id=self.ids.take(Transaction), user_id=student_id,
+                amount=_money(self.balance[student_id]), transaction_type='deposit',
+                balance_after=_money(self.balance[student_id]), description='Начальный баланс',
+                created_at=self.joined[student_id],
+            )
+
+        day = self.first_day
+        while day < self.today:
+            # Заказы только в учебные дни
+            if day.weekday() < 5:
+                self._seed_day(day)
+            day += timedelta(days=1)
+        self._prepare_today()
+        self._save_state()
+
+        recount_stock_levels()
+        invalidate_catalog()
+        invalidate_dish_costs()
+        reset_trending()
+        if rollups:
+            rebuild_demand_cube()
+            roll_up_daily_sales(rebuild_days=self.size['days'] + 1)
+            roll_up_stock_history()
+            take_stock_snapshots()
+
+        counts = dict(self.writer.counts)
+        counts.update({'CustomUser': len(self.students) + len(self.staff), 'Dish': len(self.dishes),
+                       'Ingredient': len(self.ingredients)})
+        return counts, time.perf_counter() - started
+
+
+def seed_canteen(preset='small', seed=1, rollups=True, batch_size=BATCH_SIZE, **overrides):
+    # Заполняет пустую базу данными столовой размера preset (параметры можно переопределить)
+    if Order.objects.exists() or Dish.objects.exists():
+        raise SeedError('В базе уже есть блюда или заказы: заполнять можно только пустую базу')
+    size = dict(PRESETS[preset])
+    size.update({key: value for key, value in overrides.items() if value is not None})
+    return CanteenGenerator(seed=seed, batch_size=batch_size, **size).run(rollups=rollups)
@@ -0,0 +1,72 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .catalog import invalidate_catalog
+from .costing import invalidate_dish_costs
+from .demand import forget_order, forget_order_item, record_order_item
+from .models import Category, Dish, DishIngredient, Ingredient, IngredientCost, Order, OrderItem
+from .trending import count_order_item, uncount_order
+
+
+# Себестоимость блюд пересчитывается после изменения рецептов или стоимости ингредиентов.
+# Массовые обновления стоимости (orders.inventory) сбрасывают кэш сами
+@receiver([post_save, post_delete], sender=DishIngredient)
+@receiver([post_save, post_delete], sender=IngredientCost)
+def reset_dish_costs(sender, **kwargs):
+    invalidate_dish_costs()
+
+
+# Спрос по дням недели и часам пополняется с каждым новым элементом заказа
+# и уменьшается при отмене заказа или удалении его элементов
+@receiver(post_save, sender=OrderItem)
+def count_demand(sender, instance, created, **kwargs):
+    if created:
+        record_order_item(instance)
+
+
+@receiver(pre_delete, sender=OrderItem)
+def uncount_demand(sender, instance, **kwargs):
+    forget_order_item(instance)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    # Прежний статус нужен только при отмене: остальные сохранения заказа лишнего запроса не делают
+    instance._status_before_save = None
+    if instance.pk and instance.status == 'cancelled':
+        instance._status_before_save = (Order.objects.filter(pk=instance.pk)
+                                        .values_list('status', flat=True).first())
+
+
+@receiver(post_save, sender=Order)
+def uncount_cancelled_order(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_status_before_save', None)
+    if previous is not None and previous != 'cancelled':
+        forget_order(instance)
+        uncount_order(instance)
+
+
+# Окно "популярно сейчас" для меню
+@receiver(post_save, sender=OrderItem)
+def count_trending(sender, instance, created, **kwargs):
+    if created:
+        count_order_item(instance)
+
+
+# Справочники каталога в кэше устаревают при любом изменении категорий, ингредиентов, блюд и рецептов
+CATALOG_MODELS = (Category, Ingredient, Dish, DishIngredient)
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=Dish)
+@receiver([post_save, post_delete], sender=DishIngredient)
+def reset_catalog(sender, **kwargs):
+    invalidate_catalog()
+
+
+# Связи многие-ко-многим, объявленные в моделях каталога (sender - промежуточная таблица)
+@receiver(m2m_changed)
+def reset_catalog_relations(sender, action, **kwargs):
+    if sender._meta.auto_created in CATALOG_MODELS and action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_catalog()
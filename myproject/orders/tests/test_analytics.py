@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from orders.analytics import MAX_BUCKETS, _bucket_count, _bucket_keys, moving_average, parse_series_params, time_series
+from orders.models import Category, Dish, Order, OrderItem, Payment
+from orders.sales import roll_up_daily_sales
+from users.models import CustomUser
+
+
+class TimeSeriesTest(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('admin', 'a@x.ru', 'pw', role='admin')
+        self.dish = Dish.objects.create(name='Суп', description='', price=Decimal('50'),
+                                        category=Category.objects.create(name='Супы'))
+        now = timezone.now()
+        for days_ago, portions in ((2, 1), (1, 3), (0, 2)):
+            moment = now - timedelta(days=days_ago)
+            order = Order.objects.create(customer=self.admin, total_price=50 * portions)
+            OrderItem.objects.create(order=order, dish=self.dish, quantity=portions, price_at_time=Decimal('50'))
+            payment = Payment.objects.create(user=self.admin, order=order, amount=50 * portions, status='paid')
+            Order.objects.filter(id=order.id).update(created_at=moment)
+            Payment.objects.filter(id=payment.id).update(created_at=moment)
+        self.today = timezone.localdate()
+
+    def test_daily_series_from_rollups_and_live_rows(self):
+        start = self.today - timedelta(days=2)
+        live_only = time_series(start, self.today, 'day', window=2)
+        roll_up_daily_sales()
+        mixed = time_series(start, self.today, 'day', window=2)
+
+        self.assertEqual(live_only, mixed)
+        self.assertEqual(mixed['revenue'], [50.0, 150.0, 100.0])
+        self.assertEqual(mixed['revenue_moving_average'], [50.0, 100.0, 125.0])
+        self.assertEqual(mixed['portions_by_dish'][0]['portions'], [1, 3, 2])
+
+    def test_api_validates_params(self):
+        self.client.force_login(self.admin)
+        response = self.client.get('/statistics/api/', {'bucket': 'month'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sum(response.json()['orders']), 3)
+        self.assertEqual(self.client.get('/statistics/api/', {'bucket': 'year'}).status_code, 400)
+
+    def test_every_bucket_size_is_capped(self):
+        start = timezone.localdate().replace(month=1, day=1) - timedelta(days=400)
+        for bucket, days in (('hour', 30), ('day', 700), ('week', 3000), ('month', 20000)):
+            end = start + timedelta(days=days)
+            self.assertEqual(_bucket_count(start, end, bucket), len(_bucket_keys(start, end, bucket)))
+            parse_series_params({'start': start.isoformat(), 'end': end.isoformat(), 'bucket': bucket})
+
+        for bucket, days in (('hour', 31), ('day', MAX_BUCKETS), ('week', 7 * MAX_BUCKETS), ('month', 31 * MAX_BUCKETS)):
+            with self.assertRaises(ValueError):
+                parse_series_params({'start': '0001-01-01', 'end': (date(1, 1, 1) + timedelta(days=days)).isoformat(),
+                                     'bucket': bucket})
+
+        self.client.force_login(self.admin)
+        response = self.client.get('/statistics/api/', {'start': '0001-01-01', 'end': '9999-12-31'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_moving_average(self):
+        self.assertEqual(moving_average([3, 3, 6, 0], 3), [Decimal('3'), Decimal('3'), Decimal('4'), Decimal('3')])
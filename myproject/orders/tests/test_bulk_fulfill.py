@@ -0,0 +1,31 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from orders.inventory import create_stock, fulfill_restock_requests, record_stock_change
+from orders.models import Ingredient, IngredientCost, IngredientStock, StockHistory
+
+
+class BulkFulfillTest(TestCase):
+    def setUp(self):
+        self.ingredients = [Ingredient.objects.create(name=f'Продукт {i}', unit='кг') for i in range(3)]
+        self.requests = []
+        for ingredient in self.ingredients:
+            create_stock(ingredient, min_quantity=Decimal('0'))
+            self.requests.append(record_stock_change(ingredient, 'request', Decimal('4')))
+
+    def test_fulfill_many_requests_at_once(self):
+        # число запросов не зависит от количества выполняемых заявок
+        costs = {restock_request.id: Decimal('10') for restock_request in self.requests}
+        with self.assertNumQueries(14):
+            fulfilled = fulfill_restock_requests(costs)
+
+        self.assertEqual(len(fulfilled), 3)
+        self.assertFalse(StockHistory.objects.filter(operation_type='request', fulfilled_at__isnull=True).exists())
+        self.assertEqual(StockHistory.objects.filter(operation_type='restock').count(), 3)
+        for stock in IngredientStock.objects.all():
+            self.assertEqual(stock.current_quantity, Decimal('4'))
+        self.assertEqual(IngredientCost.objects.filter(cost_per_unit=Decimal('10')).count(), 3)
+
+        # повторное выполнение ничего не меняет
+        self.assertEqual(fulfill_restock_requests(costs), [])
@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from orders.cart import decode_cart, encode_cart
+from orders.loadtest import cart_writes_database
+from orders.models import Category, Dish
+from users.models import CustomUser
+
+
+class CartStorageTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = CustomUser.objects.create_user('student', 's@x.ru', 'pw', role='student')
+        self.dish = Dish.objects.create(name='Суп', description='', price=Decimal('50'),
+                                        category=Category.objects.create(name='Супы'))
+        self.client.force_login(self.student)
+
+    def test_compact_encoding_round_trip(self):
+        cart = {'12': 3, '7': 1}
+        self.assertEqual(encode_cart(cart), '12:3,7:1')
+        self.assertEqual(decode_cart(encode_cart(cart)), cart)
+        self.assertEqual(decode_cart({'5': 2}), {'5': 2})
+        self.assertEqual(decode_cart('5:2,bad,9:x'), {'5': 2})
+
+    @override_settings(CART_STORAGE='cache')
+    def test_cache_cart_does_not_write_to_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('add_to_cart', args=[self.dish.id]))
+            self.client.get(reverse('add_to_cart', args=[self.dish.id]))
+        writes = [query['sql'] for query in queries if not query['sql'].lstrip().upper().startswith('SELECT')]
+
+        self.assertEqual(writes, [])
+        self.assertEqual(self.client.get(reverse('view_cart')).context['cart_items'][0]['quantity'], 2)
+
+    def test_default_cart_does_not_write_to_database(self):
+        # Без общего кэша сессия по умолчанию - подписанная cookie, корзина в ней
+        self.assertEqual((settings.SESSION_MODE, settings.CART_STORAGE), ('signed_cookies', 'session'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('add_to_cart', args=[self.dish.id]))
+        writes = [query['sql'] for query in queries if not query['sql'].lstrip().upper().startswith('SELECT')]
+
+        self.assertEqual(writes, [])
+        self.assertFalse(cart_writes_database())
+        with override_settings(SESSION_MODE='cached_db'):
+            self.assertTrue(cart_writes_database())
+
+    @override_settings(CART_STORAGE='session')
+    def test_session_cart_is_stored_as_compact_string(self):
+        self.client.get(reverse('add_to_cart', args=[self.dish.id]))
+        self.assertEqual(self.client.session['cart'], f'{self.dish.id}:1')
+
+    @override_settings(CART_STORAGE='cache', SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_session_cart_moves_to_cache_once(self):
+        self.client.force_login(self.student)
+        session = self.client.session
+        session['cart'] = {str(self.dish.id): 2}
+        session.save()
+
+        self.assertEqual(self.client.get(reverse('view_cart')).context['cart_items'][0]['quantity'], 2)
+        self.assertNotIn('cart', self.client.session)
+        self.assertEqual(cache.get(f'orders:cart:{self.student.id}'), f'{self.dish.id}:2')
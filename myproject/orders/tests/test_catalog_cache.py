@@ -0,0 +1,62 @@
+import re
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from orders.catalog import catalog_categories, catalog_ingredients, catalog_recipes, catalog_version
+from orders.models import Category, Dish, DishIngredient, Ingredient, PreparedDish
+from users.models import CustomUser
+
+
+class CatalogCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.soups = Category.objects.create(name='Супы')
+        self.potato = Ingredient.objects.create(name='Картофель', unit='г')
+        self.dish = Dish.objects.create(name='Суп', description='', price=Decimal('50'), category=self.soups)
+        DishIngredient.objects.create(dish=self.dish, ingredient=self.potato, quantity=Decimal('150'))
+
+    def test_repeated_reads_hit_cache(self):
+        catalog_categories(), catalog_ingredients(), catalog_recipes()
+        with self.assertNumQueries(0):
+            self.assertEqual([c.name for c in catalog_categories()], ['Супы'])
+            self.assertEqual([i.name for i in catalog_ingredients()], ['Картофель'])
+            self.assertEqual(catalog_recipes()[self.dish.id][0].ingredient.name, 'Картофель')
+
+    def test_save_and_delete_bump_version(self):
+        version = catalog_version()
+        self.assertEqual(len(catalog_categories()), 1)
+
+        salads = Category.objects.create(name='Салаты')
+        self.assertNotEqual(catalog_version(), version)
+        self.assertEqual(len(catalog_categories()), 2)
+
+        salads.delete()
+        self.assertEqual(len(catalog_categories()), 1)
+
+    def test_recipe_changes_invalidate_recipes(self):
+        self.assertEqual(len(catalog_recipes()[self.dish.id]), 1)
+        milk = Ingredient.objects.create(name='Молоко', unit='мл')
+        DishIngredient.objects.create(dish=self.dish, ingredient=milk, quantity=Decimal('100'))
+        self.assertEqual(len(catalog_recipes()[self.dish.id]), 2)
+
+        DishIngredient.objects.filter(dish=self.dish).delete()
+        self.assertNotIn(self.dish.id, catalog_recipes())
+
+    def test_menu_reads_recipes_from_cache(self):
+        student = CustomUser.objects.create_user('student', 's@x.ru', 'pw', role='student')
+        PreparedDish.objects.create(dish=self.dish, quantity=3)
+        self.client.force_login(student)
+        self.client.get(reverse('menu'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('menu'))
+        self.assertContains(response, 'Картофель 150')
+        # Основная таблица каждого запроса (первая после FROM)
+        tables = [re.search(r'FROM "(\w+)"', query['sql']).group(1) for query in queries if 'FROM' in query['sql']]
+        catalog_reads = [table for table in tables if table in ('orders_dishingredient', 'orders_category')]
+        self.assertEqual(catalog_reads, [])
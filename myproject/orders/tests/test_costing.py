@@ -0,0 +1,39 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from orders.costing import dish_costs, profitability_report
+from orders.inventory import record_stock_change
+from orders.models import Category, Dish, DishIngredient, Ingredient, Order, OrderItem
+from users.models import CustomUser
+
+
+class DishCostingTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Выпечка')
+        self.flour = Ingredient.objects.create(name='Мука', unit='кг')
+        record_stock_change(self.flour, 'restock', Decimal('10'), total_cost=Decimal('500'))
+        self.pancakes = Dish.objects.create(name='Блины', description='', price=Decimal('60'), category=category)
+        self.bread = Dish.objects.create(name='Хлеб', description='', price=Decimal('30'), category=category)
+        DishIngredient.objects.create(dish=self.pancakes, ingredient=self.flour, quantity=Decimal('0.2'))
+        DishIngredient.objects.create(dish=self.bread, ingredient=self.flour, quantity=Decimal('0.4'))
+
+    def test_costs_follow_recipe_and_price_changes(self):
+        self.assertEqual(dish_costs(), {self.pancakes.id: Decimal('10.00'), self.bread.id: Decimal('20.00')})
+
+        # новая закупка меняет среднюю стоимость - кэш сбрасывается
+        record_stock_change(self.flour, 'restock', Decimal('10'), total_cost=Decimal('1500'))
+        self.assertEqual(dish_costs()[self.pancakes.id], Decimal('20.00'))
+
+        DishIngredient.objects.filter(dish=self.bread).get().delete()
+        self.assertNotIn(self.bread.id, dish_costs())
+
+    def test_report_sorted_by_margin_times_volume(self):
+        customer = CustomUser.objects.create_user('student', 's@x.ru', 'pw', role='student')
+        order = Order.objects.create(customer=customer, total_price=Decimal('0'))
+        OrderItem.objects.create(order=order, dish=self.pancakes, quantity=1, price_at_time=Decimal('60'))
+        OrderItem.objects.create(order=order, dish=self.bread, quantity=6, price_at_time=Decimal('30'))
+
+        report = profitability_report()
+        self.assertEqual([dish.id for dish in report], [self.bread.id, self.pancakes.id])
+        self.assertEqual(report[0].total_margin, Decimal('60.00'))
@@ -0,0 +1,45 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from orders.models import Category, DailyDishSales, DailySalesSummary, Dish, Order, OrderItem, Payment
+from orders.sales import roll_up_daily_sales, sales_dashboard
+from users.models import CustomUser
+
+
+class DailySalesTest(TestCase):
+    def setUp(self):
+        self.student = CustomUser.objects.create_user('student', 's@x.ru', 'pw', role='student')
+        self.dish = Dish.objects.create(name='Каша', description='', price=Decimal('40'),
+                                        category=Category.objects.create(name='Завтраки'))
+        self.yesterday = timezone.now() - timedelta(days=1)
+        self.make_sale(Decimal('80'), self.yesterday)
+        self.make_sale(Decimal('40'), timezone.now())
+
+    def make_sale(self, amount, moment):
+        order = Order.objects.create(customer=self.student, total_price=amount)
+        OrderItem.objects.create(order=order, dish=self.dish, quantity=int(amount // 40), price_at_time=Decimal('40'))
+        payment = Payment.objects.create(user=self.student, order=order, amount=amount, status='paid')
+        Order.objects.filter(id=order.id).update(created_at=moment)
+        Payment.objects.filter(id=payment.id).update(created_at=moment)
+
+    def test_rollup_is_incremental(self):
+        self.assertEqual(roll_up_daily_sales(), 1)
+        self.assertEqual(roll_up_daily_sales(), 0)
+
+        summary = DailySalesSummary.objects.get()
+        self.assertEqual(summary.day, timezone.localdate(self.yesterday))
+        self.assertEqual((summary.revenue, summary.orders_count, summary.portions_sold), (Decimal('80'), 1, 2))
+        self.assertEqual(DailyDishSales.objects.get().portions, 2)
+
+    def test_dashboard_same_with_and_without_summaries(self):
+        before = sales_dashboard()
+        roll_up_daily_sales()
+        after = sales_dashboard()
+
+        self.assertEqual(before, after)
+        self.assertEqual(after['total_income'], Decimal('120'))
+        self.assertEqual(after['today_income'], Decimal('40'))
+        self.assertEqual(after['total_orders'], 2)
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db.models.query import QuerySet
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.demand import demand_arrays, heatmap, rebuild_demand_cube
+from orders.models import Category, DemandCell, Dish, Order, OrderItem
+from users.models import CustomUser
+
+
+class DemandCubeTest(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('admin', 'a@x.ru', 'pw', role='admin')
+        category = Category.objects.create(name='Супы')
+        self.soup = Dish.objects.create(name='Суп', description='', price=Decimal('50'), category=category)
+        self.tea = Dish.objects.create(name='Чай', description='', price=Decimal('10'), category=category)
+
+    def order(self, *items):
+        order = Order.objects.create(customer=self.admin, total_price=0)
+        for dish, quantity in items:
+            OrderItem.objects.create(order=order, dish=dish, quantity=quantity, price_at_time=dish.price)
+        return order
+
+    def test_new_items_update_cube_incrementally(self):
+        self.order((self.soup, 2), (self.tea, 1))
+        self.order((self.soup, 3))
+        now = timezone.localtime()
+
+        arrays = demand_arrays()
+        self.assertEqual(arrays['total'][now.weekday()][now.hour], 6)
+        self.assertEqual(arrays['by_dish'][self.soup.id][now.weekday()][now.hour], 5)
+        self.assertEqual(DemandCell.objects.count(), 2)
+
+    def test_cancel_and_delete_reduce_cube(self):
+        cancelled = self.order((self.soup, 2), (self.tea, 1))
+        deleted = self.order((self.soup, 3))
+        self.order((self.soup, 1))
+
+        cancelled.status = 'cancelled'
+        cancelled.save()
+        deleted.delete()
+
+        total = sum(map(sum, demand_arrays()['total']))
+        self.assertEqual(total, 1)
+        rebuild_demand_cube()
+        self.assertEqual(sum(map(sum, demand_arrays()['total'])), total)
+
+    def test_cell_created_concurrently_is_incremented(self):
+        order = self.order()
+        item = OrderItem(order=order, dish=self.soup, quantity=2, price_at_time=self.soup.price)
+        moment = timezone.localtime(order.created_at)
+        # Другой заказ успел создать ячейку между неудачным UPDATE и INSERT
+        original_update = QuerySet.update
+        calls = []
+
+        def first_update_misses(queryset, **kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                DemandCell.objects.create(weekday=moment.weekday(), hour=moment.hour, dish=self.soup, portions=5)
+                return 0
+            return original_update(queryset, **kwargs)
+
+        with mock.patch('django.db.models.query.QuerySet.update', first_update_misses):
+            item.save()
+        self.assertEqual(DemandCell.objects.get().portions, 7)
+
+    def test_rebuild_matches_order_times(self):
+        order = self.order((self.soup, 4))
+        moment = timezone.localtime() - timedelta(days=3, hours=2)
+        Order.objects.filter(id=order.id).update(created_at=moment)
+
+        self.assertEqual(rebuild_demand_cube(), 1)
+        cell = DemandCell.objects.get()
+        self.assertEqual((cell.weekday, cell.hour, cell.portions), (moment.weekday(), moment.hour, 4))
+
+    def test_heatmap_trims_hours_and_scales_intensity(self):
+        matrix = [[0] * 24 for _ in range(7)]
+        matrix[0][12], matrix[2][14] = 10, 5
+        data = heatmap(matrix)
+
+        self.assertEqual(data['hours'], [12, 13, 14])
+        self.assertEqual([cell['intensity'] for cell in data['rows'][2]['cells']], [0, 0, 0.5])
+        self.assertEqual(heatmap([[0] * 24 for _ in range(7)])['hours'], [])
+
+    def test_api_filters_by_dish(self):
+        self.order((self.soup, 2), (self.tea, 1))
+        self.client.force_login(self.admin)
+
+        data = self.client.get(reverse('demand_api'), {'dish': self.tea.id}).json()
+        self.assertEqual(list(data['by_dish']), [str(self.tea.id)])
+        self.assertEqual(sum(map(sum, data['total'])), 1)
+        self.assertEqual(self.client.get(reverse('demand_api'), {'dish': 'x'}).status_code, 400)
@@ -0,0 +1,38 @@
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from orders.models import Payment
+from users.models import CustomUser
+
+
+class StreamingExportTest(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('admin', 'a@x.ru', 'pw', role='admin')
+        old = Payment.objects.create(user=self.admin, amount=Decimal('10.50'), status='paid', description='Старый')
+        Payment.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=10))
+        Payment.objects.create(user=self.admin, amount=Decimal('20'), status='paid', description='Новый')
+
+    def test_csv_view_streams_filtered_rows(self):
+        self.client.force_login(self.admin)
+        start = (timezone.localdate() - timedelta(days=1)).isoformat()
+        response = self.client.get('/statistics/export/payments/', {'start': start})
+
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode('utf-8-sig')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row['description'] for row in rows], ['Новый'])
+        self.assertEqual(self.client.get('/statistics/export/users/').status_code, 404)
+
+    def test_jsonl_command(self):
+        out = io.StringIO()
+        call_command('export_data', 'payments', '--format', 'jsonl', stdout=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([record['amount'] for record in records], ['10.50', '20.00'])
+        self.assertIsNone(records[0]['order_id'])
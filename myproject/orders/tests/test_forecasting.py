@@ -0,0 +1,60 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from orders.forecasting import _smoothed_level, _weekday_factors, forecast_ingredients
+from orders.inventory import create_stock, record_stock_change
+from orders.models import Ingredient, IngredientStock, StockHistory
+
+
+class ForecastTest(TestCase):
+    def setUp(self):
+        self.ingredient = Ingredient.objects.create(name='Рис', unit='кг')
+        record_stock_change(self.ingredient, 'restock', Decimal('100'))
+        # две недели расход по 5 кг в день
+        for days_ago in range(1, 15):
+            entry = record_stock_change(self.ingredient, 'usage', Decimal('-5'))
+            StockHistory.objects.filter(id=entry.id).update(
+                created_at=timezone.now() - timedelta(days=days_ago))
+        self.stock = IngredientStock.objects.get(ingredient=self.ingredient)
+
+    def test_forecast_from_usage(self):
+        forecast = forecast_ingredients([self.stock])[self.ingredient.id]
+
+        self.assertEqual(self.stock.current_quantity, Decimal('30'))
+        self.assertEqual(forecast['daily_rate'], Decimal('5.00'))
+        self.assertEqual(forecast['days_of_cover'], 6.0)
+        # 9 дней (поставка + период закупки) по 5 кг минус остаток
+        self.assertGreaterEqual(forecast['suggested_quantity'], Decimal('15'))
+
+    def test_no_usage_falls_back_to_min_quantity(self):
+        other = Ingredient.objects.create(name='Соль', unit='кг')
+        stock = create_stock(other)
+        forecast = forecast_ingredients([stock])[other.id]
+
+        self.assertIsNone(forecast['days_of_cover'])
+        self.assertEqual(forecast['reorder_point'], stock.min_quantity)
+
+    def test_closed_days_do_not_pull_level_down(self):
+        # Четыре недели: по 5 в будни, в выходные расхода нет
+        weekdays = [day % 7 for day in range(28)]
+        values = [5.0 if weekday < 5 else 0.0 for weekday in weekdays]
+        factors = _weekday_factors(values, weekdays)
+
+        self.assertAlmostEqual(_smoothed_level(values, weekdays, factors), 25 / 7)
+        self.assertAlmostEqual(_smoothed_level(values, weekdays, factors) * factors[0], 5.0)
+
+    def test_single_stock_reads_only_its_history(self):
+        other = Ingredient.objects.create(name='Гречка', unit='кг')
+        record_stock_change(other, 'restock', Decimal('50'))
+        entry = record_stock_change(other, 'usage', Decimal('-50'))
+        StockHistory.objects.filter(id=entry.id).update(created_at=timezone.now() - timedelta(days=1))
+
+        with CaptureQueriesContext(connection) as queries:
+            forecasts = forecast_ingredients([self.stock])
+        self.assertEqual(list(forecasts), [self.ingredient.id])
+        self.assertIn('"ingredient_id" IN', queries[0]['sql'])
@@ -0,0 +1,42 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from orders.inventory import record_stock_change, write_off_expired_lots
+from orders.models import Ingredient, IngredientLot, IngredientStock
+
+
+class IngredientLotTest(TestCase):
+    def setUp(self):
+        self.ingredient = Ingredient.objects.create(name='Молоко', unit='л', shelf_life_days=5)
+        today = timezone.localdate()
+        # старая партия с поздним сроком и новая, которая испортится раньше
+        record_stock_change(self.ingredient, 'restock', Decimal('10'), total_cost=Decimal('800'),
+                            expires_at=today + timedelta(days=10))
+        record_stock_change(self.ingredient, 'restock', Decimal('4'), total_cost=Decimal('360'),
+                            expires_at=today - timedelta(days=1))
+
+    def test_usage_takes_earliest_expiry_first(self):
+        record_stock_change(self.ingredient, 'usage', Decimal('-5'))
+
+        late, early = IngredientLot.objects.order_by('-expires_at')
+        self.assertEqual(early.remaining, Decimal('0'))
+        self.assertEqual(late.remaining, Decimal('9'))
+        self.assertEqual(late.cost_per_unit, Decimal('80'))
+
+    def test_write_off_expired_lots(self):
+        entries = write_off_expired_lots()
+
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0].operation_type, 'waste')
+        self.assertEqual(entries[0].quantity_change, Decimal('-4'))
+        self.assertEqual(entries[0].total_cost, Decimal('360'))
+        self.assertEqual(IngredientStock.objects.get(ingredient=self.ingredient).current_quantity, Decimal('10'))
+        self.assertEqual(write_off_expired_lots(), [])
+
+    def test_shelf_life_sets_default_expiry(self):
+        entry = record_stock_change(self.ingredient, 'restock', Decimal('1'))
+        lot = IngredientLot.objects.get(restock_entry=entry)
+        self.assertEqual(lot.expires_at, timezone.localdate() + timedelta(days=5))
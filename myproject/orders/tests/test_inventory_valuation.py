@@ -0,0 +1,25 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from orders.inventory import operation_cost_totals, record_stock_change
+from orders.models import Ingredient, IngredientCost
+
+
+class WeightedAverageCostTest(TestCase):
+    def setUp(self):
+        self.ingredient = Ingredient.objects.create(name='Гречка', unit='кг')
+
+    def test_average_cost_and_usage_valuation(self):
+        record_stock_change(self.ingredient, 'restock', Decimal('10'), total_cost=Decimal('1000'))
+        record_stock_change(self.ingredient, 'usage', Decimal('-4'))
+        # 6 кг по 100 + 6 кг по 120 -> 110 за кг
+        record_stock_change(self.ingredient, 'restock', Decimal('6'), total_cost=Decimal('720'))
+
+        cost = IngredientCost.objects.get(ingredient=self.ingredient)
+        self.assertEqual(cost.cost_per_unit, Decimal('120'))
+        self.assertEqual(cost.average_cost, Decimal('110'))
+
+        usage = record_stock_change(self.ingredient, 'usage', Decimal('-2'))
+        self.assertEqual(usage.total_cost, Decimal('220'))
+        self.assertEqual(operation_cost_totals('usage')[0], Decimal('620'))
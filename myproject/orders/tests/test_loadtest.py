@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+
+from orders.loadtest import CATEGORY_NAME, check_consistency, percentile, run_lunch_rush, seed_school, take_snapshot
+from orders.models import Dish, PreparedDish
+from users.models import CustomUser
+
+
+class SeedSchoolTest(TestCase):
+    def test_seed_is_consistent_and_repeatable(self):
+        seed_school(students=10, chefs=1, dishes=4, ingredients=6)
+        prices = list(Dish.objects.filter(category__name=CATEGORY_NAME).values_list('price', flat=True))
+        seed_school(students=10, chefs=1, dishes=4, ingredients=6)
+
+        self.assertEqual(CustomUser.objects.filter(role='student').count(), 10)
+        self.assertEqual(list(Dish.objects.filter(category__name=CATEGORY_NAME).values_list('price', flat=True)), prices)
+        self.assertEqual(check_consistency(take_snapshot(), {})['violations'], 0)
+
+    def test_consistency_detects_lost_prepared_update(self):
+        seed_school(students=2, chefs=0, dishes=2, ingredients=4)
+        snapshot = take_snapshot()
+        # Порция продана (готовых стало меньше), а проданный элемент заказа не записан
+        prepared = PreparedDish.objects.first()
+        prepared.quantity -= 1
+        prepared.save()
+
+        self.assertEqual(check_consistency(snapshot, {})['lost_prepared_portions'], 1)
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertIsNone(percentile([], 50))
+
+
+class LunchRushTest(TransactionTestCase):
+    def test_sequential_run_reports_endpoints(self):
+        cache.clear()
+        seed_school(students=4, chefs=0, dishes=3, ingredients=5)
+        report = run_lunch_rush(concurrency=1)
+
+        self.assertEqual(report['endpoints']['add_to_cart']['requests'], 12)
+        self.assertEqual(report['endpoints']['create_order']['errors'], 0)
+        self.assertEqual(sum(report['outcomes'].values()), 4)
+        self.assertEqual(report['consistency']['violations'], 0)
+        self.assertEqual(report['database']['vendor'], 'sqlite')
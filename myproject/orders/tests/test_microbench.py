@@ -0,0 +1,46 @@
+from django.test import TestCase
+
+from orders.microbench import build_benchmarks, compare, run_benchmarks
+from orders.models import IngredientStock, Order, StockHistory
+
+
+def _result(name, queries, median_ms, case='-'):
+    return {'name': name, 'case': case, 'queries': queries, 'median_ms': median_ms, 'min_ms': median_ms}
+
+
+class MicrobenchTest(TestCase):
+    def test_runs_every_hot_path_without_side_effects(self):
+        benchmarks = build_benchmarks(recipe_sizes=(1, 5), stock_sizes=(2,), cart_sizes=(2,), prepared_sizes=(1,))
+        stock = list(IngredientStock.objects.order_by('id').values_list('quantity_base', flat=True))
+        history = StockHistory.objects.count()
+
+        results = {result['name'] + result['case']: result for result in run_benchmarks(benchmarks, repeat=2)}
+
+        self.assertEqual(len(results), len(benchmarks))
+        # Проверка наличия - один запрос при любом размере рецепта
+        self.assertEqual(results['Dish.check_availabilityрецепт=1 партий=2']['queries'], 1)
+        self.assertEqual(results['Dish.check_availabilityрецепт=5 партий=2']['queries'], 1)
+        self.assertGreater(results['create_orderблюд=2']['queries'], 0)
+        # Изменения путей откатываются после каждого вызова
+        self.assertEqual(list(IngredientStock.objects.order_by('id').values_list('quantity_base', flat=True)), stock)
+        self.assertEqual(StockHistory.objects.count(), history)
+        self.assertFalse(Order.objects.exists())
+
+    def test_only_filters_by_name(self):
+        benchmarks = build_benchmarks(recipe_sizes=(1,), stock_sizes=(1,), cart_sizes=(1,), prepared_sizes=(1,))
+        results = run_benchmarks(benchmarks, repeat=1, only='deduct_balance')
+        self.assertEqual([result['name'] for result in results], ['CustomUser.deduct_balance'])
+
+    def test_compare_with_baseline(self):
+        baseline = {'results': {
+            'a[-]': _result('a', 2, 1.0), 'b[-]': _result('b', 2, 1.0),
+            'c[-]': _result('c', 2, 1.0), 'd[-]': _result('d', 2, 1.0),
+        }}
+        results = [_result('a', 3, 1.0), _result('b', 2, 1.5), _result('c', 2, 1.1), _result('d', 1, 1.0),
+                   _result('e', 1, 1.0)]
+
+        rows = compare(results, baseline, threshold=25)
+
+        self.assertEqual([row['status'] for row in rows], ['more_queries', 'slower', 'ok', 'faster', 'new'])
+        self.assertEqual(rows[1]['change'], 50.0)
+        self.assertEqual([row['status'] for row in compare(results, None)], ['new'] * 5)
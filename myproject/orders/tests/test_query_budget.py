@@ -0,0 +1,98 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from orders.inventory import record_stock_change
+from orders.models import Category, Dish, DishIngredient, Ingredient, Order, OrderItem, PreparedDish, Review
+from users.models import CustomUser
+
+
+# Сколько SQL-запросов может сделать страница на заполненной базе. Число не зависит от количества
+# блюд, заказов и отзывов: новый запрос в цикле шаблона (N+1) сразу выводит страницу за бюджет
+QUERY_BUDGETS = {
+    'manage_dishes': 8,
+    'manage_orders': 10,
+    'order_history': 6,
+    'menu': 10,
+}
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user('admin', 'admin@x.ru', 'pw', role='admin')
+        cls.students = [
+            CustomUser.objects.create_user(f'student{number}', f's{number}@x.ru', 'pw', role='student')
+            for number in range(5)
+        ]
+        categories = [Category.objects.create(name=name) for name in ('Супы', 'Горячее', 'Напитки')]
+        ingredients = []
+        for number in range(8):
+            ingredient = Ingredient.objects.create(name=f'Ингредиент {number}', unit='г')
+            record_stock_change(ingredient, 'restock', Decimal('10000'))
+            ingredients.append(ingredient)
+
+        dishes = []
+        for number in range(12):
+            dish = Dish.objects.create(name=f'Блюдо {number}', description='', price=Decimal('50') + number,
+                                       category=categories[number % 3])
+            for offset in range(3):
+                DishIngredient.objects.create(dish=dish, ingredient=ingredients[(number + offset) % 8],
+                                              quantity=Decimal('100'))
+            PreparedDish.objects.create(dish=dish, quantity=10)
+            dishes.append(dish)
+
+        for number in range(30):
+            student = cls.students[number % 5]
+            order = Order.objects.create(customer=student, status='picked_up', total_price=Decimal('150'))
+            for offset in range(3):
+                dish = dishes[(number + offset) % 12]
+                OrderItem.objects.create(order=order, dish=dish, quantity=1, price_at_time=dish.price)
+            Review.objects.create(user=student, dish=dishes[number % 12], order=order, rating=number % 5 + 1)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertWithinBudget(self, user, name):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(
+            len(queries), QUERY_BUDGETS[name],
+            f'{name}: {len(queries)} запросов при бюджете {QUERY_BUDGETS[name]}\n'
+            + '\n'.join(query['sql'] for query in queries)
+        )
+        return response
+
+    def test_manage_dishes(self):
+        response = self.assertWithinBudget(self.admin, 'manage_dishes')
+        self.assertContains(response, 'Ингредиент 0')
+
+    def test_manage_orders(self):
+        self.assertWithinBudget(self.admin, 'manage_orders')
+
+    def test_order_history(self):
+        response = self.assertWithinBudget(self.students[0], 'order_history')
+        self.assertContains(response, 'Отзыв<br>оставлен')
+
+    def test_menu(self):
+        self.assertWithinBudget(self.students[0], 'menu')
+
+    def test_middleware_counts_queries(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('manage_orders'))
+        self.assertEqual(response.wsgi_request.query_stats.count, len(queries))
+        self.assertGreater(response.wsgi_request.query_stats.duration, 0)
+
+    @override_settings(SLOW_REQUEST_QUERIES=1)
+    def test_slow_request_is_logged(self):
+        self.client.force_login(self.admin)
+        with self.assertLogs('orders.requests', 'WARNING') as logs:
+            self.client.get(reverse('manage_orders'))
+        self.assertIn('Медленный запрос GET /', logs.output[0])
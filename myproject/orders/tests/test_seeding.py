@@ -0,0 +1,74 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.test import TestCase
+
+from orders.inventory import STOCK_MOVEMENT_TYPES, start_of_today
+from orders.models import (Category, DailySalesSummary, Ingredient, IngredientLot, IngredientStock, Order,
+                           OrderItem, Payment, StockDailyRollup, StockHistory, Transaction)
+from orders.seeding import SeedError, seed_canteen
+from users.models import CustomUser
+
+
+SIZE = {'students': 30, 'dishes': 8, 'ingredients': 12, 'days': 21, 'orders_per_day': 25}
+
+
+class SeedCanteenTest(TestCase):
+    def setUp(self):
+        self.counts, _ = seed_canteen('small', seed=3, batch_size=100, **SIZE)
+
+    def test_balances_match_transactions(self):
+        ledger = dict(Transaction.objects.values('user_id').annotate(total=Sum('amount')).values_list('user_id', 'total'))
+        last = {}
+        for user_id, balance_after in Transaction.objects.order_by('created_at', 'id').values_list('user_id',
+                                                                                                   'balance_after'):
+            last[user_id] = balance_after
+        for student in CustomUser.objects.filter(role='student'):
+            self.assertEqual(student.balance, ledger[student.id])
+            self.assertEqual(student.balance, last[student.id])
+            self.assertGreaterEqual(student.balance, 0)
+
+    def test_stock_matches_history_and_lots(self):
+        history = dict(StockHistory.objects.values('ingredient_id').annotate(total=Sum('quantity_change'))
+                       .values_list('ingredient_id', 'total'))
+        lots = dict(IngredientLot.objects.values('ingredient_id').annotate(total=Sum('remaining_base'))
+                    .values_list('ingredient_id', 'total'))
+        for stock in IngredientStock.objects.all():
+            self.assertEqual(stock.current_quantity, history.get(stock.ingredient_id, Decimal('0')))
+            self.assertEqual(stock.quantity_base, lots.get(stock.ingredient_id, 0))
+            self.assertGreaterEqual(stock.current_quantity, 0)
+
+    def test_stock_rollups_cover_past_days(self):
+        past = StockHistory.objects.filter(created_at__lt=start_of_today(), operation_type__in=STOCK_MOVEMENT_TYPES)
+        self.assertEqual(StockDailyRollup.objects.aggregate(total=Sum('entries_count'))['total'], past.count())
+        self.assertEqual(StockDailyRollup.objects.aggregate(total=Sum('quantity_change'))['total'],
+                         past.aggregate(total=Sum('quantity_change'))['total'])
+        # Сегодняшние записи - после отметки сводок
+        watermark = StockDailyRollup.objects.order_by('-last_history_id').values_list('last_history_id', flat=True)[0]
+        self.assertFalse(StockHistory.objects.filter(created_at__gte=start_of_today(), id__lte=watermark).exists())
+
+    def test_orders_match_items_and_payments(self):
+        items = defaultdict(Decimal)
+        for order_id, price, quantity in OrderItem.objects.values_list('order_id', 'price_at_time', 'quantity'):
+            items[order_id] += price * quantity
+        for order_id, total in Order.objects.values_list('id', 'total_price'):
+            self.assertEqual(total, items[order_id])
+
+        paid = Order.objects.exclude(status='cancelled').aggregate(total=Sum('total_price'))['total']
+        self.assertEqual(Payment.objects.filter(status='paid').aggregate(total=Sum('amount'))['total'], paid)
+        self.assertEqual(self.counts['Order'], Order.objects.count())
+        self.assertTrue(DailySalesSummary.objects.exists())
+
+    def test_same_seed_gives_same_data(self):
+        orders = list(Order.objects.order_by('id').values_list('customer__username', 'total_price', 'created_at'))
+        for model in (Order, StockHistory, Category, Ingredient, CustomUser):
+            model.objects.all().delete()
+
+        seed_canteen('small', seed=3, batch_size=100, **SIZE)
+        self.assertEqual(list(Order.objects.order_by('id').values_list('customer__username', 'total_price',
+                                                                       'created_at')), orders)
+
+    def test_refuses_to_seed_filled_database(self):
+        with self.assertRaises(SeedError):
+            seed_canteen('small', **SIZE)
@@ -0,0 +1,48 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from orders.inventory import record_stock_change, set_stock_quantity, stock_at, take_stock_snapshots
+from orders.models import Ingredient, IngredientStock, StockHistory, StockLevelCounter
+from users.models import CustomUser
+
+
+class StockLedgerTest(TestCase):
+    def setUp(self):
+        self.ingredient = Ingredient.objects.create(name='Мука', unit='кг')
+
+    def test_projection_follows_ledger(self):
+        record_stock_change(self.ingredient, 'restock', Decimal('10'))
+        record_stock_change(self.ingredient, 'usage', Decimal('-3'))
+        # запрос на пополнение не меняет запас
+        record_stock_change(self.ingredient, 'request', Decimal('50'))
+        entry = set_stock_quantity(self.ingredient, Decimal('5'))
+
+        self.assertEqual(entry.quantity_change, Decimal('-2'))
+        self.assertEqual(IngredientStock.objects.get(ingredient=self.ingredient).current_quantity, Decimal('5'))
+        self.assertEqual(StockHistory.objects.filter(ingredient=self.ingredient).count(), 4)
+
+    def test_admin_creates_stock_through_ledger(self):
+        admin = CustomUser.objects.create_superuser('root', 'root@x.ru', 'pw', role='admin')
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:orders_ingredientstock_add'), {
+            'ingredient': self.ingredient.id, 'current_quantity': '7', 'min_quantity': '10',
+        })
+
+        stock = IngredientStock.objects.get(ingredient=self.ingredient)
+        self.assertEqual((stock.current_quantity, stock.quantity_base, stock.level), (Decimal('7'), 7000000, 'low'))
+        entry = StockHistory.objects.get(ingredient=self.ingredient)
+        self.assertEqual((entry.operation_type, entry.quantity_change), ('adjustment', Decimal('7')))
+        self.assertEqual(StockLevelCounter.objects.get(level='low').count, 1)
+
+    def test_stock_at_uses_snapshot_and_replay(self):
+        record_stock_change(self.ingredient, 'restock', Decimal('10'))
+        take_stock_snapshots()
+        record_stock_change(self.ingredient, 'usage', Decimal('-4'))
+
+        now = timezone.now()
+        self.assertEqual(stock_at(self.ingredient, now), Decimal('6'))
+        self.assertEqual(stock_at(self.ingredient, now - timedelta(days=1)), Decimal('0'))
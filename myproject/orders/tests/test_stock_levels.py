@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from orders.inventory import (create_stock, record_stock_change, record_stock_changes, recount_stock_levels,
+                              stock_level_counts)
+from orders.models import Ingredient, IngredientStock, StockHistory
+
+
+class StockLevelTest(TestCase):
+    def setUp(self):
+        self.ingredient = Ingredient.objects.create(name='Масло', unit='кг')
+        self.stock = create_stock(self.ingredient, min_quantity=Decimal('10'))
+
+    def requests(self):
+        return StockHistory.objects.filter(ingredient=self.ingredient, operation_type='request')
+
+    def test_counters_follow_stock_updates(self):
+        self.assertEqual(stock_level_counts(), (0, 1))
+        record_stock_change(self.ingredient, 'restock', Decimal('20'))
+        self.assertEqual(stock_level_counts(), (0, 0))
+        record_stock_change(self.ingredient, 'usage', Decimal('-15'))
+        self.assertEqual(stock_level_counts(), (1, 0))
+
+    def test_crossing_minimum_creates_single_request(self):
+        record_stock_change(self.ingredient, 'restock', Decimal('20'))
+        record_stock_change(self.ingredient, 'usage', Decimal('-15'))
+        record_stock_change(self.ingredient, 'usage', Decimal('-5'))
+
+        # мало -> закончился, но открытый запрос уже есть
+        self.assertEqual(self.requests().count(), 1)
+        # истории расхода еще нет - заказываем до двух минимумов (2 * 10 - 5)
+        self.assertEqual(self.requests().get().quantity_change, Decimal('15'))
+
+    def test_batch_forecasts_crossed_stocks_once(self):
+        others = [Ingredient.objects.create(name=f'Крупа {number}', unit='кг') for number in range(3)]
+        record_stock_changes([{'ingredient': ingredient, 'operation_type': 'restock', 'quantity_change': Decimal('20')}
+                              for ingredient in [self.ingredient] + others])
+        IngredientStock.objects.update(min_quantity=Decimal('10'))
+
+        with CaptureQueriesContext(connection) as queries:
+            record_stock_changes([{'ingredient': ingredient, 'operation_type': 'usage', 'quantity_change': Decimal('-15')}
+                                  for ingredient in [self.ingredient] + others])
+
+
+        self.assertEqual(StockHistory.objects.filter(operation_type='request').count(), 4)
+        self.assertEqual(len([query for query in queries if 'GROUP BY' in query['sql']]), 1)
+
+    def test_recount_requests_restock_after_minimum_change(self):
+        record_stock_change(self.ingredient, 'restock', Decimal('20'))
+        IngredientStock.objects.filter(id=self.stock.id).update(min_quantity=Decimal('25'))
+
+        recount_stock_levels()
+        recount_stock_levels()
+
+        self.assertEqual(stock_level_counts(), (1, 0))
+        self.assertEqual(self.requests().count(), 1)
+        self.assertEqual(self.requests().get().notes, 'Автоматический запрос: мало')
@@ -0,0 +1,33 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from orders.inventory import (compact_stock_history, operation_cost_totals, record_stock_change,
+                              roll_up_stock_history, take_stock_snapshots)
+from orders.models import Ingredient, StockDailyRollup, StockHistory
+
+
+class StockRollupTest(TestCase):
+    def setUp(self):
+        self.ingredient = Ingredient.objects.create(name='Сахар', unit='кг')
+        old = record_stock_change(self.ingredient, 'restock', Decimal('5'), total_cost=Decimal('100'))
+        StockHistory.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=10))
+        record_stock_change(self.ingredient, 'restock', Decimal('2'), total_cost=Decimal('40'))
+
+    def test_totals_from_rollups_and_live_rows(self):
+        self.assertEqual(roll_up_stock_history(), 1)
+        # повторный запуск ничего не добавляет
+        self.assertEqual(roll_up_stock_history(), 0)
+        self.assertEqual(StockDailyRollup.objects.get().total_cost, Decimal('100'))
+        self.assertEqual(operation_cost_totals('restock'), (Decimal('140'), Decimal('40')))
+
+    def test_compaction_keeps_totals(self):
+        roll_up_stock_history()
+        take_stock_snapshots()
+
+        # снимок сделан сейчас - старые записи еще не покрыты снимком до границы хранения
+        self.assertEqual(compact_stock_history(retention_days=5), 0)
+        self.assertEqual(compact_stock_history(retention_days=-1), 1)
+        self.assertEqual(operation_cost_totals('restock')[0], Decimal('140'))
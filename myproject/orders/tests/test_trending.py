@@ -0,0 +1,108 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from orders import trending
+from orders.models import Category, Dish, Order, OrderItem
+from orders.trending import SpaceSaving, TrendingDishes, reset_trending, trending_dishes
+from users.models import CustomUser
+
+
+class SpaceSavingTest(TestCase):
+    def test_evicts_rarest_key_and_keeps_heavy_hitters(self):
+        summary = SpaceSaving(capacity=2)
+        for key in 'aaaab':
+            summary.add(key)
+        summary.add('c')
+
+        self.assertEqual(summary.counters, {'a': [4, 0], 'c': [2, 1]})
+
+    def test_window_drops_old_buckets(self):
+        tracker = TrendingDishes(window=60, buckets=6)
+        now = 6000.0
+        with mock.patch('orders.trending.time.time', return_value=now):
+            tracker.add(1, 5, now - 50)
+            tracker.add(2, 3, now)
+            self.assertEqual(tracker.top(5), [(1, 5), (2, 3)])
+
+        with mock.patch('orders.trending.time.time', return_value=now + 10):
+            self.assertEqual(tracker.top(5), [(2, 3)])
+
+
+class TrendingDishesTest(TestCase):
+    def setUp(self):
+        reset_trending()
+        self.student = CustomUser.objects.create_user('student', 's@x.ru', 'pw', role='student')
+        category = Category.objects.create(name='Супы')
+        self.soup = Dish.objects.create(name='Суп', description='', price=Decimal('50'), category=category)
+        self.tea = Dish.objects.create(name='Чай', description='', price=Decimal('10'), category=category)
+
+    def tearDown(self):
+        reset_trending()
+
+    def order(self, dish, quantity, status='pending'):
+        order = Order.objects.create(customer=self.student, total_price=dish.price * quantity, status=status)
+        OrderItem.objects.create(order=order, dish=dish, quantity=quantity, price_at_time=dish.price)
+
+    def test_orders_feed_tracker_and_menu_strip(self):
+        self.order(self.tea, 1)
+        self.order(self.soup, 3)
+
+        self.assertEqual(trending_dishes(), [(self.soup.id, 3), (self.tea.id, 1)])
+        self.client.force_login(self.student)
+        response = self.client.get(reverse('menu'))
+        self.assertEqual(response.context['trending_dishes'], [(self.soup, 3), (self.tea, 1)])
+
+    def test_rebuilds_from_recent_orders_then_restores_from_cache(self):
+        self.order(self.soup, 2)
+        trending.persist(force=True)
+        trending._tracker = None
+        self.assertEqual(trending_dishes(), [(self.soup.id, 2)])
+        self.assertFalse(trending.get_tracker().rebuilt)
+
+        reset_trending()
+        self.assertIsNone(cache.get(trending.TRENDING_CACHE_KEY))
+        self.assertEqual(trending_dishes(), [(self.soup.id, 2)])
+        self.assertTrue(trending.get_tracker().rebuilt)
+
+    def test_cancelled_orders_are_not_counted(self):
+        self.order(self.soup, 2)
+        self.order(self.tea, 5, status='cancelled')
+        self.assertEqual(trending_dishes(), [(self.soup.id, 2)])
+
+    def test_cancellation_is_subtracted_from_window(self):
+        self.order(self.soup, 2)
+        self.order(self.tea, 3)
+        order = Order.objects.get(items__dish=self.tea)
+        trending.persist(force=True)
+
+        order.status = 'cancelled'
+        order.save()
+        self.assertEqual(trending_dishes(), [(self.soup.id, 2)])
+
+        # Другой процесс получает отмену через общее окно
+        trending.persist(force=True)
+        trending._tracker = None
+        self.assertEqual(trending_dishes(), [(self.soup.id, 2)])
+
+    def test_processes_merge_their_portions_on_persist(self):
+        self.order(self.soup, 2)
+        trending.persist(force=True)
+        first = trending.get_tracker()
+
+        # Второй процесс стартует с общего окна и учитывает свой заказ
+        trending._tracker = None
+        self.order(self.tea, 1)
+        trending.persist(force=True)
+
+        # Первый процесс сохраняет позже - заказ второго не затирается
+        trending._tracker = first
+        self.order(self.soup, 1)
+        trending.persist(force=True)
+
+        self.assertEqual(trending_dishes(), [(self.soup.id, 3), (self.tea.id, 1)])
+        trending._tracker = None
+        self.assertEqual(trending_dishes(), [(self.soup.id, 3), (self.tea.id, 1)])
@@ -0,0 +1,48 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from orders.hyperloglog import HyperLogLog
+from orders.models import DailyCustomerSketch, Order
+from orders.sales import roll_up_daily_sales, unique_customers
+from users.models import CustomUser
+
+
+class HyperLogLogTest(SimpleTestCase):
+    def test_estimate_and_merge(self):
+        first = HyperLogLog().update(range(0, 30000))
+        second = HyperLogLog().update(range(20000, 50000))
+        merged = HyperLogLog(first.to_bytes()).merge(second)
+
+        self.assertAlmostEqual(first.count(), 30000, delta=30000 * 0.05)
+        self.assertAlmostEqual(merged.count(), 50000, delta=50000 * 0.05)
+        self.assertEqual(HyperLogLog().update([1, 2, 3, 2, 1]).count(), 3)
+
+
+class UniqueCustomersTest(TestCase):
+    def setUp(self):
+        self.students = [
+            CustomUser.objects.create_user(f'student{i}', f's{i}@x.ru', 'pw', role='student') for i in range(4)
+        ]
+        now = timezone.now()
+        # 3 дня назад - ученики 0 и 1, вчера - 1 и 2, сегодня - 2 и 3, отмененный заказ не считается
+        for days_ago, indexes in ((3, (0, 1)), (1, (1, 2)), (0, (2, 3))):
+            for index in indexes:
+                self.order(self.students[index], now - timedelta(days=days_ago))
+        self.order(self.students[0], now, status='cancelled')
+        self.today = timezone.localdate()
+
+    def order(self, customer, moment, status='pending'):
+        order = Order.objects.create(customer=customer, total_price=Decimal('10'), status=status)
+        Order.objects.filter(id=order.id).update(created_at=moment)
+
+    def test_counts_match_before_and_after_rollup(self):
+        starts = [self.today, self.today - timedelta(days=1), self.today - timedelta(days=6)]
+        live = unique_customers(starts)
+        roll_up_daily_sales()
+
+        self.assertEqual(DailyCustomerSketch.objects.count(), 2)
+        self.assertEqual(unique_customers(starts), live)
+        self.assertEqual(live, {starts[0]: 2, starts[1]: 3, starts[2]: 4})
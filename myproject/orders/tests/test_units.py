@@ -0,0 +1,37 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from orders.inventory import record_stock_change
+from orders.models import Category, Dish, DishIngredient, Ingredient, IngredientStock
+from orders.units import convert, from_base, to_base
+
+
+class UnitConversionTest(TestCase):
+    def test_round_trip(self):
+        self.assertEqual(to_base(Decimal('1.25'), 'кг'), 1250000)
+        self.assertEqual(to_base(Decimal('0.01'), 'мл'), 10)
+        self.assertEqual(from_base(1250000, 'кг'), Decimal('1.25'))
+        self.assertEqual(convert(Decimal('1.5'), 'л', 'мл'), Decimal('1500.00'))
+        with self.assertRaises(ValueError):
+            convert(1, 'кг', 'л')
+
+    def test_availability_in_base_units(self):
+        flour = Ingredient.objects.create(name='Мука', unit='г')
+        dish = Dish.objects.create(name='Блины', description='', price=Decimal('50'),
+                                   category=Category.objects.create(name='Выпечка'))
+        recipe_item = DishIngredient.objects.create(dish=dish, ingredient=flour, quantity=Decimal('120.5'))
+        self.assertEqual(recipe_item.quantity_base, 120500)
+
+        record_stock_change(flour, 'restock', Decimal('500'))
+        self.assertEqual(dish.max_preparable(), 4)
+        is_available, missing = dish.check_availability(5)
+        self.assertFalse(is_available)
+        self.assertEqual(missing[0]['missing'], Decimal('102.50'))
+
+        # смена единицы пересчитывает целые количества
+        flour.unit = 'кг'
+        flour.save()
+        recipe_item.refresh_from_db()
+        self.assertEqual(recipe_item.quantity_base, 120500000)
+        self.assertEqual(IngredientStock.objects.get(ingredient=flour).quantity_base, 500000000)
@@ -0,0 +1,227 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import OrderItem
+
+
+# Скользящее окно "популярно сейчас": час, разбитый на 12 интервалов по 5 минут
+WINDOW_SECONDS = 60 * 60
+BUCKET_COUNT = 12
+# Сколько блюд отслеживает каждый интервал (Space-Saving: при переполнении вытесняется самое редкое)
+CAPACITY = 64
+# Как часто состояние сохраняется в кэш, чтобы другой процесс или перезапуск не начинал с нуля
+PERSIST_SECONDS = 60
+TRENDING_CACHE_KEY = 'orders:trending_dishes'
+# Блокировка слияния: пока один процесс сливает свои порции с общим окном, остальные откладывают сохранение
+TRENDING_LOCK_KEY = 'orders:trending_dishes:lock'
+LOCK_SECONDS = 10
+
+
+class SpaceSaving:
+    # Приближенные частоты ограниченного числа ключей: {ключ: [счетчик, возможная переоценка]}
+    def __init__(self, capacity=CAPACITY, counters=None):
+        self.capacity = capacity
+        self.counters = counters or {}
+
+    def add(self, key, amount=1):
+        # Отрицательное amount вычитает (отмена заказа); вытесненный ключ вычитать уже не из чего
+        if key in self.counters:
+            self.counters[key][0] += amount
+            if self.counters[key][0] <= 0:
+                del self.counters[key]
+        elif amount <= 0:
+            return
+        elif len(self.counters) < self.capacity:
+            self.counters[key] = [amount, 0]
+        else:
+            # Новый ключ занимает место самого редкого и наследует его счетчик как погрешность
+            victim = min(self.counters, key=lambda k: self.counters[k][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[key] = [floor + amount, floor]
+
+
+class TrendingDishes:
+    # Топ блюд за последние WINDOW_SECONDS. Чтение топа - готовый список, пересчет только при изменениях
+    def __init__(self, window=WINDOW_SECONDS, buckets=BUCKET_COUNT, capacity=CAPACITY):
+        self.bucket_seconds = window // buckets
+        self.bucket_count = buckets
+        self.capacity = capacity
+        self.buckets = {}
+        # Порции, учтенные этим процессом после прошлого сохранения (их получит общее окно):
+        # {интервал: {dish_id: изменение}}, отмены - с минусом
+        self.pending = {}
+        self.persisted_at = 0
+        # True, если окно восстановлено по заказам из БД
+        self.rebuilt = False
+        self._top = []
+        self._lock = threading.Lock()
+
+    def _index(self, timestamp):
+        return int(timestamp // self.bucket_seconds)
+
+    def _expire(self, current):
+        # Убирает интервалы, выпавшие из окна; возвращает True, если что-то убрано
+        expired = [index for index in self.buckets if index <= current - self.bucket_count]
+        for index in expired:
+            del self.buckets[index]
+        return bool(expired)
+
+    def _recount(self):
+        totals = {}
+        for summary in self.buckets.values():
+            for dish_id, (count, _) in summary.counters.items():
+                totals[dish_id] = totals.get(dish_id, 0) + count
+        self._top = sorted(totals.items(), key=lambda item: -item[1])
+
+    def add(self, dish_id, quantity=1, timestamp=None):
+        # Учитывает порции блюда в интервале момента заказа (отрицательное quantity - отмена)
+        now = time.time()
+        index = self._index(timestamp if timestamp is not None else now)
+        with self._lock:
+            self._expire(self._index(now))
+            if index <= self._index(now) - self.bucket_count:
+                return
+            if index not in self.buckets and quantity > 0:
+                self.buckets[index] = SpaceSaving(self.capacity)
+            if index in self.buckets:
+                self.buckets[index].add(dish_id, quantity)
+            changes = self.pending.setdefault(index, {})
+            changes[dish_id] = changes.get(dish_id, 0) + quantity
+            self._recount()
+
+    def covers(self, timestamp):
+        # Попадает ли момент в текущее окно
+        return self._index(timestamp) > self._index(time.time()) - self.bucket_count
+
+    def top(self, limit):
+        # [(dish_id, порций), ...] по убыванию
+        with self._lock:
+            if self._expire(self._index(time.time())):
+                self._recount()
+            return self._top[:limit]
+
+    def state(self):
+        with self._lock:
+            return {index: summary.counters for index, summary in self.buckets.items()}
+
+    def take_pending(self):
+        # Порции после прошлого сохранения (интервалы еще в окне); копилка очищается
+        with self._lock:
+            pending, self.pending = self.pending, {}
+            oldest = self._index(time.time()) - self.bucket_count
+            return {index: changes for index, changes in pending.items() if index > oldest}
+
+    def load(self, state):
+        with self._lock:
+            self.buckets = {index: SpaceSaving(self.capacity, counters) for index, counters in state.items()}
+            self._expire(self._index(time.time()))
+            self._recount()
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def _merged(state, pending, capacity=CAPACITY):
+    # Общее окно из кэша плюс изменения процесса: счетчики складываются по интервалам
+    merged = {index: SpaceSaving(capacity, {key: list(value) for key, value in counters.items()})
+              for index, counters in state.items()}
+    for index, changes in pending.items():
+        summary = merged.setdefault(index, SpaceSaving(capacity))
+        for dish_id, amount in changes.items():
+            summary.add(dish_id, amount)
+    return {index: summary.counters for index, summary in merged.items()}
+
+
+def _rebuild(tracker):
+    # Восстановление окна по заказам последнего часа (первое обращение в процессе без сохраненного состояния)
+    since = timezone.now() - timedelta(seconds=WINDOW_SECONDS)
+    items = (OrderItem.objects.filter(order__created_at__gte=since)
+             .exclude(order__status='cancelled')
+             .order_by('order__created_at')
+             .values_list('dish_id', 'quantity', 'order__created_at'))
+    for dish_id, quantity, created_at in items:
+        tracker.add(dish_id, quantity, created_at.timestamp())
+
+
+def get_tracker():
+    # Трекер процесса: состояние из кэша, а если его нет - из недавних заказов
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                tracker = TrendingDishes()
+                state = cache.get(TRENDING_CACHE_KEY)
+                if state is not None:
+                    tracker.load(state)
+                else:
+                    _rebuild(tracker)
+                    # Восстановленные порции не новые: при слиянии с окном другого процесса они бы задвоились
+                    tracker.take_pending()
+                    tracker.rebuilt = True
+                tracker.persisted_at = time.time()
+                _tracker = tracker
+    return _tracker
+
+
+def persist(force=False):
+    # Не чаще раза в PERSIST_SECONDS добавляет новые порции процесса в общее окно в кэше и
+    # забирает окно себе - так процессы видят заказы друг друга, а не затирают их своим окном.
+    # Если окно сейчас сливает другой процесс, порции ждут следующего сохранения
+    tracker = get_tracker()
+    now = time.time()
+    if not force and now - tracker.persisted_at < PERSIST_SECONDS:
+        return
+    tracker.persisted_at = now
+    if not cache.add(TRENDING_LOCK_KEY, True, LOCK_SECONDS):
+        return
+    try:
+        pending = tracker.take_pending()
+        state = cache.get(TRENDING_CACHE_KEY)
+        # Общего окна нет (истекло или сброшено) - им становится окно процесса целиком
+        state = tracker.state() if state is None else _merged(state, pending, tracker.capacity)
+        cache.set(TRENDING_CACHE_KEY, state, WINDOW_SECONDS)
+        tracker.load(state)
+    finally:
+        cache.delete(TRENDING_LOCK_KEY)
+
+
+def count_order_item(item):
+    # Новый элемент заказа попадает в окно популярности (отмененные заказы не учитываются, как и в _rebuild).
+    # Если трекер только что восстановлен по БД, этот элемент в нем уже учтен
+    if item.order.status == 'cancelled':
+        return
+    fresh = _tracker is None
+    tracker = get_tracker()
+    if not (fresh and tracker.rebuilt):
+        tracker.add(item.dish_id, item.quantity, item.order.created_at.timestamp())
+    persist()
+
+
+def uncount_order(order):
+    # Отмененный заказ из окна вычитается.
+    # Если трекер только что восстановлен по БД, отмененный заказ в него и не попал
+    created_at = order.created_at.timestamp()
+    fresh = _tracker is None
+    tracker = get_tracker()
+    if (fresh and tracker.rebuilt) or not tracker.covers(created_at):
+        return
+    for dish_id, quantity in order.items.values_list('dish_id', 'quantity'):
+        tracker.add(dish_id, -quantity, created_at)
+    persist()
+
+
+def trending_dishes(limit=5):
+    # [(dish_id, порций за последний час), ...]
+    return get_tracker().top(limit)
+
+
+def reset_trending():
+    # Сбрасывает трекер процесса и сохраненное состояние (тесты, пересчет)
+    global _tracker
+    _tracker = None
+    cache.delete_many([TRENDING_CACHE_KEY, TRENDING_LOCK_KEY])
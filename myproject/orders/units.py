@@ -0,0 +1,54 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+
+# Количества хранятся в целых базовых единицах: миллиграммы, микролитры и тысячные доли штуки.
+# Так 0.01 в любой единице ингредиента - целое число, и проверки запасов обходятся без Decimal.
+# Единица -> (величина, сколько базовых единиц в одной единице)
+UNITS = {
+    'мг': ('mass', 1),
+    'г': ('mass', 1000),
+    'гр': ('mass', 1000),
+    'кг': ('mass', 1000000),
+    'мкл': ('volume', 1),
+    'мл': ('volume', 1000),
+    'л': ('volume', 1000000),
+    'шт': ('piece', 1000),
+}
+
+# Неизвестные единицы считаем штучными: своя величина, тысячные доли
+DEFAULT_SCALE = 1000
+
+QUANTITY_STEP = Decimal('0.01')
+
+
+def normalize_unit(unit):
+    # 'Кг.' -> 'кг'
+    return (unit or '').strip().rstrip('.').lower()
+
+
+def unit_info(unit):
+    # (величина, множитель) для единицы измерения
+    unit = normalize_unit(unit)
+    return UNITS.get(unit, (unit, DEFAULT_SCALE))
+
+
+def unit_scale(unit):
+    return unit_info(unit)[1]
+
+
+def to_base(quantity, unit):
+    # Количество в единицах ингредиента -> целое число базовых единиц
+    value = Decimal(quantity) * unit_scale(unit)
+    return int(value.to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_base(amount, unit):
+    # Целое число базовых единиц -> Decimal в единицах ингредиента
+    return (Decimal(amount) / unit_scale(unit)).quantize(QUANTITY_STEP)
+
+
+def convert(quantity, from_unit, to_unit):
+    # Перевод между единицами одной величины (г -> кг, л -> мл)
+    if unit_info(from_unit)[0] != unit_info(to_unit)[0]:
+        raise ValueError(f"Нельзя перевести {from_unit} в {to_unit}")
+    return from_base(to_base(quantity, from_unit), to_unit)
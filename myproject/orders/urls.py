@@ -65,6 +65,8 @@ urlpatterns = [
     path('manage/orders/', views.manage_orders, name='manage_orders'),
     # Управление блюдами
     path('manage/dishes/', views.manage_dishes, name='manage_dishes'),
+    # Прибыльность блюд
+    path('manage/dishes/profitability/', views.profitability, name='profitability'),
     # Добавление нового блюда
     path('manage/dishes/add/', views.add_dish, name='add_dish'),
     # Редактирование блюда
@@ -84,6 +86,12 @@ urlpatterns = [
     path('order/<int:order_id>/pay/', views.mark_as_paid, name='mark_paid'),
     # Статистика (админ)
     path('statistics/', views.statistics, name='statistics'),
+    # Временные ряды для статистики (JSON)
+    path('statistics/api/', views.statistics_api, name='statistics_api'),
+    # Спрос по дням недели и часам (JSON)
+    path('statistics/api/demand/', views.demand_api, name='demand_api'),
+    # Выгрузка данных (CSV / JSONL)
+    path('statistics/export/<str:dataset>/', views.export_data, name='export_data'),
     
     #  Повар 
     # Заказы для повара
@@ -93,6 +101,9 @@ urlpatterns = [
     # Выполнение запроса на пополнение
     path('manage/inventory/request/<int:request_id>/fulfill/', 
      views.fulfill_restock_request, name='fulfill_restock_request'),
+    # Выполнение нескольких запросов сразу
+    path('manage/inventory/requests/fulfill/',
+     views.bulk_fulfill_restock_requests, name='bulk_fulfill_restock_requests'),
     # Обновление стоимости ингредиента
     path('manage/ingredient/<int:ingredient_id>/update-cost/', 
      views.update_ingredient_cost, name='update_ingredient_cost'),
@@ -1,17 +1,30 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.generic import ListView
 from django.core.exceptions import PermissionDenied
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Count, Prefetch, Q
 from decimal import Decimal, InvalidOperation
-from django.db import models
+from datetime import date, timedelta
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 
 from .models import Dish, Order, OrderItem, IngredientCost, Category, OrderPickup, Payment, Transaction, Review, Ingredient, DishIngredient, ComboSet, ComboItem, ComboOrder, IngredientStock, StockHistory, PreparedDish
 from users.models import CustomUser
+from users.listing import filter_users, parse_list_params, search_users
 from .utils import user_can_use_cart
+from .inventory import (record_stock_change, set_stock_quantity, operation_cost_totals,
+                        create_stock, stock_level_counts, fulfill_restock_requests, next_expiry_dates)
+from .forecasting import forecast_ingredients
+from .costing import attach_dish_margins, profitability_report
+from .sales import sales_dashboard, unique_customers
+from .analytics import parse_series_params, time_series
+from .exports import EXPORTS, FORMATS as EXPORT_FORMATS, stream_export
+from .demand import WEEKDAY_NAMES, demand_arrays, heatmap
+from .trending import trending_dishes
+from .cart import load_cart, save_cart
+from .catalog import attach_recipes, catalog_categories, catalog_ingredients
 
 
 #  ОСНОВНЫЕ СТРАНИЦЫ 
@@ -21,11 +34,15 @@ def home(request):
     context = {}
     
     if request.user.is_authenticated and request.user.is_student():
-        context['available_ingredients'] = Ingredient.objects.all().order_by('name')
+        context['available_ingredients'] = catalog_ingredients()
     
     return render(request, 'orders/home.html', context)
 
 
+# Сколько блюд показывать в полосе "Популярно сейчас"
+TRENDING_LIMIT = 5
+
+
 class MenuView(ListView):
     # Класс для отображения списка блюд
     model = Dish
@@ -34,7 +51,7 @@ class MenuView(ListView):
 
     def get_queryset(self):
         # Получаем список блюд
-        qs = Dish.objects.all().select_related('category').prefetch_related('ingredients__ingredient')
+        qs = Dish.objects.all().select_related('category')
         category_id = self.request.GET.get('category')
         if category_id:
             qs = qs.filter(category_id=category_id)
@@ -54,11 +71,9 @@ class MenuView(ListView):
     def get_context_data(self, **kwargs):
         # Добавляем дополнительные данные в шаблон
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context['categories'] = catalog_categories()
         
-        prepared_dishes = {}
-        for prepared in PreparedDish.objects.all():
-            prepared_dishes[prepared.dish.id] = prepared.quantity
+        prepared_dishes = dict(PreparedDish.objects.values_list('dish_id', 'quantity'))
         
         dishes_with_info = []
         for dish in context['dishes']:
@@ -69,7 +84,19 @@ class MenuView(ListView):
             
             dishes_with_info.append(dish)
         
-        context['dishes'] = dishes_with_info
+        # Состав блюд - из кэша каталога
+        context['dishes'] = attach_recipes(dishes_with_info)
+
+        # Популярно сейчас: топ из окна последнего часа, без подсчета по таблице заказов
+        trending = trending_dishes(TRENDING_LIMIT)
+        if trending:
+            trending_qs = Dish.objects.filter(id__in=[dish_id for dish_id, _ in trending])
+            if self.request.user.is_authenticated and self.request.user.is_student():
+                trending_qs = trending_qs.exclude(ingredients__ingredient__in=self.request.user.allergens.all())
+            found = trending_qs.in_bulk()
+            context['trending_dishes'] = [
+                (found[dish_id], portions) for dish_id, portions in trending if dish_id in found
+            ]
 
         if self.request.user.is_authenticated and self.request.user.is_student():
             user_allergens = self.request.user.allergens.all()
@@ -80,7 +107,7 @@ class MenuView(ListView):
                 context['user_allergens'] = user_allergens
 
         if hasattr(self.request.user, 'is_student') and self.request.user.is_student():
-            cart = self.request.session.get('cart', {})
+            cart = load_cart(self.request)
             context['cart_count'] = len(cart)
             context['show_cart'] = True
         else:
@@ -137,7 +164,7 @@ def remove_allergen(request, allergen_id):
 def add_to_cart(request, dish_id):
     # Добавление блюда в корзину
     dish = get_object_or_404(Dish, id=dish_id)
-    cart = request.session.get('cart', {})
+    cart = load_cart(request)
     dish_id_str = str(dish_id)
     
     prepared_dish = PreparedDish.objects.filter(dish=dish).first()
@@ -150,14 +177,14 @@ def add_to_cart(request, dish_id):
     else:
         cart[dish_id_str] = 1
     
-    request.session['cart'] = cart
+    save_cart(request, cart)
     messages.success(request, f'"{dish.name}" добавлено в корзину')
     return redirect('menu')
 
 @login_required
 @user_can_use_cart
 def view_cart(request):
-    cart = request.session.get('cart', {})
+    cart = load_cart(request)
     cart_items = []
     total = 0
     
@@ -190,7 +217,7 @@ def view_cart(request):
 @user_can_use_cart
 def update_cart(request, dish_id):
     # Меняет количество блюда в корзине с проверкой доступности из готовых
-    cart = request.session.get('cart', {})
+    cart = load_cart(request)
     dish_id_str = str(dish_id)
     
     if request.method == 'POST':
@@ -226,19 +253,19 @@ def update_cart(request, dish_id):
         else:
             cart.pop(dish_id_str, None)
     
-    request.session['cart'] = cart
+    save_cart(request, cart)
     return redirect('view_cart')
 
 @login_required
 @user_can_use_cart
 def remove_from_cart(request, dish_id):
     # Удаляет блюдо из корзины
-    cart = request.session.get('cart', {})
+    cart = load_cart(request)
     dish_id_str = str(dish_id)
     
     if dish_id_str in cart:
         del cart[dish_id_str]
-        request.session['cart'] = cart
+        save_cart(request, cart)
         messages.success(request, 'Блюдо удалено из корзины')
     
     return redirect('view_cart')
@@ -251,7 +278,7 @@ def create_order(request):
         messages.error(request, 'Только ученики могут оформлять заказы')
         return redirect('menu')
 
-    cart = request.session.get('cart', {})
+    cart = load_cart(request)
 
     if not cart:
         messages.warning(request, 'Ваша корзина пуста')
@@ -274,24 +301,7 @@ def create_order(request):
                 prepared_available = sum(pd.quantity for pd in prepared_dishes)
                 
                 # 2. Проверяем возможность приготовить из ингредиентов
-                can_prepare_max = 0
-                if dish.check_availability(1)[0]:  # Если можно приготовить хотя бы 1
-                    # Находим максимальное количество, которое можно приготовить
-                    can_prepare_max = dish.check_availability(100)[1]  # Проверяем на большое число
-                    if isinstance(can_prepare_max, list):
-                        # Если check_availability возвращает список недостающих ингредиентов
-                        # Нужно рассчитать максимальное количество на основе ингредиентов
-                        max_from_ingredients = float('inf')
-                        for ingredient in dish.ingredients.all():
-                            try:
-                                stock = ingredient.ingredient.stock
-                                if ingredient.quantity > 0:
-                                    available_qty = int(stock.current_quantity // ingredient.quantity)
-                                    max_from_ingredients = min(max_from_ingredients, available_qty)
-                            except IngredientStock.DoesNotExist:
-                                max_from_ingredients = 0
-                                break
-                        can_prepare_max = max_from_ingredients if max_from_ingredients != float('inf') else 0
+                can_prepare_max = dish.max_preparable()
                 
                 # Суммируем доступное количество
                 max_available = prepared_available + can_prepare_max
@@ -404,7 +414,7 @@ def create_order(request):
             )
 
         # Очищаем корзину
-        request.session['cart'] = {}
+        save_cart(request, {})
         
         messages.success(request, f'Заказ #{order.id} оформлен!')
         return redirect('my_orders')
@@ -438,7 +448,12 @@ def order_history(request):
             messages.error(request, 'История заказов доступна только ученикам')
             return redirect('home')
 
-        orders = Order.objects.filter(customer=request.user, status__in=['picked_up', 'delivered']).select_related('customer').prefetch_related('items__dish').order_by('-created_at')
+        # Шаблон ищет отзыв ученика среди отзывов блюда - загружаем только его отзывы, одним запросом
+        own_reviews = Review.objects.filter(user=request.user).select_related('user', 'order')
+        orders = (Order.objects.filter(customer=request.user, status__in=['picked_up', 'delivered'])
+                  .select_related('customer')
+                  .prefetch_related('items__dish', Prefetch('items__dish__reviews', queryset=own_reviews))
+                  .order_by('-created_at'))
 
         return render(request, 'orders/order_history.html', {'orders': orders, 'user': request.user})
 
@@ -716,7 +731,7 @@ def create_combo_set(request):
             messages.error(request, f'Ошибка создания набора: {str(e)}')
             return redirect('view_cart')
 
-    cart = request.session.get('cart', {})
+    cart = load_cart(request)
     cart_items = []
     single_price = 0
 
@@ -757,7 +772,7 @@ def my_combo_sets(request):
     for combo_set in combo_sets:
         combo_set.can_order_now = check_combo_availability(combo_set)
 
-    return render(request, 'orders/my_combo_sets.html', {'combo_sets': combo_sets})
+    return render(request, 'orders/my_combo_sets.html', {'combo_sets': combo_sets, 'cart_count': len(load_cart(request))})
 
 
 def check_combo_availability(combo_set):
@@ -1072,22 +1087,19 @@ def chef_inventory(request):
     
     ingredients_without_stock = Ingredient.objects.filter(stock__isnull=True)
     for ingredient in ingredients_without_stock:
-        IngredientStock.objects.create(
-            ingredient=ingredient,
-            current_quantity=0,
-            min_quantity=10,
-            unit=ingredient.unit
-        )
+        create_stock(ingredient, min_quantity=10)
         messages.info(request, f'Создан запас для ингредиента: {ingredient.name}')
     
     stocks = IngredientStock.objects.all().select_related('ingredient').order_by('ingredient__name')
     
+    # Прогноз расхода и рекомендуемое количество для всех ингредиентов сразу
+    forecasts = forecast_ingredients(stocks)
+    for stock in stocks:
+        stock.forecast = forecasts.get(stock.ingredient_id)
+    
     total_stocks = stocks.count()
-    low_stock_count = stocks.filter(
-        models.Q(current_quantity__lte=models.F('min_quantity')) &
-        models.Q(current_quantity__gt=0)
-    ).count()
-    out_of_stock_count = stocks.filter(current_quantity__lte=0).count()
+    # Счетчики обновляются вместе с запасами - отдельные COUNT не нужны
+    low_stock_count, out_of_stock_count = stock_level_counts()
     
     context = {
         'stocks': stocks,
@@ -1112,20 +1124,21 @@ def request_restock(request, ingredient_id):
         notes = request.POST.get('notes', '')
         
         try:
-            quantity = Decimal(quantity)
+            if quantity:
+                quantity = Decimal(quantity)
+            else:
+                # Количество не указано - берем рекомендованное по прогнозу расхода
+                stock = ingredient.stock
+                quantity = forecast_ingredients([stock])[ingredient.id]['suggested_quantity']
             if quantity <= 0:
                 messages.error(request, 'Количество должно быть положительным')
                 return redirect('chef_inventory')
             
-            stock = ingredient.stock
-            
-            StockHistory.objects.create(
-                ingredient=ingredient,
-                operation_type='request',
-                quantity_change=quantity,
-                quantity_before=stock.current_quantity,
-                quantity_after=stock.current_quantity,
-                performed_by=request.user,
+            record_stock_change(
+                ingredient,
+                'request',
+                quantity,
+                user=request.user,
                 notes=f"Запрос на пополнение: {notes}"
             )
             
@@ -1147,8 +1160,7 @@ def chef_prepare_dishes(request):
     dishes_to_prepare = Dish.objects.all()
     prepared_dishes = PreparedDish.objects.all().select_related('dish')
     
-    low_stock_count = IngredientStock.objects.filter(current_quantity__lte=models.F('min_quantity')).count()
-    out_of_stock_count = IngredientStock.objects.filter(current_quantity__lte=0).count()
+    low_stock_count, out_of_stock_count = stock_level_counts()
     
     if request.method == 'POST':
         dish_id = request.POST.get('dish_id')
@@ -1163,9 +1175,7 @@ def chef_prepare_dishes(request):
                     messages.error(request, 'Количество должно быть положительным')
                     return redirect('chef_prepare_dishes')
                 
-                missing = dish.check_availability(quantity)
-                
-                success, _ = dish.reserve_ingredients(quantity, request.user)
+                success, missing = dish.reserve_ingredients(quantity, request.user)
                 if success:
                     prepared_dish, created = PreparedDish.objects.get_or_create(
                         dish=dish,
@@ -1178,9 +1188,8 @@ def chef_prepare_dishes(request):
                         
                     messages.success(request, f'Приготовлено {quantity} порций {dish.name}')
                 else:
-                    messages.error(request, f'Ошибка при резервировании ингредиентов')
-                missing_list = ", ".join([f"{m['ingredient'].name} (не хватает {m['missing']} {m['ingredient'].unit})" for m in missing])
-                messages.error(request, f'Не хватает ингредиентов для {dish.name}: {missing_list}')
+                    missing_list = ", ".join([f"{m['ingredient'].name} (не хватает {m['missing']} {m['ingredient'].unit})" for m in missing])
+                    messages.error(request, f'Не хватает ингредиентов для {dish.name}: {missing_list}')
                     
             except (ValueError, Dish.DoesNotExist):
                 messages.error(request, 'Ошибка в данных')
@@ -1203,12 +1212,31 @@ def manage_dishes(request):
         messages.error(request, 'Доступно только для администраторов и поваров')
         return redirect('menu')
     
-    dishes = Dish.objects.all().select_related('category')
-    categories = Category.objects.all()
+    dishes = attach_dish_margins(
+        Dish.objects.all().select_related('category').prefetch_related(
+            'ingredients__ingredient', Prefetch('reviews', queryset=Review.objects.select_related('user')))
+    )
+    categories = catalog_categories()
     
     return render(request, 'orders/manage_dishes.html', {'dishes': dishes, 'categories': categories})
 
 
+@login_required
+def profitability(request):
+    # Прибыльность блюд: себестоимость, маржа и вклад в прибыль по продажам
+    if not request.user.is_admin():
+        messages.error(request, 'Доступно только для администраторов')
+        return redirect('menu')
+    
+    report = profitability_report()
+    context = {
+        'report': report,
+        'total_revenue': sum(dish.revenue for dish in report),
+        'total_margin': sum(dish.total_margin for dish in report),
+    }
+    return render(request, 'orders/profitability.html', context)
+
+
 @login_required
 def add_dish(request):
     # Добавление нового блюда
@@ -1246,8 +1274,8 @@ def add_dish(request):
         except Exception as e:
             messages.error(request, f'Ошибка: {str(e)}')
 
-    categories = Category.objects.all()
-    ingredients = Ingredient.objects.all()
+    categories = catalog_categories()
+    ingredients = catalog_ingredients()
     return render(request, 'orders/add_dish.html', {'categories': categories, 'ingredients': ingredients})
 
 
@@ -1281,8 +1309,8 @@ def edit_dish(request, dish_id):
         messages.success(request, f'Блюдо "{dish.name}" и ингредиенты обновлены!')
         return redirect('manage_dishes')
 
-    categories = Category.objects.all()
-    ingredients = Ingredient.objects.all()
+    categories = catalog_categories()
+    ingredients = catalog_ingredients()
     existing_ingredients = dish.ingredients.all()
     return render(request, 'orders/edit_dish.html', {
         'dish': dish,
@@ -1327,11 +1355,7 @@ def add_ingredient(request):
                 defaults={'name': name, 'unit': unit}
             )
             if created:
-                IngredientStock.objects.create(
-                    ingredient=obj,
-                    current_quantity=0,
-                    unit=unit
-                )
+                create_stock(obj)
                 messages.success(request, f'Ингредиент «{obj.name}» добавлен.')
             else:
                 messages.warning(request, 'Такой ингредиент уже есть.')
@@ -1350,8 +1374,15 @@ def manage_users(request):
     if not request.user.is_admin():
         raise PermissionDenied("Только для администраторов")
 
-    users = CustomUser.objects.all()
-    return render(request, 'orders/manage_users.html', {'users': users})
+    params = parse_list_params(request.GET)
+    users, next_after = search_users(**params)
+    return render(request, 'orders/manage_users.html', {
+        'users': users,
+        'next_after': next_after,
+        'total': filter_users(params['query'], params['role']).count(),
+        'roles': CustomUser.ROLE_CHOICES,
+        **params,
+    })
 
 
 @login_required
@@ -1434,55 +1465,62 @@ def statistics(request):
         messages.error(request, 'Только для администраторов')
         return redirect('menu')
     
-    today = timezone.now().date()
+    today = timezone.localdate()
     
     try:
-        total_users = CustomUser.objects.count()
-        total_students = CustomUser.objects.filter(role='student').count()
-        total_chefs = CustomUser.objects.filter(role='chef').count()
-        total_admins = CustomUser.objects.filter(role='admin').count()
+        # Пользователи по ролям - одним запросом
+        user_counts = CustomUser.objects.aggregate(
+            total=Count('id'),
+            students=Count('id', filter=Q(role='student')),
+            chefs=Count('id', filter=Q(role='chef')),
+            admins=Count('id', filter=Q(role='admin')),
+        )
 
         recent_users = CustomUser.objects.all().order_by('-date_joined')[:10]
-
-        total_payments = Payment.objects.filter(status='paid')
-        total_income = total_payments.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-        
-        today_payments = Payment.objects.filter(status='paid', created_at__date=today)
-        today_income = today_payments.aggregate(Sum('amount'))['amount__sum'] or Decimal('0')
-        
-        restock_history = StockHistory.objects.filter(operation_type='restock')
-        total_ingredient_cost = restock_history.aggregate(Sum('total_cost'))['total_cost__sum'] or Decimal('0')
+        today_logged_users = CustomUser.objects.filter(last_login__date=today).order_by('-last_login')
         
-        today_restock_history = StockHistory.objects.filter(operation_type='restock', created_at__date=today)
-        today_ingredient_cost = today_restock_history.aggregate(Sum('total_cost'))['total_cost__sum'] or Decimal('0')
+        # Уникальные покупатели: сегодня точно, за неделю и месяц - по дневным скетчам
+        week_start, month_start = today - timedelta(days=6), today - timedelta(days=29)
+        buyers = unique_customers([today, week_start, month_start], today)
         
-        today_logged_users = CustomUser.objects.filter(last_login__date=today).order_by('-last_login')
+        # Доходы и затраты: сводки по прошлым дням + живые данные за сегодня
+        sales = sales_dashboard()
         
-        low_stock_count = IngredientStock.objects.filter(current_quantity__lte=models.F('min_quantity')).count()
-        out_of_stock_count = IngredientStock.objects.filter(current_quantity__lte=0).count()
+        low_stock_count, out_of_stock_count = stock_level_counts()
         
-        profit = total_income - total_ingredient_cost
+        # Прибыль: доход минус себестоимость израсходованного и списания
+        profit = sales['total_income'] - sales['total_cogs'] - sales['total_waste_cost']
         
         context = {
-            'total_users': total_users,
-            'total_students': total_students,
-            'total_chefs': total_chefs,
-            'total_admins': total_admins,
+            'total_users': user_counts['total'],
+            'total_students': user_counts['students'],
+            'total_chefs': user_counts['chefs'],
+            'total_admins': user_counts['admins'],
             'recent_users': recent_users,
-            'today_logged_users': today_logged_users,
+            'today_logged_users': today_logged_users[:5],
             'today_logins': today_logged_users.count(),
+            'today_buyers': buyers[today],
+            'week_buyers': buyers[week_start],
+            'month_buyers': buyers[month_start],
             
-            'total_income': total_income,
-            'today_income': today_income,
-            'total_payments': total_payments.count(),
-            'today_payments': today_payments.count(),
+            'total_income': sales['total_income'],
+            'today_income': sales['today_income'],
+            'total_payments': sales['total_payments'],
+            'today_payments': sales['today_payments'],
+            'total_orders': sales['total_orders'],
+            'today_orders': sales['today_orders'],
             
-            'total_ingredient_cost': total_ingredient_cost,
-            'today_ingredient_cost': today_ingredient_cost,
+            'total_ingredient_cost': sales['total_ingredient_spend'],
+            'today_ingredient_cost': sales['today_ingredient_spend'],
+            'total_cogs': sales['total_cogs'],
+            'today_cogs': sales['today_cogs'],
+            'total_waste_cost': sales['total_waste_cost'],
             'profit': profit,
             
             'low_stock_count': low_stock_count,
             'out_of_stock_count': out_of_stock_count,
+            
+            'demand_heatmap': heatmap(demand_arrays()['total']),
         }
         
     except Exception as e:
@@ -1492,6 +1530,70 @@ def statistics(request):
     return render(request, 'orders/statistics.html', context)
 
 
+@login_required
+def statistics_api(request):
+    # Временные ряды для графиков: ?start=ГГГГ-ММ-ДД&end=ГГГГ-ММ-ДД&bucket=hour|day|week|month&window=7
+    if not request.user.is_admin():
+        return JsonResponse({'error': 'Только для администраторов'}, status=403)
+    
+    try:
+        start, end, bucket, window = parse_series_params(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    data = time_series(start, end, bucket, window)
+    data.update({'start': start.isoformat(), 'end': end.isoformat(), 'bucket': bucket})
+    return JsonResponse(data)
+
+
+@login_required
+def demand_api(request):
+    # Спрос 7x24 (день недели с понедельника x час): итог и по блюдам, ?dish=<id> - только одно блюдо
+    if not request.user.is_admin():
+        return JsonResponse({'error': 'Только для администраторов'}, status=403)
+    
+    dish_ids = None
+    if request.GET.get('dish'):
+        try:
+            dish_ids = [int(request.GET['dish'])]
+        except ValueError:
+            return JsonResponse({'error': 'Некорректный идентификатор блюда'}, status=400)
+    
+    arrays = demand_arrays(dish_ids)
+    return JsonResponse({
+        'weekdays': WEEKDAY_NAMES,
+        'total': arrays['total'],
+        'by_dish': {str(dish_id): matrix for dish_id, matrix in arrays['by_dish'].items()},
+    })
+
+
+@login_required
+def export_data(request, dataset):
+    # Потоковая выгрузка: ?format=csv|jsonl&start=ГГГГ-ММ-ДД&end=ГГГГ-ММ-ДД
+    if not request.user.is_admin():
+        messages.error(request, 'Доступно только для администраторов')
+        return redirect('menu')
+    
+    file_format = request.GET.get('format', 'csv')
+    if dataset not in EXPORTS or file_format not in EXPORT_FORMATS:
+        raise Http404('Нет такой выгрузки')
+    
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        messages.error(request, 'Некорректный период выгрузки')
+        return redirect('statistics')
+    
+    content_type = 'text/csv' if file_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(stream_export(dataset, file_format, start, end),
+                                     content_type=f'{content_type}; charset=utf-8')
+    period = '_'.join(day.isoformat() for day in (start, end) if day)
+    filename = f"{dataset}{'_' + period if period else ''}.{file_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 def manage_inventory(request):
     # Управление запасами
@@ -1501,12 +1603,17 @@ def manage_inventory(request):
     
     stocks = IngredientStock.objects.all().select_related('ingredient').order_by('ingredient__name')
     
-    restock_requests = StockHistory.objects.filter(operation_type='request').select_related('ingredient', 'performed_by').order_by('-created_at')
+    forecasts = forecast_ingredients(stocks)
+    expiry_dates = next_expiry_dates([stock.ingredient_id for stock in stocks])
+    today = timezone.localdate()
+    for stock in stocks:
+        stock.forecast = forecasts.get(stock.ingredient_id)
+        stock.next_expiry = expiry_dates.get(stock.ingredient_id)
+        stock.has_expired = stock.next_expiry is not None and stock.next_expiry < today
     
-    total_ingredient_cost = StockHistory.objects.filter(operation_type='restock').aggregate(Sum('total_cost'))['total_cost__sum'] or Decimal('0')
+    restock_requests = StockHistory.objects.filter(operation_type='request', fulfilled_at__isnull=True).select_related('ingredient__stock', 'ingredient__cost', 'performed_by').order_by('-created_at')
     
-    today = timezone.now().date()
-    today_ingredient_cost = StockHistory.objects.filter(operation_type='restock', created_at__date=today).aggregate(Sum('total_cost'))['total_cost__sum'] or Decimal('0')
+    total_ingredient_cost, today_ingredient_cost = operation_cost_totals('restock')
     
     context = {
         'stocks': stocks,
@@ -1530,36 +1637,26 @@ def restock_ingredient(request, stock_id):
         quantity = request.POST.get('quantity')
         cost_per_unit = request.POST.get('cost_per_unit')
         notes = request.POST.get('notes', '')
+        expires_at = request.POST.get('expires_at')
         
         try:
             quantity = Decimal(quantity)
             cost_per_unit = Decimal(cost_per_unit)
+            # Срок годности партии необязателен - иначе берется срок хранения ингредиента
+            expires_at = date.fromisoformat(expires_at) if expires_at else None
             
             if quantity > 0 and cost_per_unit >= 0:
-                old_quantity = stock.current_quantity
-                stock.current_quantity += quantity
-                stock.last_restocked = timezone.now()
-                stock.save()
-                
-                ingredient_cost, created = IngredientCost.objects.get_or_create(
-                    ingredient=stock.ingredient,
-                    defaults={'cost_per_unit': cost_per_unit}
-                )
-                if not created:
-                    ingredient_cost.cost_per_unit = cost_per_unit
-                    ingredient_cost.save()
-                
+                # Цена закупки и средневзвешенная стоимость обновляются вместе с запасом
                 total_cost = quantity * cost_per_unit
                 
-                StockHistory.objects.create(
-                    ingredient=stock.ingredient,
-                    operation_type='restock',
-                    quantity_change=quantity,
-                    quantity_before=old_quantity,
-                    quantity_after=stock.current_quantity,
+                record_stock_change(
+                    stock.ingredient,
+                    'restock',
+                    quantity,
+                    user=request.user,
+                    notes=f"Пополнение: {notes}",
                     total_cost=total_cost,
-                    performed_by=request.user,
-                    notes=f"Пополнение: {notes}"
+                    expires_at=expires_at
                 )
                 
                 messages.success(request,
@@ -1582,6 +1679,10 @@ def fulfill_restock_request(request, request_id):
     
     restock_request = get_object_or_404(StockHistory, id=request_id, operation_type='request')
     
+    if restock_request.fulfilled_at:
+        messages.warning(request, 'Этот запрос уже выполнен')
+        return redirect('manage_inventory')
+    
     if request.method == 'POST':
         cost_per_unit = request.POST.get('cost_per_unit')
         notes = request.POST.get('notes', '')
@@ -1591,40 +1692,13 @@ def fulfill_restock_request(request, request_id):
             return redirect('manage_inventory')
         
         try:
-            quantity = restock_request.quantity_change
             cost_per_unit = Decimal(cost_per_unit)
             
             if cost_per_unit >= 0:
+                fulfill_restock_requests({restock_request.id: cost_per_unit}, user=request.user, notes=notes)
+                restock_request.refresh_from_db()
                 stock = restock_request.ingredient.stock
-                old_quantity = stock.current_quantity
-                stock.current_quantity += quantity
-                stock.last_restocked = timezone.now()
-                stock.save()
-                
-                ingredient_cost, created = IngredientCost.objects.get_or_create(
-                    ingredient=stock.ingredient,
-                    defaults={'cost_per_unit': cost_per_unit}
-                )
-                if not created:
-                    ingredient_cost.cost_per_unit = cost_per_unit
-                    ingredient_cost.save()
-                
-                total_cost = quantity * cost_per_unit
-                
-                restock_request.total_cost = total_cost
-                restock_request.notes += f" | Выполнено: {notes}"
-                restock_request.save()
-                
-                StockHistory.objects.create(
-                    ingredient=stock.ingredient,
-                    operation_type='restock',
-                    quantity_change=quantity,
-                    quantity_before=old_quantity,
-                    quantity_after=stock.current_quantity,
-                    total_cost=total_cost,
-                    performed_by=request.user,
-                    notes=f"Выполнение запроса #{request_id}: {notes}"
-                )
+                total_cost = restock_request.total_cost
                 
                 messages.success(request,
                                  f'Запрос на пополнение {stock.ingredient.name} выполнен. '
@@ -1639,6 +1713,43 @@ def fulfill_restock_request(request, request_id):
     return redirect('manage_inventory')
 
 
+@login_required
+def bulk_fulfill_restock_requests(request):
+    # Выполнение сразу нескольких запросов на пополнение (например, недельная поставка)
+    if not request.user.is_admin():
+        messages.error(request, 'Доступно только для администраторов')
+        return redirect('menu')
+    
+    if request.method == 'POST':
+        notes = request.POST.get('notes', '')
+        costs = {}
+        
+        try:
+            for request_id in request.POST.getlist('request_ids'):
+                cost_per_unit = Decimal(request.POST.get(f'cost_{request_id}', ''))
+                if cost_per_unit < 0:
+                    raise ValueError
+                costs[int(request_id)] = cost_per_unit
+        except (ValueError, InvalidOperation):
+            messages.error(request, 'Укажите неотрицательную стоимость для каждого выбранного запроса')
+            return redirect('manage_inventory')
+        
+        if not costs:
+            messages.warning(request, 'Не выбрано ни одного запроса')
+            return redirect('manage_inventory')
+        
+        try:
+            fulfilled = fulfill_restock_requests(costs, user=request.user, notes=notes)
+            total_cost = sum((r.total_cost for r in fulfilled), Decimal('0'))
+            messages.success(request,
+                             f'Выполнено запросов: {len(fulfilled)}. '
+                             f'Затраты: {total_cost:.2f} руб.'.replace('.', ','))
+        except Exception as e:
+            messages.error(request, f'Ошибка выполнения запросов: {str(e)}')
+    
+    return redirect('manage_inventory')
+
+
 @login_required
 def delete_restock_request(request, request_id):
     # Удаление запроса на пополнение без выполнения
@@ -1675,22 +1786,24 @@ def update_ingredient_cost(request, ingredient_id):
             cost_per_unit = Decimal(cost_per_unit)
             
             if cost_per_unit >= 0:
+                # Средневзвешенную стоимость меняют только поступления, новая запись начинает с этой цены
                 ingredient_cost, created = IngredientCost.objects.update_or_create(
                     ingredient=ingredient,
                     defaults={
                         'cost_per_unit': cost_per_unit,
                         'last_updated': timezone.now()
+                    },
+                    create_defaults={
+                        'cost_per_unit': cost_per_unit,
+                        'average_cost': cost_per_unit,
                     }
                 )
                 
-                StockHistory.objects.create(
-                    ingredient=ingredient,
-                    operation_type='adjustment',
-                    quantity_change=0,
-                    quantity_before=ingredient.stock.current_quantity,
-                    quantity_after=ingredient.stock.current_quantity,
-                    total_cost=0,
-                    performed_by=request.user,
+                record_stock_change(
+                    ingredient,
+                    'adjustment',
+                    0,
+                    user=request.user,
                     notes=f"Изменение стоимости: {cost_per_unit} руб/{ingredient.unit}. {notes}"
                 )
                 
@@ -1720,24 +1833,10 @@ def adjust_stock(request, stock_id):
         try:
             new_quantity = Decimal(new_quantity)
             if new_quantity >= 0:
-                old_quantity = stock.current_quantity
-                change = new_quantity - old_quantity
-                
-                stock.current_quantity = new_quantity
-                stock.save()
-                
-                StockHistory.objects.create(
-                    ingredient=stock.ingredient,
-                    operation_type='adjustment',
-                    quantity_change=change,
-                    quantity_before=old_quantity,
-                    quantity_after=new_quantity,
-                    performed_by=request.user,
-                    notes=notes
-                )
+                entry = set_stock_quantity(stock.ingredient, new_quantity, user=request.user, notes=notes)
                 
                 messages.success(request, 
-                    f'Запас {stock.ingredient.name} скорректирован: {old_quantity} → {new_quantity} {stock.unit}')
+                    f'Запас {stock.ingredient.name} скорректирован: {entry.quantity_before} → {entry.quantity_after} {stock.unit}')
             else:
                 messages.error(request, 'Количество не может быть отрицательным')
         except (ValueError, InvalidOperation):
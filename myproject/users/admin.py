@@ -3,7 +3,12 @@ from django.contrib import admin
 # Импорт для работы с пользователями
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
+from django.shortcuts import render
+from django.urls import path
+from .forms import RosterImportForm
 from .models import CustomUser
+from .roster import RosterError, import_roster, parse_roster
+from django.core.exceptions import PermissionDenied
 from django.utils.translation import gettext_lazy as _
 
 # Форма для изменения пользователя
@@ -22,6 +27,8 @@ class CustomUserCreationForm(UserCreationForm):
 class CustomUserAdmin(UserAdmin):
     form = CustomUserChangeForm
     add_form = CustomUserCreationForm
+    # Кнопка импорта учеников над списком
+    change_list_template = 'admin/users/customuser/change_list.html'
     
     # Что показывать в списке
     list_display = ('username', 'email', 'first_name', 'last_name', 
@@ -38,7 +45,7 @@ class CustomUserAdmin(UserAdmin):
         (None, {'fields': ('username', 'password')}),
         ('Личная информация', {'fields': (
             'first_name', 'last_name', 'email',
-            'phone', 'avatar', 'birth_date', 'allergens')}),
+            'phone', 'avatar', 'birth_date', 'school_class', 'allergens')}),
         ('Права', {'fields': ('is_active', 'is_staff', 'is_superuser',
                               'groups', 'user_permissions')}),
         ('Важные даты', {'fields': ('last_login', 'date_joined')}),
@@ -63,3 +70,27 @@ class CustomUserAdmin(UserAdmin):
         return "Нет аватара"
     avatar_preview.allow_tags = True
     avatar_preview.short_description = 'Аватар'
+    
+    # Импорт списка учеников из CSV
+    def get_urls(self):
+        urls = [
+            path('import-roster/', self.admin_site.admin_view(self.import_roster_view), name='users_customuser_import_roster'),
+        ]
+        return urls + super().get_urls()
+    
+    def import_roster_view(self, request):
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+        context = {**self.admin_site.each_context(request), 'opts': self.model._meta, 'title': 'Импорт учеников'}
+        form = RosterImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            try:
+                rows = parse_roster(form.cleaned_data['roster'])
+                context['created'] = import_roster(rows, dry_run=form.cleaned_data['dry_run'])
+                context['dry_run'] = form.cleaned_data['dry_run']
+            except RosterError as e:
+                context['errors'] = e.errors
+            except UnicodeDecodeError:
+                context['errors'] = ['Файл должен быть в кодировке UTF-8']
+        context['form'] = form
+        return render(request, 'admin/users/customuser/import_roster.html', context)
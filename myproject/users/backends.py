@@ -0,0 +1,18 @@
+from django.contrib.auth.backends import ModelBackend
+
+from .models import CustomUser, users_with_email
+
+
+# Вход по email вместо логина: пользователь ищется по уникальному индексу LOWER(email)
+class EmailBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if not username or '@' not in username or password is None:
+            return None
+        user = users_with_email(username).first()
+        if user is None:
+            # Хэширование и для несуществующего email - чтобы время ответа не выдавало, есть ли такой
+            CustomUser().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
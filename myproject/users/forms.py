@@ -2,6 +2,8 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError 
+from django.db import IntegrityError, transaction
+from .models import EMAIL_UNIQUE_CONSTRAINT, users_with_email
 
 # Получаем модель пользователя
 User = get_user_model()
@@ -23,10 +25,11 @@ class RegistrationForm(UserCreationForm):
         fields = ['username', 'first_name', 'last_name', 
                  'phone','birth_date', 'email', 'password1', 'password2']
     
-    # Проверка уникальности email
+    # Проверка уникальности email без учета регистра (по уникальному индексу LOWER(email)).
+    # Гонку между проверкой и сохранением закрывает сам индекс - см. save_unique
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        if users_with_email(email).exists():
             raise ValidationError('Пользователь с таким email уже существует')
         return email
     
@@ -42,10 +45,23 @@ class RegistrationForm(UserCreationForm):
             user.save()
         return user
 
+# Сохранение формы пользователя: нарушение уникальности логина или email становится ошибкой поля.
+# Возвращает пользователя или None, если запись не сохранена
+def save_unique(form):
+    try:
+        with transaction.atomic():
+            return form.save()
+    except IntegrityError as e:
+        if EMAIL_UNIQUE_CONSTRAINT in str(e):
+            form.add_error('email', 'Пользователь с таким email уже существует')
+        else:
+            form.add_error('username', 'Пользователь с таким логином уже существует')
+        return None
+
 # Форма входа пользователя
 class LoginForm(forms.Form):
     username = forms.CharField(
-        label='Имя пользователя', 
+        label='Логин или email', 
         max_length=100,
         widget=forms.TextInput(attrs={'class': 'form-control'})
     )
@@ -66,3 +82,18 @@ class ProfileEditForm(forms.ModelForm):
             'birth_date': forms.DateInput(attrs={'type': 'date'}),
             'allergens': forms.CheckboxSelectMultiple()
         }
+    
+    # Email не должен совпадать с чужим без учета регистра
+    def clean_email(self):
+        email = self.cleaned_data.get('email')
+        if email and users_with_email(email).exclude(pk=self.instance.pk).exists():
+            raise ValidationError('Пользователь с таким email уже существует')
+        return email
+
+# Загрузка списка учеников (users.roster)
+class RosterImportForm(forms.Form):
+    roster = forms.FileField(
+        label='CSV-файл',
+        help_text='Колонки: username, email, first_name, last_name, class, allergens (через ;), balance, password'
+    )
+    dry_run = forms.BooleanField(label='Только проверить', required=False)
@@ -0,0 +1,73 @@
+from django.db.models import Q
+
+from .models import CustomUser, fold
+
+
+# Пользователей на странице списка
+PAGE_SIZE = 50
+# Поля поиска по началу строки: копии логина, фамилии и email в нижнем регистре (с индексами)
+SEARCH_FIELDS = ('username_search', 'last_name_search', 'email_search')
+
+
+def _prefix_range(prefix):
+    # Границы [prefix, следующая строка) - сравнение по индексу вместо LIKE
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def filter_users(query='', role=''):
+    # Пользователи с ролью role, у которых логин, фамилия или email начинаются с query (без учета регистра)
+    users = CustomUser.objects.all()
+    if role:
+        users = users.filter(role=role)
+    query = query.strip()
+    if query:
+        low, high = _prefix_range(fold(query))
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__gte': low, f'{field}__lt': high})
+        users = users.filter(condition)
+    return users
+
+
+def search_users(query='', role='', after='', limit=PAGE_SIZE):
+    # Страница пользователей по логину (ключевая пагинация: after - логин последнего на прошлой странице).
+    # Возвращает (пользователи, логин для следующей страницы или None)
+    users = filter_users(query, role)
+    if after:
+        users = users.filter(username__gt=after)
+
+    page = list(users.order_by('username')[:limit + 1])
+    next_after = page[limit - 1].username if len(page) > limit else None
+    return page[:limit], next_after
+
+
+def parse_list_params(params):
+    # Параметры списка из запроса: поиск, роль (только из ROLE_CHOICES) и курсор
+    roles = dict(CustomUser.ROLE_CHOICES)
+    role = params.get('role', '')
+    return {
+        'query': params.get('q', '')[:150],
+        'role': role if role in roles else '',
+        'after': params.get('after', ''),
+    }
+
+
+def users_json(users, next_after):
+    # Данные страницы для подгружаемых таблиц
+    return {
+        'users': [
+            {
+                'id': user.id,
+                'username': user.username,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'email': user.email,
+                'role': user.role,
+                'role_display': user.get_role_display(),
+                'date_joined': user.date_joined.isoformat(),
+                'is_active': user.is_active,
+            }
+            for user in users
+        ],
+        'next_after': next_after,
+    }
@@ -0,0 +1,38 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.roster import RosterError, import_roster, parse_roster
+
+
+# Импорт списка учеников из CSV: username,email,first_name,last_name,class,allergens,balance,password
+class Command(BaseCommand):
+    help = 'Создает учеников из CSV одним пакетом (пароли хэшируются параллельно)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV-файл в UTF-8')
+        parser.add_argument('--workers', type=int, help='Процессов для хэширования паролей (по умолчанию - по числу ядер)')
+        parser.add_argument('--passwords', help='Куда сохранить выданные пароли (CSV; по умолчанию - стандартный вывод)')
+        parser.add_argument('--dry-run', action='store_true', help='Только проверить файл')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as roster:
+                rows = parse_roster(roster)
+            created = import_roster(rows, workers=options['workers'], dry_run=options['dry_run'])
+        except RosterError as e:
+            raise CommandError(f'Файл не импортирован:\n{e}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f'Ошибок нет, будет создано учеников: {len(created)}'))
+            return
+
+        issued = [(user, password) for user, password in created if password]
+        if issued:
+            output = open(options['passwords'], 'w', encoding='utf-8', newline='') if options['passwords'] else self.stdout
+            writer = csv.writer(output)
+            writer.writerow(['username', 'email', 'password'])
+            writer.writerows([user.username, user.email, password] for user, password in issued)
+            if options['passwords']:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(f'Создано учеников: {len(created)}, выдано паролей: {len(issued)}'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='school_class',
+            field=models.CharField(blank=True, max_length=10, verbose_name='Класс'),
+        ),
+    ]
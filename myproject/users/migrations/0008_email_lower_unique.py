@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 04:52
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def find_duplicate_emails(rows):
+    # {email в нижнем регистре: [логины]} для email, которые отличаются только регистром.
+    # rows - пары (логин, email) в порядке регистрации
+    owners = {}
+    for username, email in rows:
+        owners.setdefault(email.lower(), []).append(username)
+    return {email: usernames for email, usernames in owners.items() if len(usernames) > 1}
+
+
+def check_duplicate_emails(apps, schema_editor):
+    # Уникальный индекс не создать, пока есть email, отличающиеся только регистром. Молча очищать их нельзя -
+    # владельцы потеряли бы вход по email и восстановление пароля, поэтому миграция останавливается
+    # со списком учетных записей, которые администратор должен исправить сам (например, в админке)
+    CustomUser = apps.get_model('users', 'CustomUser')
+    rows = CustomUser.objects.exclude(email='').order_by('id').values_list('username', 'email')
+    duplicates = find_duplicate_emails(rows)
+    if duplicates:
+        lines = '\n'.join(f"  {email}: {', '.join(usernames)}" for email, usernames in sorted(duplicates.items()))
+        raise RuntimeError(
+            'Email без учета регистра должен быть уникальным, но его делят несколько пользователей.\n'
+            f'Измените email у лишних учетных записей и повторите migrate:\n{lines}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0007_customuser_school_class'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='user_email_lower_unique', violation_error_message='Пользователь с таким email уже существует'),
+        ),
+    ]
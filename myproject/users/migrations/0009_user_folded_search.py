@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 05:38
+
+import users.models
+from django.db import migrations
+
+
+def fill_search_fields(apps, schema_editor):
+    # Поля поиска существующих пользователей (новые и измененные заполняются при сохранении)
+    CustomUser = apps.get_model('users', 'CustomUser')
+    accounts = list(CustomUser.objects.only('username', 'last_name', 'email'))
+    for user in accounts:
+        user.username_search = users.models.fold(user.username)[:150]
+        user.last_name_search = users.models.fold(user.last_name)[:150]
+        user.email_search = users.models.fold(user.email)[:254]
+    CustomUser.objects.bulk_update(accounts, ['username_search', 'last_name_search', 'email_search'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_email_lower_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='user_username_lower_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='user_last_name_lower_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customuser',
+            name='user_email_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='email_search',
+            field=users.models.FoldedCharField(blank=True, db_index=True, default='', editable=False, max_length=254, source='email'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='last_name_search',
+            field=users.models.FoldedCharField(blank=True, db_index=True, default='', editable=False, max_length=150, source='last_name'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='username_search',
+            field=users.models.FoldedCharField(blank=True, db_index=True, default='', editable=False, max_length=150, source='username'),
+        ),
+        migrations.RunPython(fill_search_fields, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,37 @@
 # users/models.py
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
+
+# Имя уникального индекса по LOWER(email) - по нему распознается нарушение уникальности при сохранении
+EMAIL_UNIQUE_CONSTRAINT = 'user_email_lower_unique'
+
+
+class FoldedCharField(models.CharField):
+    # Копия поля source в нижнем регистре (str.casefold) для поиска без учета регистра:
+    # LOWER в SQLite меняет регистр только латиницы. Заполняется при каждой записи, в том числе в bulk_create
+    def __init__(self, *args, source=None, **kwargs):
+        self.source = source
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('blank', True)
+        kwargs.setdefault('default', '')
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = fold(getattr(model_instance, self.source))[:self.max_length]
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+def fold(value):
+    # Строка для сравнения без учета регистра (для кириллицы тоже)
+    return (value or '').casefold()
+
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
@@ -13,6 +44,7 @@ class CustomUser(AbstractUser):
     phone = models.CharField(max_length=15, blank=True)
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
     birth_date = models.DateField(blank=True, null=True)
+    school_class = models.CharField(max_length=10, blank=True, verbose_name='Класс')
     allergens = models.ManyToManyField(
         'orders.Ingredient',
         blank=True,
@@ -31,6 +63,24 @@ class CustomUser(AbstractUser):
         default=0,
         verbose_name='Бонусные баллы'
     )
+
+    # Поиск по началу логина, фамилии и email без учета регистра (users.listing)
+    username_search = FoldedCharField(max_length=150, source='username', db_index=True)
+    last_name_search = FoldedCharField(max_length=150, source='last_name', db_index=True)
+    email_search = FoldedCharField(max_length=254, source='email', db_index=True)
+    
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Фильтр по роли с сортировкой по логину для постраничного списка
+            models.Index(fields=['role', 'username'], name='user_role_username_idx'),
+        ]
+        constraints = [
+            # Один email - один пользователь, без учета регистра (пустой email не проверяется)
+            models.UniqueConstraint(
+                Lower('email'), name=EMAIL_UNIQUE_CONSTRAINT, condition=~models.Q(email=''),
+                violation_error_message='Пользователь с таким email уже существует',
+            ),
+        ]
     
     def is_admin(self):
         return self.role == 'admin' or self.is_superuser
@@ -84,3 +134,9 @@ class CustomUser(AbstractUser):
             description=description
         )
         return True
+
+
+def users_with_email(email):
+    # Пользователи с этим email без учета регистра - поиск по уникальному индексу LOWER(email)
+    return (CustomUser.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower=Lower(models.Value(email))).exclude(email=''))
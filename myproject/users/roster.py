@@ -0,0 +1,153 @@
+import csv
+import io
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from .models import CustomUser
+
+
+# Колонки CSV со списком учеников (обязательны username и email)
+COLUMNS = ('username', 'email', 'first_name', 'last_name', 'class', 'allergens', 'balance', 'password')
+REQUIRED_COLUMNS = ('username', 'email')
+# Аллергены в ячейке перечисляются через точку с запятой
+ALLERGEN_SEPARATOR = ';'
+# Меньше паролей быстрее захэшировать в текущем процессе, чем запускать пул
+MIN_PARALLEL_PASSWORDS = 16
+
+
+class RosterError(Exception):
+    # Ошибки в файле: список строк "Строка N: ..."
+    def __init__(self, errors):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+
+def _setup_worker():
+    # Процессы пула, запущенные через spawn, не наследуют настроенный Django
+    import django
+    django.setup()
+
+
+def hash_passwords(passwords, workers=None):
+    # PBKDF2 для всех паролей: сотни миллисекунд на каждый, поэтому по процессам
+    if len(passwords) < MIN_PARALLEL_PASSWORDS or workers == 1:
+        return [make_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        return list(pool.map(make_password, passwords, chunksize=8))
+
+
+def parse_roster(file):
+    # Строки CSV (файл в текстовом или двоичном виде) -> список словарей, ошибки формата -> RosterError
+    if isinstance(file.read(0), bytes):
+        file = io.TextIOWrapper(file, encoding='utf-8-sig')
+    reader = csv.DictReader(file)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise RosterError([f"Нет обязательных колонок: {', '.join(missing)}"])
+    return [{column: (row.get(column) or '').strip() for column in COLUMNS} for row in reader]
+
+
+def _validate(rows):
+    # Проверка строк; занятые логины и email ищутся одним запросом на каждое поле. Возвращает список ошибок
+    from orders.models import Ingredient
+
+    errors = []
+    usernames, emails = {}, {}
+    balance_field = CustomUser._meta.get_field('balance')
+    # Ингредиентов немного - сопоставление без учета регистра по одному запросу
+    ingredients = {name.lower(): ingredient_id for ingredient_id, name in Ingredient.objects.values_list('id', 'name')}
+    for line, row in enumerate(rows, start=2):
+        if not row['username']:
+            errors.append((line, 'не указан логин'))
+        elif row['username'] in usernames:
+            errors.append((line, f"логин {row['username']} повторяется (строка {usernames[row['username']]})"))
+        else:
+            usernames[row['username']] = line
+
+        try:
+            validate_email(row['email'])
+        except ValidationError:
+            errors.append((line, f"некорректный email {row['email']!r}"))
+        else:
+            email = row['email'].lower()
+            if email in emails:
+                errors.append((line, f"email {row['email']} повторяется (строка {emails[email]})"))
+            else:
+                emails[email] = line
+
+        # Проверки поля модели: отклоняют NaN, бесконечность и числа, не помещающиеся в max_digits
+        try:
+            row['balance'] = balance_field.clean(row['balance'].replace(',', '.') or '0', None)
+        except ValidationError:
+            row['balance'] = None
+        if row['balance'] is None or row['balance'] < 0:
+            errors.append((line, 'некорректный начальный баланс'))
+
+        row['allergen_ids'] = []
+        for name in filter(None, (name.strip() for name in row['allergens'].split(ALLERGEN_SEPARATOR))):
+            if name.lower() in ingredients:
+                if ingredients[name.lower()] not in row['allergen_ids']:
+                    row['allergen_ids'].append(ingredients[name.lower()])
+            else:
+                errors.append((line, f'нет ингредиента {name!r}'))
+
+    for username in CustomUser.objects.filter(username__in=usernames).values_list('username', flat=True):
+        errors.append((usernames[username], f'логин {username} уже занят'))
+    taken = (CustomUser.objects.annotate(email_lower=Lower('email'))
+             .filter(email_lower__in=emails).values_list('email_lower', flat=True))
+    for email in taken:
+        errors.append((emails[email], f'email {email} уже зарегистрирован'))
+    return [f'Строка {line}: {message}' for line, message in sorted(errors, key=lambda error: error[0])]
+
+
+def import_roster(rows, workers=None, dry_run=False):
+    # Создает учеников из строк parse_roster: все или никого. Возвращает [(пользователь, выданный пароль или '')]
+    from orders.models import Transaction
+
+    errors = _validate(rows)
+    if errors:
+        raise RosterError(errors)
+    if dry_run:
+        return [(CustomUser(username=row['username'], email=row['email']), '') for row in rows]
+
+    # Ученикам без пароля в файле выдается случайный
+    issued = [row['password'] or secrets.token_urlsafe(9) for row in rows]
+    hashes = hash_passwords(issued, workers)
+    users = [
+        CustomUser(
+            username=row['username'],
+            email=row['email'],
+            first_name=row['first_name'],
+            last_name=row['last_name'],
+            school_class=row['class'],
+            role='student',
+            balance=row['balance'],
+            password=password_hash,
+        )
+        for row, password_hash in zip(rows, hashes)
+    ]
+
+    try:
+        with transaction.atomic():
+            CustomUser.objects.bulk_create(users)
+            Allergen = CustomUser.allergens.through
+            Allergen.objects.bulk_create([
+                Allergen(customuser_id=user.id, ingredient_id=ingredient_id)
+                for user, row in zip(users, rows) for ingredient_id in row['allergen_ids']
+            ])
+            Transaction.objects.bulk_create([
+                Transaction(user=user, amount=user.balance, balance_after=user.balance,
+                            transaction_type='deposit', description='Начальный баланс при импорте')
+                for user in users if user.balance
+            ])
+    except IntegrityError:
+        # Логин или email заняли между проверкой и вставкой - уникальные индексы не пропустили дубликат
+        raise RosterError(['Часть логинов или email заняли во время импорта, проверьте файл еще раз'])
+
+    return [(user, '' if row['password'] else password) for user, row, password in zip(users, rows, issued)]
@@ -0,0 +1,53 @@
+from importlib import import_module
+
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.urls import reverse
+
+from users.forms import RegistrationForm, save_unique
+from users.models import CustomUser, users_with_email
+
+
+class EmailUniquenessTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('ivanov', 'Ivanov@School.ru', 'secret-pass-1')
+
+    def registration(self, username='petrov', email='ivanov@school.ru'):
+        return RegistrationForm({'username': username, 'email': email,
+                                 'password1': 'Long-pass-123', 'password2': 'Long-pass-123'})
+
+    def test_database_rejects_case_variants_but_allows_blank(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CustomUser.objects.create_user('other', 'IVANOV@school.ru', 'pw')
+        CustomUser.objects.create_user('blank1', '', 'pw')
+        CustomUser.objects.create_user('blank2', '', 'pw')
+
+    def test_registration_form_reports_taken_email(self):
+        form = self.registration()
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+
+    def test_race_between_check_and_insert_becomes_form_error(self):
+        form = self.registration(email='new@school.ru')
+        self.assertTrue(form.is_valid())
+        CustomUser.objects.create_user('fast', 'NEW@school.ru', 'pw')
+
+        self.assertIsNone(save_unique(form))
+        self.assertEqual(form.errors['email'], ['Пользователь с таким email уже существует'])
+
+    def test_lookup_uses_unique_index(self):
+        plan = users_with_email('IVANOV@school.ru').explain() if connection.vendor == 'sqlite' else ''
+        self.assertEqual(list(users_with_email('IVANOV@school.ru')), [self.user])
+        if plan:
+            self.assertIn('user_email_lower_unique', plan)
+
+    def test_login_by_email_ignores_case(self):
+        response = self.client.post(reverse('login'), {'username': 'IVANOV@school.ru', 'password': 'secret-pass-1'})
+        self.assertRedirects(response, reverse('profile'), fetch_redirect_response=False)
+        self.assertEqual(int(self.client.session['_auth_user_id']), self.user.id)
+
+    def test_migration_lists_case_duplicates_instead_of_clearing_them(self):
+        migration = import_module('users.migrations.0008_email_lower_unique')
+        rows = [('ivanov', 'Ivanov@School.ru'), ('petrov', 'p@school.ru'), ('vanya', 'IVANOV@school.ru')]
+        self.assertEqual(migration.find_duplicate_emails(rows), {'ivanov@school.ru': ['ivanov', 'vanya']})
+        self.assertEqual(migration.find_duplicate_emails(rows[:2]), {})
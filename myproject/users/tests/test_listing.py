@@ -0,0 +1,57 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users.listing import search_users
+from users.models import CustomUser
+
+
+class UserListingTest(TestCase):
+    def setUp(self):
+        for index in range(5):
+            CustomUser.objects.create_user(f'student{index}', f'pupil{index}@school.ru', 'pw', last_name='Иванов')
+        CustomUser.objects.create_user('chef', 'kitchen@school.ru', 'pw', role='chef', last_name='Петров')
+        self.admin = CustomUser.objects.create_user('admin', 'Admin@School.ru', 'pw', role='admin')
+
+    def test_keyset_pages_cover_all_users_once(self):
+        seen, after = [], ''
+        while True:
+            users, after = search_users(after=after, limit=3)
+            seen += [user.username for user in users]
+            if not after:
+                break
+        self.assertEqual(seen, sorted(CustomUser.objects.values_list('username', flat=True)))
+
+    def test_prefix_search_and_role_filter(self):
+        def names(**params):
+            return [user.username for user in search_users(**params)[0]]
+
+        self.assertEqual(names(query='ПЕТ'), ['chef'])
+        self.assertEqual(names(query='admin@'), ['admin'])
+        self.assertEqual(names(query='иван', role='student'), [f'student{index}' for index in range(5)])
+        self.assertEqual(names(query='иван', role='chef'), [])
+
+    def test_search_ignores_cyrillic_case(self):
+        CustomUser.objects.create_user('Ёлкин', '', 'pw', last_name='ПЕТРОВА')
+        self.assertEqual([user.username for user in search_users(query='петров')[0]], ['chef', 'Ёлкин'])
+        self.assertEqual([user.username for user in search_users(query='ёЛК')[0]], ['Ёлкин'])
+
+    def test_search_fields_follow_saved_values(self):
+        user = CustomUser.objects.get(username='chef')
+        user.last_name = 'Сидоров'
+        user.save()
+        self.assertEqual(CustomUser.objects.get(pk=user.pk).last_name_search, 'сидоров')
+
+        with CaptureQueriesContext(connection) as queries:
+            search_users(query='СИД')
+        self.assertIn('"users_customuser"."last_name_search" >=', queries[0]['sql'])
+
+    def test_json_page(self):
+        self.client.force_login(self.admin)
+        data = self.client.get(reverse('user_list_api'), {'role': 'student', 'after': 'student2'}).json()
+
+        self.assertEqual([user['username'] for user in data['users']], ['student3', 'student4'])
+        self.assertIsNone(data['next_after'])
+        response = self.client.get(reverse('manage_users'), {'q': 'kitchen'})
+        self.assertEqual([user.username for user in response.context['users']], ['chef'])
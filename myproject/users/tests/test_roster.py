@@ -0,0 +1,71 @@
+import io
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+
+from orders.models import Ingredient, Transaction
+from users.models import CustomUser
+from users.roster import RosterError, hash_passwords, import_roster, parse_roster
+
+ROSTER = '''username,email,first_name,last_name,class,allergens,balance,password
+ivanov,Ivanov@school.ru,Иван,Иванов,5А,Молоко; арахис,150,
+petrova,petrova@school.ru,Анна,Петрова,5Б,,0,secret-pass
+'''
+
+
+class RosterImportTest(TestCase):
+    def setUp(self):
+        self.milk = Ingredient.objects.create(name='Молоко', unit='мл')
+        self.nuts = Ingredient.objects.create(name='Арахис', unit='г')
+
+    def test_import_creates_students_allergens_and_balance(self):
+        created = import_roster(parse_roster(io.StringIO(ROSTER)), workers=1)
+
+        ivanov = CustomUser.objects.get(username='ivanov')
+        self.assertEqual((ivanov.school_class, ivanov.role, ivanov.balance), ('5А', 'student', Decimal('150')))
+        self.assertEqual(set(ivanov.allergens.all()), {self.milk, self.nuts})
+        self.assertTrue(ivanov.check_password(created[0][1]))
+        self.assertEqual(created[1][1], '')
+        self.assertTrue(CustomUser.objects.get(username='petrova').check_password('secret-pass'))
+        self.assertEqual(Transaction.objects.get().amount, Decimal('150'))
+
+    def test_conflicts_are_reported_and_nothing_is_created(self):
+        CustomUser.objects.create_user('other', 'IVANOV@school.ru', 'pw')
+        roster = ROSTER + 'ivanov,x@school.ru,,,,Сахар,-5,\n'
+
+        with self.assertRaises(RosterError) as error:
+            import_roster(parse_roster(io.StringIO(roster)), workers=1)
+        self.assertEqual(error.exception.errors, [
+            'Строка 2: email ivanov@school.ru уже зарегистрирован',
+            'Строка 4: логин ivanov повторяется (строка 2)',
+            'Строка 4: некорректный начальный баланс',
+            "Строка 4: нет ингредиента 'Сахар'",
+        ])
+        self.assertEqual(CustomUser.objects.count(), 1)
+
+    def test_non_finite_and_oversized_balances_are_row_errors(self):
+        roster = ROSTER.splitlines()[0] + '\n' + ''.join(
+            f's{index},s{index}@school.ru,,,,,{balance},\n'
+            for index, balance in enumerate(['nan', 'Infinity', '1e400', '123456789012', '1.005'])
+        )
+
+        with self.assertRaises(RosterError) as error:
+            import_roster(parse_roster(io.StringIO(roster)), workers=1)
+        self.assertEqual(error.exception.errors,
+                         [f'Строка {line}: некорректный начальный баланс' for line in range(2, 7)])
+
+    def test_parallel_hashing(self):
+        hashes = hash_passwords([f'pw{index}' for index in range(16)], workers=2)
+        self.assertEqual(len(set(hashes)), 16)
+        self.assertTrue(all(value.startswith('pbkdf2_sha256$') for value in hashes))
+
+    def test_admin_upload(self):
+        admin = CustomUser.objects.create_superuser('root', 'root@school.ru', 'pw')
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile('roster.csv', ROSTER.encode('utf-8-sig'), content_type='text/csv')
+
+        response = self.client.post(reverse('admin:users_customuser_import_roster'), {'roster': upload})
+        self.assertEqual(len(response.context['created']), 2)
+        self.assertTrue(CustomUser.objects.filter(username='petrova').exists())
@@ -9,6 +9,7 @@ urlpatterns = [
     path('login/', views.login_view, name='login'),  # Вход
     path('logout/', views.logout_view, name='logout'),  # Выход
     path('list/', views.user_list, name='user_list'),  # Список всех пользователей
+    path('list/api/', views.user_list_api, name='user_list_api'),  # Страница списка в JSON
     path('detail/<int:user_id>/', views.user_detail, name='user_detail'),  # Профиль другого пользователя
     path('detail/', views.user_detail, name='user_detail_self'),  # Свой профиль
     path('edit/', views.edit_profile, name='edit_profile'),  # Редактирование профиля
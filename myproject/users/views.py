@@ -2,17 +2,18 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from .forms import RegistrationForm, LoginForm, ProfileEditForm
-from django.http import HttpResponse
+from .forms import RegistrationForm, LoginForm, ProfileEditForm, save_unique
+from django.http import HttpResponse, JsonResponse
+from .listing import filter_users, parse_list_params, search_users, users_json
 from .models import CustomUser
 
 # Регистрация нового пользователя
 def register_view(request):
     if request.method == 'POST':
         form = RegistrationForm(request.POST, request.FILES)
-        if form.is_valid():
-            user = form.save()
-            login(request, user)
+        user = save_unique(form) if form.is_valid() else None
+        if user is not None:
+            login(request, user, backend='django.contrib.auth.backends.ModelBackend')
             messages.success(request, 'Регистрация прошла успешно!')
             return redirect('profile')
         else:
@@ -61,8 +62,7 @@ def edit_profile(request):
             request.FILES, 
             instance=request.user
         )
-        if form.is_valid():
-            form.save()
+        if form.is_valid() and save_unique(form):
             messages.success(request, 'Профиль обновлен успешно!')
             return redirect('profile')
         else:
@@ -72,11 +72,24 @@ def edit_profile(request):
     
     return render(request, 'users/edit_profile.html', {'form': form})
 
-# Список всех пользователей
+# Список пользователей: поиск по началу логина/фамилии/email, фильтр по роли, постранично
 @login_required
 def user_list(request):
-    users = CustomUser.objects.all()
-    return render(request, 'users/user_list.html', {'users': users})
+    params = parse_list_params(request.GET)
+    users, next_after = search_users(**params)
+    return render(request, 'users/user_list.html', {
+        'users': users,
+        'next_after': next_after,
+        'total': filter_users(params['query'], params['role']).count(),
+        'roles': CustomUser.ROLE_CHOICES,
+        **params,
+    })
+
+# Та же страница списка в JSON - для таблиц с подгрузкой
+@login_required
+def user_list_api(request):
+    users, next_after = search_users(**parse_list_params(request.GET))
+    return JsonResponse(users_json(users, next_after))
 
 # Просмотр профиля другого пользователя
 @login_required